@@ -0,0 +1,159 @@
+# admission.py
+# Admission control in front of the DB pool.
+#
+# Every DB-backed request declares a cost class. Each class has a concurrency
+# limit and a queue deadline; all classes share `capacity` slots (normally
+# PGPOOL_MAX). When a slot frees up, the highest-priority waiter whose class
+# still has headroom gets it, so cheap requests overtake 720-hour series
+# queries. Requests that cannot get a slot before their deadline fail fast
+# with Overloaded (-> HTTP 503 + Retry-After) instead of blocking a worker
+# thread until the pool times out.
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+class Overloaded(Exception):
+    def __init__(self, cost: str, retry_after: int):
+        super().__init__(f"Server busy ({cost} queue full or deadline exceeded)")
+        self.cost = cost
+        self.retry_after = retry_after
+
+
+@dataclass
+class CostClass:
+    limit: int            # max concurrent holders of this class
+    deadline: float       # max seconds to wait in the queue
+    priority: int         # lower is served first
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    cost: str = field(compare=False)
+    event: threading.Event = field(compare=False, default_factory=threading.Event)
+    cancelled: bool = field(compare=False, default=False)
+
+
+class AdmissionController:
+    def __init__(self, capacity: int, classes: Dict[str, CostClass], queue_limit: int = 50):
+        self.capacity = capacity
+        self.classes = classes
+        self.queue_limit = queue_limit
+
+        self._lock = threading.Lock()
+        self._in_use: Dict[str, int] = {name: 0 for name in classes}
+        self._total = 0
+        self._queue: List[_Waiter] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        # EWMA of slot hold time per class, used for Retry-After hints.
+        self._hold: Dict[str, float] = {name: 0.1 for name in classes}
+
+        self.admitted: Dict[str, int] = {name: 0 for name in classes}
+        self.rejected: Dict[str, int] = {name: 0 for name in classes}
+
+    def _has_room(self, cost: str) -> bool:
+        return self._total < self.capacity and self._in_use[cost] < self.classes[cost].limit
+
+    def _take(self, cost: str):
+        self._in_use[cost] += 1
+        self._total += 1
+        self.admitted[cost] += 1
+
+    def _retry_after(self) -> int:
+        avg = sum(self._hold.values()) / max(1, len(self._hold))
+        return max(1, math.ceil(avg * (self._queued + 1) / max(1, self.capacity)))
+
+    def acquire(self, cost: str):
+        cls = self.classes[cost]
+        with self._lock:
+            # Fast path only when nobody of equal or higher priority is waiting.
+            if self._has_room(cost) and not any(
+                not w.cancelled and w.priority <= cls.priority for w in self._queue
+            ):
+                self._take(cost)
+                return
+            if self._queued >= self.queue_limit:
+                self.rejected[cost] += 1
+                raise Overloaded(cost, self._retry_after())
+            waiter = _Waiter(cls.priority, next(self._seq), cost)
+            heapq.heappush(self._queue, waiter)
+            self._queued += 1
+
+        if waiter.event.wait(cls.deadline):
+            return
+
+        with self._lock:
+            if waiter.event.is_set():  # granted while timing out
+                return
+            waiter.cancelled = True
+            self._queued -= 1
+            self.rejected[cost] += 1
+            raise Overloaded(cost, self._retry_after())
+
+    def release(self, cost: str, held: float):
+        with self._lock:
+            self._in_use[cost] -= 1
+            self._total -= 1
+            self._hold[cost] = 0.8 * self._hold[cost] + 0.2 * held
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiters in priority order, skipping classes at their limit."""
+        skipped = []
+        while self._queue and self._total < self.capacity:
+            w = heapq.heappop(self._queue)
+            if w.cancelled:
+                continue
+            if self._in_use[w.cost] >= self.classes[w.cost].limit:
+                skipped.append(w)
+                continue
+            self._queued -= 1
+            self._take(w.cost)
+            w.event.set()
+        for w in skipped:
+            heapq.heappush(self._queue, w)
+
+    @contextmanager
+    def slot(self, cost: str):
+        self.acquire(cost)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(cost, time.monotonic() - start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_use": dict(self._in_use),
+                "queued": self._queued,
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+            }
+
+
+def classes_from_env(getenv, capacity: int) -> Dict[str, CostClass]:
+    """Default classes: cheap reads, expensive reads (long windows, batches), writes."""
+    def num(name, default, cast=float):
+        return cast(getenv(name, str(default)))
+
+    return {
+        "write": CostClass(limit=capacity, deadline=num("ADMISSION_WRITE_DEADLINE", 5.0), priority=0),
+        "cheap": CostClass(limit=capacity, deadline=num("ADMISSION_CHEAP_DEADLINE", 2.0), priority=1),
+        "expensive": CostClass(
+            # Always leave at least one slot for cheap/write traffic.
+            limit=num("ADMISSION_EXPENSIVE_MAX", max(1, capacity - 2), int),
+            deadline=num("ADMISSION_EXPENSIVE_DEADLINE", 1.0),
+            priority=2,
+        ),
+    }
@@ -0,0 +1,232 @@
+# Run from the repo root: python -m analysis.etl_.breakouts
+#
+# Incremental burst detection over trend_agg_hourly. Every (topic, category)
+# keeps an EWMA mean and variance of its hourly mentions; each completed hour
+# is scored against that baseline (z-score and lift) and then folded into it,
+# O(1) per bucket. State lives in flat arrays indexed by topic, persisted in
+# burst_state, so a run only reads the hours since the last one.
+#
+# Hours without a bucket count as zero mentions and are applied lazily, when
+# the topic next appears. Hours that ended more than SETTLE_MINUTES ago are
+# final for the state; newer ones are only scored (provisional rows,
+# partial = TRUE), so a spike shows up within the hour. Results go to
+# trend_breakouts for /api/breakouts.
+import math
+import os
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+
+from grok_trends import db
+
+load_dotenv()
+
+ALPHA = float(os.getenv("BREAKOUT_ALPHA", "0.05"))               # EWMA weight of a new hour
+Z_THRESHOLD = float(os.getenv("BREAKOUT_Z", "3.0"))
+MIN_MENTIONS = int(os.getenv("BREAKOUT_MIN_MENTIONS", "5"))
+MIN_LIFT = float(os.getenv("BREAKOUT_MIN_LIFT", "2.0"))
+MIN_HISTORY_HOURS = int(os.getenv("BREAKOUT_MIN_HISTORY_HOURS", "6"))
+WARMUP_HOURS = int(os.getenv("BREAKOUT_WARMUP_HOURS", "24"))      # before brand-new topics count
+BACKFILL_HOURS = int(os.getenv("BREAKOUT_BACKFILL_HOURS", "168"))  # first run only
+RETAIN_DAYS = int(os.getenv("BREAKOUT_RETAIN_DAYS", "30"))
+# Late tweets still land in an hour for a while after it ends (collection lag).
+SETTLE_MINUTES = int(os.getenv("BREAKOUT_SETTLE_MINUTES", "20"))
+
+STATE_COLUMNS = ["topic_name", "category", "mean", "var", "hours", "first_hour", "last_hour", "onset_at"]
+
+
+class Breakout(NamedTuple):
+    topic_name: str
+    category: str
+    bucket_ts: datetime
+    mentions: int
+    expected: float
+    z_score: float
+    lift: float
+    onset_at: datetime
+    partial: bool
+
+
+def _hour(ts: datetime) -> int:
+    # trend_agg_hourly.bucket_ts is a naive UTC TIMESTAMP; don't read it as host-local time.
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp()) // 3600
+
+def _ts(hour: int) -> datetime:
+    return datetime.fromtimestamp(hour * 3600, tz=timezone.utc)
+
+
+class BurstDetector:
+    def __init__(self, alpha: float = ALPHA):
+        self.alpha = alpha
+        self.index: Dict[Tuple[str, str], int] = {}
+        self.keys: List[Tuple[str, str]] = []
+        self.mean = array("d")
+        self.var = array("d")
+        self.hours = array("q")   # hours tracked, empty ones included
+        self.first = array("q")   # hour index (hours since epoch)
+        self.last = array("q")
+        self.onset = array("q")   # start of the current breakout run, -1 if none
+        self.touched = set()
+
+    # ---------- state ----------
+    def _slot(self, key: Tuple[str, str], hour: int) -> int:
+        i = self.index.get(key)
+        if i is None:
+            i = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            for arr, v in ((self.mean, 0.0), (self.var, 0.0), (self.hours, 0),
+                           (self.first, hour), (self.last, hour - 1), (self.onset, -1)):
+                arr.append(v)
+        return i
+
+    def watermark(self) -> Optional[int]:
+        """Last completed hour folded into the state."""
+        return max(self.last) if self.last else None
+
+    def _baseline(self, i: int, hour: int) -> Tuple[float, float]:
+        """Mean and variance just before `hour`, with the empty hours since the last bucket applied."""
+        mean, var = self.mean[i], self.var[i]
+        gap = hour - self.last[i] - 1
+        if gap <= 0:
+            return mean, var
+        # `gap` zero-mention updates in closed form: with r = 1 - alpha,
+        # mean' = r^gap * mean and var' = r^gap * (var + mean^2 * (1 - r^gap)).
+        decay = (1 - self.alpha) ** gap
+        return decay * mean, decay * (var + mean * mean * (1 - decay))
+
+    # ---------- scoring ----------
+    def _score(self, i: int, hour: int, x: float, origin: int):
+        mean, var = self._baseline(i, hour)
+        # Counts are roughly Poisson: never assume less spread than the mean (or 1).
+        z = (x - mean) / math.sqrt(max(var, mean, 1.0))
+        lift = (x + 1.0) / (mean + 1.0)
+        tracked = self.hours[i] + max(0, hour - self.last[i] - 1)
+        established = tracked >= MIN_HISTORY_HOURS or hour - origin >= WARMUP_HOURS
+        hit = established and x >= MIN_MENTIONS and z >= Z_THRESHOLD and lift >= MIN_LIFT
+        return mean, var, z, lift, hit
+
+    def observe(self, key: Tuple[str, str], hour: int, x: float, origin: int) -> Optional[Breakout]:
+        """Score a completed hour against the baseline, then fold it in."""
+        i = self._slot(key, hour)
+        if hour <= self.last[i]:
+            return None  # already folded in
+        mean, var, z, lift, hit = self._score(i, hour, x, origin)
+        gap = hour - self.last[i] - 1
+        if gap > 0:
+            self.onset[i] = -1  # an empty hour ends a run
+        diff = x - mean
+        incr = self.alpha * diff
+        self.mean[i] = mean + incr
+        self.var[i] = (1 - self.alpha) * (var + diff * incr)
+        self.hours[i] += max(0, gap) + 1
+        self.last[i] = hour
+        self.touched.add(i)
+        if not hit:
+            self.onset[i] = -1
+            return None
+        if self.onset[i] < 0:
+            self.onset[i] = hour
+        return self._breakout(i, hour, x, mean, z, lift, self.onset[i], partial=False)
+
+    def peek(self, key: Tuple[str, str], hour: int, x: float, origin: int) -> Optional[Breakout]:
+        """Score an unsettled hour without changing any state."""
+        i = self.index.get(key)
+        if i is None:
+            mean, z, lift = 0.0, x, x + 1.0
+            hit = hour - origin >= WARMUP_HOURS and x >= MIN_MENTIONS and z >= Z_THRESHOLD and lift >= MIN_LIFT
+            onset = hour
+        else:
+            mean, _, z, lift, hit = self._score(i, hour, x, origin)
+            onset = self.onset[i] if self.onset[i] >= 0 and self.last[i] == hour - 1 else hour
+        if not hit:
+            return None
+        return self._breakout(i, hour, x, mean, z, lift, onset, partial=True, key=key)
+
+    def _breakout(self, i, hour, x, mean, z, lift, onset, partial, key=None) -> Breakout:
+        topic, category = key or self.keys[i]
+        return Breakout(topic, category, _ts(hour), int(x), round(mean, 3), round(z, 3), round(lift, 3),
+                        _ts(onset), partial)
+
+    # ---------- persistence ----------
+    def load(self, cur):
+        cur.execute(f"SELECT {', '.join(STATE_COLUMNS)} FROM burst_state")
+        for topic, cat, mean, var, hours, first, last, onset in cur.fetchall():
+            i = self._slot((topic, cat), _hour(first))
+            self.mean[i], self.var[i], self.hours[i] = mean, var, hours
+            self.last[i] = _hour(last)
+            self.onset[i] = _hour(onset) if onset else -1
+
+    def save(self, cur) -> int:
+        rows = [
+            (*self.keys[i], self.mean[i], self.var[i], self.hours[i],
+             _ts(self.first[i]), _ts(self.last[i]), _ts(self.onset[i]) if self.onset[i] >= 0 else None)
+            for i in sorted(self.touched)
+        ]
+        if rows:
+            db.copy_upsert(cur, "burst_state", STATE_COLUMNS, rows, conflict=["topic_name", "category"],
+                           update=STATE_COLUMNS[2:])
+        self.touched.clear()
+        return len(rows)
+
+
+def detect_breakouts(conn) -> int:
+    """Fold the hours since the last run into the state; returns breakouts written (final + provisional)."""
+    cur = conn.cursor()
+    detector = BurstDetector()
+    detector.load(cur)
+    current = _hour(datetime.now(timezone.utc) - timedelta(minutes=SETTLE_MINUTES))  # first unsettled hour
+    mark = detector.watermark()
+    start = mark + 1 if mark is not None else current - BACKFILL_HOURS
+    origin = min(detector.first) if detector.first else start
+    # A NULL and an empty category are the same topic key here and in burst_state.
+    cur.execute("""
+        SELECT topic_name, COALESCE(category, ''), bucket_ts, SUM(mentions)
+        FROM trend_agg_hourly
+        WHERE bucket_ts >= %s
+        GROUP BY topic_name, COALESCE(category, ''), bucket_ts
+        ORDER BY bucket_ts
+    """, (_ts(start).replace(tzinfo=None),))  # naive UTC, like the column
+    buckets = cur.fetchall()
+
+    found = []
+    for topic, cat, bucket_ts, mentions in buckets:
+        hour = _hour(bucket_ts)
+        if hour < current:
+            b = detector.observe((topic, cat), hour, float(mentions or 0), origin)
+        else:
+            b = detector.peek((topic, cat), hour, float(mentions or 0), origin)
+        if b is not None:
+            found.append(b)
+
+    # Provisional rows are replaced every run; a completed hour's final rows supersede them.
+    cur.execute("DELETE FROM trend_breakouts WHERE partial")
+    if found:
+        db.copy_upsert(cur, "trend_breakouts", list(Breakout._fields), found,
+                       conflict=["topic_name", "category", "bucket_ts"], update=list(Breakout._fields[3:]))
+    saved = detector.save(cur)
+    cur.execute("DELETE FROM trend_breakouts WHERE bucket_ts < NOW() - INTERVAL '1 day' * %s", (RETAIN_DAYS,))
+    cur.execute("DELETE FROM burst_state WHERE last_hour < NOW() - INTERVAL '1 day' * %s", (RETAIN_DAYS,))
+    cur.execute("""
+        INSERT INTO data_versions (dataset, version, updated_at)
+        VALUES ('trend_breakouts', 1, NOW())
+        ON CONFLICT (dataset)
+        DO UPDATE SET version = data_versions.version + 1, updated_at = NOW()
+        RETURNING version
+    """)
+    version = cur.fetchone()[0]
+    cur.execute("SELECT pg_notify('grok_trends_updates', %s)", (f"trend_breakouts:{version}",))
+    conn.commit()
+    cur.close()
+    print(f"✅ Breakouts: {len(buckets)} buckets scored, {len(found)} breakouts, {saved} topic states saved")
+    return len(found)
+
+
+if __name__ == "__main__":
+    conn = db.connect()
+    try:
+        detect_breakouts(conn)
+    finally:
+        conn.close()
@@ -1,18 +1,14 @@
-import os, math, psycopg2
+# Run from the repo root: python -m analysis.etl_.etl_hourly --hours 48
+import math
 from datetime import datetime, timedelta, timezone
-from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
+from grok_trends import db
+
 load_dotenv()
 
 def get_db():
-    return psycopg2.connect(
-        host=os.getenv('PGHOST'),
-        database=os.getenv('PGDATABASE'),
-        user=os.getenv('PGUSER'),
-        password=os.getenv('PGPASSWORD'),
-        port=os.getenv('PGPORT', '5432')
-    )
+    return db.connect()
 
 def clamp(v, lo, hi):
     return max(lo, min(hi, v))
@@ -37,12 +33,17 @@ def ensure_table(conn):
     );
     """)
     cur.execute("CREATE INDEX IF NOT EXISTS idx_trend_agg_hourly_ts ON trend_agg_hourly(bucket_ts);")
+    # Buckets whose tweets' metrics were refreshed (collector/engagement.py).
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS trend_dirty_hours (
+      bucket_ts    TIMESTAMPTZ PRIMARY KEY,
+      marked_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    """)
     conn.commit()
     cur.close()
 
-def fetch_topic_events(conn, since_ts):
-    cur = conn.cursor()
-    cur.execute("""
+EVENTS_SQL = """
         SELECT
           top.topic_name,
           top.category,
@@ -54,12 +55,35 @@ def fetch_topic_events(conn, since_ts):
           COALESCE(rt.author_followers,0)
         FROM topics top
         JOIN raw_tweets rt ON rt.tweet_id = top.tweet_id
-        WHERE top.mentioned_at >= %s
-    """, (since_ts,))
+"""
+
+def fetch_topic_events(conn, since_ts):
+    cur = conn.cursor()
+    cur.execute(EVENTS_SQL + " WHERE top.mentioned_at >= %s", (since_ts,))
     rows = cur.fetchall()
     cur.close()
     return rows
 
+def fetch_bucket_events(conn, buckets):
+    """Topic events of whole hourly buckets (for re-aggregating dirty ones)."""
+    cur = conn.cursor()
+    cur.execute(EVENTS_SQL + """
+        JOIN unnest(%s::timestamptz[]) AS d(ts)
+          ON top.mentioned_at >= d.ts AT TIME ZONE 'UTC'
+         AND top.mentioned_at < (d.ts + INTERVAL '1 hour') AT TIME ZONE 'UTC'
+    """, (list(buckets),))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def take_dirty_hours(conn):
+    """Clear the dirty marks (in the caller's transaction) and return them."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM trend_dirty_hours RETURNING bucket_ts")
+    buckets = [r[0] for r in cur.fetchall()]
+    cur.close()
+    return buckets
+
 def aggregate(rows):
     agg = {}
     for topic, cat, bucket_ts, likes, rts, replies, quotes, followers in rows:
@@ -78,31 +102,50 @@ def upsert_hourly(conn, agg):
         for (topic, cat, bucket_ts), (mentions, weighted) in agg.items()
     ]
     if rows:
-        execute_values(cur, """
-            INSERT INTO trend_agg_hourly (topic_name, category, bucket_ts, mentions, weighted)
-            VALUES %s
-            ON CONFLICT (topic_name, category, bucket_ts)
-            DO UPDATE SET
-              mentions = EXCLUDED.mentions,
-              weighted = EXCLUDED.weighted
-        """, rows, template="(%s,%s,%s,%s,%s)")
+        # Staged with this job's own types: collector/db_init.py creates the
+        # table with an INT `weighted` column, the INSERT casts on the way in.
+        db.copy_upsert(
+            cur, "trend_agg_hourly", ["topic_name", "category", "bucket_ts", "mentions", "weighted"], rows,
+            conflict=["topic_name", "category", "bucket_ts"], update=["mentions", "weighted"],
+            staging_types=["text", "text", "timestamptz", "int4", "float8"],
+        )
+        cur.execute("""
+            INSERT INTO data_versions (dataset, version, updated_at)
+            VALUES ('trend_agg_hourly', 1, NOW())
+            ON CONFLICT (dataset)
+            DO UPDATE SET version = data_versions.version + 1, updated_at = NOW()
+            RETURNING version
+        """)
+        version = cur.fetchone()[0]
+        cur.execute("SELECT pg_notify('grok_trends_updates', %s)", (f"trend_agg_hourly:{version}",))
     conn.commit()
     cur.close()
 
+def update_hourly(conn, hours_back=48):
+    """Rebuild the last `hours_back` hours of buckets, plus older dirty ones; returns the number upserted."""
+    ensure_table(conn)
+    now_utc = datetime.now(timezone.utc)
+    # Whole hours only, so the oldest bucket isn't overwritten with a partial count.
+    since_ts = (now_utc - timedelta(hours=hours_back)).replace(minute=0, second=0, microsecond=0)
+    print(f"⏳ ETL: aggregating since {since_ts.isoformat()} (last {hours_back}h)")
+    events = fetch_topic_events(conn, since_ts)
+    older = [b for b in take_dirty_hours(conn) if b < since_ts]  # the window covers the rest
+    if older:
+        print(f"… re-aggregating {len(older)} older buckets with refreshed engagement")
+        events += fetch_bucket_events(conn, older)
+    if not events:
+        conn.commit()
+        print("… no topic events found in the window.")
+        return 0
+    agg = aggregate(events)
+    upsert_hourly(conn, agg)
+    print(f"✅ Upserted {len(agg)} hourly topic buckets.")
+    return len(agg)
+
 def backfill_and_update(hours_back=48):
     conn = get_db()
     try:
-        ensure_table(conn)
-        now_utc = datetime.now(timezone.utc)
-        since_ts = now_utc - timedelta(hours=hours_back)
-        print(f"⏳ ETL: aggregating since {since_ts.isoformat()} (last {hours_back}h)")
-        events = fetch_topic_events(conn, since_ts)
-        if not events:
-            print("… no topic events found in the window.")
-            return
-        agg = aggregate(events)
-        upsert_hourly(conn, agg)
-        print(f"✅ Upserted {len(agg)} hourly topic buckets.")
+        update_hourly(conn, hours_back)
     finally:
         conn.close()
 
@@ -1,114 +1,222 @@
+import asyncio
+import functools
+import hashlib
+import itertools
 import os
-from datetime import datetime
-from typing import List, Optional
-from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Annotated, Any, Dict, List, Literal, NamedTuple, Optional, Sequence, Tuple
 from urllib.request import Request
 
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from dotenv import load_dotenv
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, ValidationError, field_validator
 # At the top of your file, update this import:
 from fastapi import FastAPI, HTTPException, Query, Request  # Add Request here
+import orjson
 import psycopg
-from psycopg_pool import ConnectionPool
 
-load_dotenv()
+from live import TrendsBroadcaster
+from pagination import decode_cursor, next_cursor
+from serialization import shape_series
+from grok_trends import db
+from grok_trends.topk import WINDOWS as TRENDING_WINDOWS, SpaceSaving, merge_panes, oldest_pane
+from admission import AdmissionController, Overloaded, classes_from_env
+from metrics import MetricsMiddleware, Registry
+from shared_cache import HotDataRefresher, SharedCache
+from signup_buffer import BufferFull, Signup, SignupBuffer
+from singleflight import SingleFlight
+from snapshots import SnapshotStore
+from ttl_cache import TTLCache
+from webhook_worker import WebhookWorker
+
+# Serverless mode (on by default on Vercel): every cold start imports this
+# module, so it opens one connection instead of a pool, starts no background
+# threads, imports payment/email deps on first use and skips the OpenAPI schema.
+SERVERLESS = os.getenv("SERVERLESS", "1" if os.getenv("VERCEL") else "0") == "1"
+
+if not SERVERLESS:  # serverless platforms inject env vars; no .env to read
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 # ======================
 # DB POOL (psycopg 3)
 # ======================
-_POOL: Optional[ConnectionPool] = None
-
-
-def _ensure_ssl_in_dsn(dsn: str) -> str:
-    """Append sslmode=require to a DATABASE_URL if not present (for hosted PG)."""
-    parsed = urlparse(dsn)
-    q = dict(parse_qsl(parsed.query, keep_blank_values=True))
-    if "sslmode" not in q:
-        q["sslmode"] = os.getenv("PGSSLMODE", "require")
-    return urlunparse(parsed._replace(query=urlencode(q)))
-
-
-def _build_conninfo() -> str:
-    """Resolve connection info from DATABASE_URL or discrete PG* vars."""
-    dsn = os.getenv("DATABASE_URL")
-    if dsn:
-        return _ensure_ssl_in_dsn(dsn)
-
-    host = os.getenv("PGHOST", "localhost")
-    db = os.getenv("PGDATABASE", "postgres")
-    user = os.getenv("PGUSER", "postgres")
-    pwd = os.getenv("PGPASSWORD", "")
-    port = os.getenv("PGPORT", "5432")
-    sslmode = os.getenv("PGSSLMODE", "disable")
-
-    # Keepalives help on PaaS
-    keepalives = os.getenv("PG_KEEPALIVES", "1")
-    keepalives_idle = os.getenv("PG_KEEPALIVES_IDLE", "30")
-    keepalives_int = os.getenv("PG_KEEPALIVES_INTERVAL", "10")
-    keepalives_cnt = os.getenv("PG_KEEPALIVES_COUNT", "5")
-
-    return (
-        f"host={host} dbname={db} user={user} password={pwd} port={port} sslmode={sslmode} "
-        f"keepalives={keepalives} keepalives_idle={keepalives_idle} "
-        f"keepalives_interval={keepalives_int} keepalives_count={keepalives_cnt}"
-    )
+# Connection info, session setup, pooling and prepared statements live in
+# grok_trends.db, shared with the collector and the ETL jobs.
+_POOL = None  # ConnectionPool, or SingleConnection when SERVERLESS
+
+POOL_TIMEOUT = float(os.getenv("PGPOOL_TIMEOUT", "30"))
+_POOL_LOCK = threading.Lock()
+
+metrics = Registry()
+POOL_WAIT = metrics.histogram(
+    "pgpool_wait_seconds", "Time spent waiting to borrow a pool connection",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+POOL_ERRORS = metrics.counter("pgpool_errors_total", "Pool checkout/return failures", ("op",))
 
 
-def make_pool() -> ConnectionPool:
+def make_pool():
     """Create (or return existing) psycopg3 pool lazily."""
     global _POOL
     if _POOL is not None:
         return _POOL
 
-    conninfo = _build_conninfo()
-    max_size = int(os.getenv("PGPOOL_MAX", "5"))
-
-    _POOL = ConnectionPool(
-        conninfo=conninfo,
-        max_size=max_size,
-        kwargs={"autocommit": False},  # we control commit/rollback
-    )
+    with _POOL_LOCK:
+        if _POOL is None:
+            if SERVERLESS:
+                _POOL = db.SingleConnection(timeout=POOL_TIMEOUT)
+            else:
+                _POOL = db.make_pool(timeout=POOL_TIMEOUT)
     return _POOL
 
 
-def get_conn():
-    """Borrow a connection from the pool."""
+# ----------------------
+# Read replicas (optional)
+# ----------------------
+# DATABASE_REPLICA_URL takes one or more comma-separated DSNs. Read-only
+# endpoints are spread across replicas whose replay lag is under
+# REPLICA_MAX_LAG_SECONDS; writes and read-your-writes paths always use the
+# primary, as does every read when no replica qualifies.
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5"))
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        -- Caught up: replay timestamp only ages because the primary is idle.
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class Replica:
+    def __init__(self, name: str, dsn: str):
+        self.name = name
+        self.pool = db.make_pool(dsn, int(os.getenv("PGPOOL_REPLICA_MAX", os.getenv("PGPOOL_MAX", "5"))), name,
+                                 timeout=POOL_TIMEOUT)
+        self.lag: Optional[float] = None  # seconds; None = unknown/unreachable
+        self.checked_at = float("-inf")
+        self.lock = threading.Lock()
+
+    def usable(self) -> bool:
+        """Re-measure lag at most every REPLICA_LAG_CHECK_SECONDS (one caller measures, others reuse)."""
+        if time.monotonic() - self.checked_at >= REPLICA_LAG_CHECK_SECONDS and self.lock.acquire(blocking=False):
+            try:
+                self.lag = self._measure_lag()
+                self.checked_at = time.monotonic()
+            finally:
+                self.lock.release()
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def _measure_lag(self) -> Optional[float]:
+        try:
+            with self.pool.connection(timeout=1.0) as conn:
+                return float(conn.execute(REPLICA_LAG_SQL).fetchone()[0])
+        except Exception as e:
+            print(f"replica {self.name} lag check failed: {e}")
+            return None
+
+
+_REPLICAS: List[Replica] = [
+    Replica(f"replica{i}", dsn.strip())
+    for i, dsn in enumerate(os.getenv("DATABASE_REPLICA_URL", "").split(","))
+    if dsn.strip() and not SERVERLESS  # one connection per instance: primary (or its pooler) only
+]
+_replica_rr = 0
+_CHECKED_OUT: Dict[int, Any] = {}
+_CHECKED_OUT_LOCK = threading.Lock()
+
+
+def _pick_replica() -> Optional[Replica]:
+    """Round-robin over replicas within the lag budget."""
+    global _replica_rr
+    n = len(_REPLICAS)
+    for i in range(n):
+        replica = _REPLICAS[(_replica_rr + i) % n]
+        if replica.usable():
+            _replica_rr = (_replica_rr + i + 1) % n
+            return replica
+    return None
+
+
+def get_conn(readonly: bool = False, timeout: Optional[float] = None):
+    """Borrow a connection: a healthy replica for read-only work, else the primary.
+
+    `timeout` overrides the pool's checkout timeout (PGPOOL_TIMEOUT).
+    """
+    replica = _pick_replica() if readonly and _REPLICAS else None
+    pool = replica.pool if replica else make_pool()
+    start = time.perf_counter()
     try:
-        pool = make_pool()
-        conn = pool.getconn()
-        # Optional: set per-connection defaults
-        with conn.cursor() as cur:
-            cur.execute("SET TIME ZONE 'UTC'")
-            cur.execute("SET statement_timeout = 60000")  # 60s
-        return conn
+        conn = pool.getconn(timeout=timeout)
     except Exception as e:
+        POOL_ERRORS.inc("getconn")
         raise HTTPException(status_code=500, detail=f"DB pool error: {e}")
+    finally:
+        POOL_WAIT.observe(time.perf_counter() - start)
+    with _CHECKED_OUT_LOCK:
+        _CHECKED_OUT[id(conn)] = pool
+    return conn
 
 
 def put_conn(conn):
-    """Return a connection to the pool (or close on failure)."""
+    """Return a connection to the pool it came from (or close on failure)."""
+    with _CHECKED_OUT_LOCK:
+        pool = _CHECKED_OUT.pop(id(conn), None)
     try:
-        make_pool().putconn(conn)
-    except Exception:
+        (pool or make_pool()).putconn(conn)
+    except Exception as e:
+        POOL_ERRORS.inc("putconn")
+        print(f"DB pool putconn error: {e}")
         try:
             conn.close()
         except Exception:
             pass
 
 
+def _admission_samples() -> dict:
+    st = admission.stats()
+    out = {("capacity", ""): st["capacity"], ("queued", ""): st["queued"]}
+    for key in ("in_use", "admitted", "rejected"):
+        for cost, v in st[key].items():
+            out[(key, cost)] = v
+    return out
+
+
+def _pool_stats() -> dict:
+    out = {}
+    pools = ([_POOL] if _POOL is not None else []) + [r.pool for r in _REPLICAS]
+    for pool in pools:
+        for k, v in pool.get_stats().items():
+            out[(pool.name, k)] = v
+    for r in _REPLICAS:
+        out[(r.name, "replica_lag_seconds")] = r.lag if r.lag is not None else -1
+    return out
+
+
 def close_pool():
     global _POOL
     if _POOL is not None:
         _POOL.close()
         _POOL = None
+    for replica in _REPLICAS:
+        replica.pool.close()
 
 
-def ping_db() -> bool:
+def ping_db(timeout: float = 2.0) -> bool:
     conn = None
     try:
-        conn = get_conn()
+        conn = make_pool().getconn(timeout=timeout)
         with conn.cursor() as cur:
             cur.execute("SELECT 1")
             return cur.fetchone()[0] == 1
@@ -119,10 +227,256 @@ def ping_db() -> bool:
             put_conn(conn)
 
 
+# ======================
+# ADMISSION CONTROL
+# ======================
+# Bounded concurrency per cost class in front of the pool: when saturated,
+# requests wait briefly in a priority queue (cheap before expensive) and then
+# fail fast with 503 + Retry-After rather than piling up on pool.getconn().
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", os.getenv("PGPOOL_MAX", "5")))
+# /api/interest windows longer than this are classed as expensive.
+INTEREST_CHEAP_HOURS = int(os.getenv("INTEREST_CHEAP_HOURS", "168"))
+admission = AdmissionController(
+    ADMISSION_CAPACITY,
+    classes_from_env(os.getenv, ADMISSION_CAPACITY),
+    queue_limit=int(os.getenv("ADMISSION_QUEUE_MAX", "50")),
+)
+
+
+@contextmanager
+def pooled_conn(cost: str = "cheap", readonly: bool = False, timeout: Optional[float] = None):
+    """Admit, borrow a pooled connection, and give both back on exit."""
+    with admission.slot(cost):
+        conn = get_conn(readonly=readonly, timeout=timeout)
+        try:
+            yield conn
+        finally:
+            put_conn(conn)
+
+
+# ======================
+# REQUEST COALESCING
+# ======================
+# A shared link can send hundreds of identical requests in the same second.
+# Concurrent calls with equal parameters share one pooled connection and one
+# query; the result is never reused once that query has returned.
+_flights = SingleFlight()
+
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+# ======================
+# SNAPSHOTS (stale-while-revalidate)
+# ======================
+# Last good payload per read query. Served from memory while fresh, served
+# immediately and refreshed in the background once stale, and used as a
+# fallback (with X-Snapshot / Warning headers) when Postgres is slow or down.
+snapshots = SnapshotStore(
+    fresh_seconds=float(os.getenv("SNAPSHOT_FRESH_SECONDS", "30")),
+    max_stale_seconds=float(os.getenv("SNAPSHOT_MAX_STALE_SECONDS", "600")),
+    directory=os.getenv("SNAPSHOT_DIR") or None,  # set to survive restarts
+    persist=os.getenv("SNAPSHOT_PERSIST", "trends,categories,stats").split(","),
+    max_entries=int(os.getenv("SNAPSHOT_MAX_ENTRIES", "1024")),
+)
+
+
+# ======================
+# SHARED HOT-DATA CACHE (cross-process)
+# ======================
+# One elected worker recomputes the hot datasets when the data version moves
+# and publishes them to tmpfs; every worker reads them from there.
+SHARED_CACHE = os.getenv("SHARED_CACHE", "0" if SERVERLESS else "1") == "1"
+shared_cache: Optional[SharedCache] = (
+    SharedCache(os.getenv("SHARED_CACHE_DIR") or None, max_age=float(os.getenv("SHARED_CACHE_MAX_AGE", "300")))
+    if SHARED_CACHE else None
+)
+
+
+class Served(NamedTuple):
+    payload: Any
+    version: Optional[str]  # data version the payload was computed at
+    headers: dict
+
+
+def read_query(name: str, fn, *args, cost: str = "cheap", error_prefix: str = "") -> Served:
+    """Run fn(conn, *args) on a pooled connection, behind the snapshot store.
+
+    Identical in-flight loads are coalesced, and only the leader goes through
+    admission control.
+    """
+    key = (name, *map(_freeze, args))
+    datasets = READ_DATASETS.get(name)
+
+    def call(timeout=None):
+        with pooled_conn(cost, readonly=True, timeout=timeout) as conn:
+            try:
+                # Version from the same server as the data: a lagging replica
+                # must not label old rows with the primary's newer version.
+                return scope_version(read_data_version(conn), datasets), fn(conn, *args)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"{error_prefix}{e}")
+
+    def load(timeout=None):
+        # Hot datasets come from the cross-process cache the elected refresher
+        # keeps current, so their DB load doesn't scale with the worker count.
+        hot = shared_cache.read(key) if shared_cache else None
+        if hot is not None:
+            return hot.payload, scope_version(hot.version, datasets)
+        version, payload = _flights.do(key, functools.partial(call, timeout))
+        return payload, version
+
+    # With a snapshot to fall back on, a down DB must not hold the request
+    # (and its admission slot) for the full pool timeout.
+    snap, state = snapshots.fetch(key, load, current_version=get_data_version(datasets),
+                                  quick_loader=functools.partial(load, DATA_VERSION_TIMEOUT))
+    headers = {}
+    if state != "fresh":
+        headers["X-Snapshot"] = state
+        headers["X-Snapshot-Age"] = str(int(snap.age))
+        if state == "fallback":
+            headers["Warning"] = '111 - "Revalidation Failed"'
+    return Served(snap.payload, snap.version, headers)
+
+
+# ======================
+# HTTP CACHING (ETag / 304)
+# ======================
+# The rollups only change when the collector/ETL commits, and each commit bumps
+# data_versions. We cache that tiny lookup briefly so a 304 costs no DB query.
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "5"))
+# Short checkout timeout: a slow DB must not stall the request path here.
+DATA_VERSION_TIMEOUT = float(os.getenv("DATA_VERSION_TIMEOUT", "1"))
+_DATA_VERSION: dict = {"value": None, "fetched_at": float("-inf")}
+_DATA_VERSION_LOCK = threading.Lock()
+
+
+# data_versions rows each read depends on, so e.g. a breakout run doesn't
+# change the /api/trends ETag. Reads not listed depend on every dataset.
+READ_DATASETS: Dict[str, Tuple[str, ...]] = {
+    "trends": ("trend_aggregations",),
+    "categories": ("trend_aggregations",),
+    "interest": ("trend_agg_hourly",),
+    "breakouts": ("trend_breakouts",),
+    "trending-now": ("topic_sketch",),
+}
+
+
+def get_data_version(datasets: Optional[Sequence[str]] = None) -> Optional[str]:
+    """Return a token that changes on every commit to `datasets` (default: any; None if unavailable).
+
+    Failures are cached for the same TTL, so an outage costs one timeout per TTL.
+    """
+    now = time.monotonic()
+    with _DATA_VERSION_LOCK:
+        if now - _DATA_VERSION["fetched_at"] < DATA_VERSION_TTL:
+            return scope_version(_DATA_VERSION["value"], datasets)
+
+    value = None
+    try:
+        with make_pool().connection(timeout=DATA_VERSION_TIMEOUT) as conn:
+            value = read_data_version(conn)
+    except Exception:
+        pass
+
+    with _DATA_VERSION_LOCK:
+        _DATA_VERSION["value"] = value
+        _DATA_VERSION["fetched_at"] = now
+    return scope_version(value, datasets)
+
+
+DATA_VERSIONS = db.statement("data_versions", "SELECT dataset, version FROM data_versions ORDER BY dataset")
+
+
+def read_data_version(conn) -> Optional[str]:
+    """Read the version token on a given connection (the read runs before any data query).
+
+    None until the data_versions migration is applied, so reads still work
+    without ETags.
+    """
+    try:
+        with conn.cursor() as cur:
+            db.execute(cur, DATA_VERSIONS)
+            return ",".join(f"{d}:{v}" for d, v in cur.fetchall())
+    except psycopg.errors.UndefinedTable:
+        conn.rollback()
+        return None
+
+
+def scope_version(token: Optional[str], datasets: Optional[Sequence[str]]) -> Optional[str]:
+    """The part of a full version token covering `datasets` (all of it when None)."""
+    if token is None or datasets is None:
+        return token
+    versions = dict(part.split(":", 1) for part in token.split(",") if part)
+    return ",".join(f"{d}:{versions.get(d, 0)}" for d in datasets)
+
+
+def invalidate_data_version():
+    with _DATA_VERSION_LOCK:
+        _DATA_VERSION["fetched_at"] = float("-inf")
+
+
+def make_etag(request: Request, version: str, window: str) -> str:
+    """Weak ETag over data version + time window + normalized query string.
+
+    Weak because the body may be re-encoded (gzip/brotli) on the way out.
+    """
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    raw = f"{version}|{window}|{request.url.path}?{params}"
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:24] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == wanted:
+            return True
+    return False
+
+
+# Clients must revalidate, but a matching ETag turns the poll into an empty 304.
+CHART_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CHART_CACHE_CONTROL})
+
+
+def served_response(served: Served, etag: Optional[str] = None) -> ORJSONResponse:
+    """Serialize straight to orjson (skipping jsonable_encoder), with snapshot/ETag headers."""
+    headers = dict(served.headers)
+    if etag:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = CHART_CACHE_CONTROL
+    return ORJSONResponse(served.payload, headers=headers)
+
+
+def check_cursor(cursor: Optional[str], kind: str, arity: int):
+    """Reject bad continuation tokens with 400 before any DB work."""
+    try:
+        decode_cursor(cursor, kind, arity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+
 # ======================
 # APP
 # ======================
-app = FastAPI(title="Grok Trends API", version="1.0.0")
+app = FastAPI(
+    title="Grok Trends API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    openapi_url=None if SERVERLESS else "/openapi.json",  # also disables /docs and /redoc
+)
 
 VERCEL_PROD = "https://grok-trends-frnl-rh921abyd-ryanatesers-projects.vercel.app"
 CUSTOM_DOMAINS = [
@@ -138,17 +492,102 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     allow_credentials=False,  # IMPORTANT: set False unless you really need cookies/auth
+    expose_headers=["ETag"],
 )
 
+class SelectiveCompressionMiddleware:
+    """Compress responses except long-lived event streams, which must flush per event."""
+
+    def __init__(self, app, compressor, skip_paths=(), **options):
+        self.app = app
+        self.compressed = compressor(app, **options)
+        self.skip_paths = tuple(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.skip_paths):
+            await self.app(scope, receive, send)
+        else:
+            await self.compressed(scope, receive, send)
+
+
+# Compress chart payloads (hundreds of points x N topics). Brotli is used when
+# brotli-asgi is installed; it falls back to gzip for clients without `br`.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+STREAM_PATHS = ("/api/stream",)
+try:
+    from brotli_asgi import BrotliMiddleware
+
+    app.add_middleware(SelectiveCompressionMiddleware, compressor=BrotliMiddleware, skip_paths=STREAM_PATHS,
+                       minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(SelectiveCompressionMiddleware, compressor=GZipMiddleware, skip_paths=STREAM_PATHS,
+                       minimum_size=COMPRESS_MIN_BYTES)
+
+# Per-route latency; added last so it wraps everything, including compression.
+REQUEST_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("route", "method"),
+)
+REQUESTS = metrics.counter("http_requests_total", "Requests by route and status", ("route", "method", "status"))
+app.add_middleware(MetricsMiddleware, latency=REQUEST_LATENCY, requests=REQUESTS, skip_paths=STREAM_PATHS)
+
+metrics.gauge_callback("pgpool_stat", "psycopg_pool get_stats() counters and sizes", _pool_stats, ("pool", "stat"))
+metrics.gauge_callback(
+    "admission_stat", "Admission control slots in use, queue length, admitted/rejected totals",
+    lambda: _admission_samples(), ("stat", "cost"),
+)
+metrics.gauge_callback(
+    "snapshot_stat", "Snapshot store entries and fresh/stale/fallback/miss counts",
+    lambda: {(k,): v for k, v in snapshots.stats().items()}, ("stat",),
+)
+metrics.gauge_callback(
+    "shared_cache_stat", "Cross-process hot-data cache reads",
+    lambda: {(k,): v for k, v in shared_cache.stats().items()} if shared_cache else {}, ("stat",),
+)
+metrics.gauge_callback(
+    "singleflight_stat", "Request coalescing counters",
+    lambda: {(k,): v for k, v in _flights.stats().items()}, ("stat",),
+)
+
+# One LISTEN connection per process, fanned out to every SSE client.
+LIVE_UPDATES = os.getenv("LIVE_UPDATES", "0" if SERVERLESS else "1") == "1"
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+broadcaster = TrendsBroadcaster(db.conninfo())
+broadcaster.on_notify.append(invalidate_data_version)
+
+
+@app.exception_handler(Overloaded)
+def _overloaded(request: Request, exc: Overloaded):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 @app.on_event("startup")
 def _startup():
+    if SERVERLESS:
+        return  # connect on the first query; no background threads to start
     # warm the pool so import-time failures don’t crash the process
     make_pool()
+    if LIVE_UPDATES:
+        broadcaster.start()
+    if hot_refresher is not None:
+        hot_refresher.start()
+    if signup_buffer is not None:
+        signup_buffer.start()
+    webhook_worker.start()
 
 
 @app.on_event("shutdown")
 def _shutdown():
+    broadcaster.stop()
+    if hot_refresher is not None:
+        hot_refresher.stop()
+    snapshots.shutdown()
+    if signup_buffer is not None:
+        signup_buffer.stop()  # final flush needs the pool
+    webhook_worker.stop()
     close_pool()
 
 
@@ -163,7 +602,13 @@ def root():
             "/api/stats": "Get platform statistics",
             "/api/categories": "Category rollups",
             "/api/interest": "Hourly 0–100 index series",
+            "/api/breakouts": "Topics spiking above their hourly baseline",
+            "/api/trending-now": "Top topics over the last 15m / 1h / 6h",
+            "/api/batch": "Run several read queries in one request",
+            "/api/export": "Stream hourly/daily rollups as CSV or NDJSON",
+            "/api/stream": "Server-Sent Events: leaderboard diffs + latest hourly bucket",
             "/health": "Health check",
+            "/metrics": "Prometheus metrics",
         },
     }
 
@@ -171,223 +616,272 @@ def root():
 @app.get("/health")
 def health_check():
     ok = ping_db()
-    return {"status": "healthy" if ok else "unhealthy", "database": "connected" if ok else "down"}
+    # With the DB down we can still serve last-good snapshots.
+    status = "healthy" if ok else ("degraded" if snapshots.has_any() else "unhealthy")
+    return {
+        "status": status,
+        "database": "connected" if ok else "down",
+        "coalescing": _flights.stats(),
+        "snapshots": snapshots.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text exposition: pool stats, pool wait histogram, per-route latency."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 # ======================
 # QUERIES
 # ======================
-@app.get("/api/trends")
-def get_trends(
-        days: int = Query(7, ge=1, le=90),
-        category: Optional[str] = Query(None),
-        limit: int = Query(20, ge=1, le=100),
-):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            params = [days]
-            cat_sql = ""
-            if category and category != "all":
-                cat_sql = "AND category = %s"
-                params.append(category)
-            params.append(limit)
+# Each query_* function runs on a borrowed connection and returns a plain
+# payload, so routes and /api/batch share the same SQL.
+# Keyset order shared by trend_leaderboard and the live fallback. All columns
+# DESC, so one row comparison against the cursor is an index range condition.
+TRENDS_ORDER = "total_mentions DESC, avg_growth DESC, topic_name DESC, category DESC"
+SEARCH_ORDER = "mentions DESC, topic_name DESC, category DESC"
+TRENDS_CURSOR_ARITY = 4  # (total_mentions, avg_growth, topic_name, category)
+SEARCH_CURSOR_ARITY = 3  # (mentions, topic_name, category)
 
+
+ROLLUP_READY = db.statement("rollup_ready", "SELECT as_of = CURRENT_DATE FROM rollup_state WHERE name = %s")
+
+
+def _rollup_ready(cur, name: str, same_day: bool = True) -> bool:
+    """True if the collector has built listing `name` (today, for date-relative windows)."""
+    try:
+        db.execute(cur, ROLLUP_READY, (name,))
+    except psycopg.errors.UndefinedTable:  # migration 005 not applied yet
+        cur.connection.rollback()
+        return False
+    row = cur.fetchone()
+    return bool(row) and (row[0] or not same_day)
+
+
+def query_trends(conn, days: int, category: Optional[str], limit: int, fmt: str = "rows",
+                 cursor: Optional[str] = None) -> dict:
+    after = decode_cursor(cursor, "trends", TRENDS_CURSOR_ARITY)
+    with conn.cursor() as cur:
+        filters, params = [], []
+        if _rollup_ready(cur, f"leaderboard:{days}"):
+            source = "trend_leaderboard"
+            filters.append("window_days = %s")
+        else:
+            # Same columns as trend_leaderboard, aggregated on the fly.
             # Use INTERVAL '1 day' * %s (safe parameterization)
-            cur.execute(
-                f"""
-                SELECT topic_name, category,
+            source = """(
+                SELECT topic_name, COALESCE(category, '') AS category,
                        SUM(mention_count) AS total_mentions,
-                       AVG(growth_rate)   AS avg_growth
+                       COALESCE(AVG(growth_rate), 0)::float8 AS avg_growth
                 FROM trend_aggregations
                 WHERE date >= CURRENT_DATE - INTERVAL '1 day' * %s
-                {cat_sql}
-                GROUP BY topic_name, category
-                ORDER BY total_mentions DESC, avg_growth DESC
-                LIMIT %s
-                """,
-                params,
-            )
-            topics_raw = cur.fetchall()
-
-            trending_topics = [
-                {
-                    "topic": t,
-                    "category": c,
-                    "mentions": int(m),
-                    "growth": round(float(g or 0), 1),
-                    "rank": i + 1,
-                }
-                for i, (t, c, m, g) in enumerate(topics_raw)
-            ]
-
-            # Tiny chart on top 3
-            top_topics = [t["topic"] for t in trending_topics[:3]]
-            chart_data = []
-            if top_topics:
-                cur.execute(
-                    """
-                    SELECT date, topic_name, mention_count
-                    FROM trend_aggregations
-                    WHERE date >= CURRENT_DATE - INTERVAL '1 day' * %s
-                      AND topic_name = ANY(%s)
-                    ORDER BY date ASC
-                    """,
-                    (days, top_topics),
-                )
-                date_map = {}
-                for date, topic, count in cur.fetchall():
-                    key = date.isoformat()
-                    date_map.setdefault(key, {"time": key})
-                    date_map[key][topic] = int(count)
-                chart_data = list(date_map.values())
-
-            # Stats
+                GROUP BY topic_name, COALESCE(category, '')
+            ) AS live"""
+        params.append(days)
+        if category and category != "all":
+            filters.append("category = %s")
+            params.append(category)
+        if after:
+            filters.append("(total_mentions, avg_growth, topic_name, category) < (%s, %s, %s, %s)")
+            params.extend(after.key)
+        params.append(limit + 1)  # one extra row tells us whether there is a next page
+
+        # A handful of shapes (source x filters), each prepared once per connection.
+        db.execute(
+            cur,
+            f"""
+            SELECT topic_name, category, total_mentions, avg_growth
+            FROM {source}
+            {"WHERE " + " AND ".join(filters) if filters else ""}
+            ORDER BY {TRENDS_ORDER}
+            LIMIT %s
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+
+        first_rank = after.rank + 1 if after else 1
+        cont = next_cursor("trends", rows, limit, lambda r: (int(r[2]), float(r[3]), r[0], r[1]), first_rank)
+        trending_topics = [
+            {
+                "topic": t,
+                "category": c,
+                "mentions": int(m),
+                "growth": round(float(g or 0), 1),
+                "rank": first_rank + i,
+            }
+            for i, (t, c, m, g) in enumerate(rows[:limit])
+        ]
+        metadata = {
+            "days": days,
+            "category": category or "all",
+            "format": fmt,
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+        }
+        if after:
+            # Continuation pages walk the long tail: no chart or stats, constant cost.
+            return {"trending_topics": trending_topics, "next_cursor": cont, "metadata": metadata}
+
+        # Tiny chart on top 3
+        top_topics = [t["topic"] for t in trending_topics[:3]]
+        chart_data = shape_series((), fmt, top_topics)
+        if top_topics:
             cur.execute(
                 """
-                SELECT COUNT(DISTINCT tweet_id), COUNT(DISTINCT topic_name)
-                FROM topics
-                WHERE mentioned_at >= CURRENT_DATE - INTERVAL '30 days'
-                """
+                SELECT date, topic_name, mention_count
+                FROM trend_aggregations
+                WHERE date >= CURRENT_DATE - INTERVAL '1 day' * %s
+                  AND topic_name = ANY(%s)
+                ORDER BY date ASC
+                """,
+                (days, top_topics),
             )
-            total_tweets, active_topics = cur.fetchone()
-
-            cur.execute(
-                """
-                SELECT EXTRACT(HOUR FROM mentioned_at)::INT AS hour, COUNT(*) AS count
-                FROM topics
-                WHERE mentioned_at >= CURRENT_DATE - INTERVAL '7 days'
-                GROUP BY hour
-                ORDER BY count DESC
-                LIMIT 1
-                """
+            chart_data = shape_series(
+                ((date.isoformat(), topic, int(count)) for date, topic, count in cur.fetchall()),
+                fmt,
+                top_topics,
             )
-            peak = cur.fetchone()
-            peak_hour = f"{int(peak[0])}:00" if peak else "N/A"
 
-            cur.execute(
-                """
-                SELECT AVG(growth_rate)
-                FROM trend_aggregations
-                WHERE date >= CURRENT_DATE - INTERVAL '7 days'
-                """
-            )
-            avg_growth_row = cur.fetchone()
-            avg_growth = round(float(avg_growth_row[0] or 0), 1) if avg_growth_row else 0
+    # Stats: independent of each other, so pipeline them into one round trip.
+    with conn.pipeline():
+        totals_cur = conn.execute(
+            """
+            SELECT COUNT(DISTINCT tweet_id), COUNT(DISTINCT topic_name)
+            FROM topics
+            WHERE mentioned_at >= CURRENT_DATE - INTERVAL '30 days'
+            """
+        )
+        peak_cur = conn.execute(
+            """
+            SELECT EXTRACT(HOUR FROM mentioned_at)::INT AS hour, COUNT(*) AS count
+            FROM topics
+            WHERE mentioned_at >= CURRENT_DATE - INTERVAL '7 days'
+            GROUP BY hour
+            ORDER BY count DESC
+            LIMIT 1
+            """
+        )
+        growth_cur = conn.execute(
+            """
+            SELECT AVG(growth_rate)
+            FROM trend_aggregations
+            WHERE date >= CURRENT_DATE - INTERVAL '7 days'
+            """
+        )
+    total_tweets, active_topics = totals_cur.fetchone()
+    peak = peak_cur.fetchone()
+    peak_hour = f"{int(peak[0])}:00" if peak else "N/A"
+    avg_growth_row = growth_cur.fetchone()
+    avg_growth = round(float(avg_growth_row[0] or 0), 1) if avg_growth_row else 0
 
-        return {
-            "trending_topics": trending_topics,
-            "chart_data": chart_data,
-            "stats": {
-                "total_queries": f"{(total_tweets or 0):,}",
-                "active_topics": int(active_topics or 0),
-                "peak_hour": peak_hour,
-                "avg_growth": f"+{avg_growth}%" if avg_growth >= 0 else f"{avg_growth}%",
-            },
-            "metadata": {
-                "days": days,
-                "category": category or "all",
-                "generated_at": datetime.utcnow().isoformat() + "Z",
-            },
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        put_conn(conn)
+    return {
+        "trending_topics": trending_topics,
+        "next_cursor": cont,
+        "chart_data": chart_data,
+        "stats": {
+            "total_queries": f"{(total_tweets or 0):,}",
+            "active_topics": int(active_topics or 0),
+            "peak_hour": peak_hour,
+            "avg_growth": f"+{avg_growth}%" if avg_growth >= 0 else f"{avg_growth}%",
+        },
+        "metadata": metadata,
+    }
 
 
-@app.get("/api/topics/search")
-def search_topics(q: str = Query(..., min_length=2), limit: int = Query(10, ge=1, le=50)):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT topic_name, category, COUNT(*) AS mentions
+def query_search(conn, q: str, limit: int, cursor: Optional[str] = None) -> dict:
+    after = decode_cursor(cursor, "topics/search", SEARCH_CURSOR_ARITY)
+    pattern = f"%{q}%"
+    with conn.cursor() as cur:
+        params = []
+        if _rollup_ready(cur, "topic_totals", same_day=False):
+            source = "topic_totals"  # trigram index serves the ILIKE
+        else:
+            source = """(
+                SELECT topic_name, COALESCE(category, '') AS category, COUNT(*) AS mentions
                 FROM topics
                 WHERE topic_name ILIKE %s
-                GROUP BY topic_name, category
-                ORDER BY mentions DESC
-                LIMIT %s
-                """,
-                (f"%{q}%", limit),
-            )
-            rows = cur.fetchall()
-        return {"results": [{"topic": t, "category": c, "mentions": int(m)} for t, c, m in rows]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        put_conn(conn)
+                GROUP BY topic_name, COALESCE(category, '')
+            ) AS live"""
+            params.append(pattern)
+        filters = ["topic_name ILIKE %s"]
+        params.append(pattern)
+        if after:
+            filters.append("(mentions, topic_name, category) < (%s, %s, %s)")
+            params.extend(after.key)
+        params.append(limit + 1)
+
+        db.execute(
+            cur,
+            f"""
+            SELECT topic_name, category, mentions
+            FROM {source}
+            WHERE {" AND ".join(filters)}
+            ORDER BY {SEARCH_ORDER}
+            LIMIT %s
+            """,
+            params,
+        )
+        rows = cur.fetchall()
 
+    first_rank = after.rank + 1 if after else 1
+    return {
+        "results": [{"topic": t, "category": c, "mentions": int(m)} for t, c, m in rows[:limit]],
+        "next_cursor": next_cursor("topics/search", rows, limit, lambda r: (int(r[2]), r[0], r[1]), first_rank),
+    }
 
-@app.get("/api/stats")
-def get_stats():
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM raw_tweets")
-            total_tweets = cur.fetchone()[0] or 0
 
-            cur.execute("SELECT COUNT(DISTINCT topic_name) FROM topics")
-            total_topics = cur.fetchone()[0] or 0
+STATS_QUERIES = [
+    (db.statement("stats_tweets", "SELECT COUNT(*) FROM raw_tweets"), None),
+    (db.statement("stats_topics", "SELECT COUNT(DISTINCT topic_name) FROM topics"), None),
+    (db.statement(
+        "stats_month_collected",
+        "SELECT COALESCE(SUM(posts_pulled), 0) FROM api_usage WHERE query_date >= DATE_TRUNC('month', CURRENT_DATE)",
+    ), None),
+    (db.statement("stats_started", "SELECT MIN(created_at) FROM raw_tweets"), None),
+]
 
-            cur.execute(
-                """
-                SELECT COALESCE(SUM(posts_pulled), 0)
-                FROM api_usage
-                WHERE query_date >= DATE_TRUNC('month', CURRENT_DATE)
-                """
-            )
-            month_collected = cur.fetchone()[0] or 0
 
-            cur.execute("SELECT MIN(created_at) FROM raw_tweets")
-            started = cur.fetchone()[0]
+def query_stats(conn) -> dict:
+    # Four independent scalars: pipeline them into one round trip.
+    total_tweets, total_topics, month_collected, started = (
+        rows[0][0] for rows in db.pipelined(conn, STATS_QUERIES)
+    )
 
-        return {
-            "total_tweets": int(total_tweets),
-            "total_topics": int(total_topics),
-            "month_collected": int(month_collected),
-            "collection_started": started.isoformat() if started else None,
-            "days_active": (datetime.utcnow() - started).days if started else 0,
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        put_conn(conn)
+    return {
+        "total_tweets": int(total_tweets or 0),
+        "total_topics": int(total_topics or 0),
+        "month_collected": int(month_collected or 0),
+        "collection_started": started.isoformat() if started else None,
+        "days_active": (datetime.utcnow() - started).days if started else 0,
+    }
 
 
-@app.get("/api/categories")
-def get_categories():
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT category,
-                       COUNT(DISTINCT topic_name) AS topic_count,
-                       SUM(mention_count)         AS total_mentions
-                FROM trend_aggregations
-                WHERE date >= CURRENT_DATE - INTERVAL '7 days'
-                GROUP BY category
-                ORDER BY total_mentions DESC NULLS LAST
-                """
-            )
-            rows = cur.fetchall()
-        return {
-            "categories": [
-                {
-                    "id": cat,
-                    "name": (cat or "").capitalize(),
-                    "topic_count": int(tc or 0),
-                    "mentions": int(m or 0),
-                }
-                for cat, tc, m in rows
-            ]
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        put_conn(conn)
+def query_categories(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT category,
+                   COUNT(DISTINCT topic_name) AS topic_count,
+                   SUM(mention_count)         AS total_mentions
+            FROM trend_aggregations
+            WHERE date >= CURRENT_DATE - INTERVAL '7 days'
+            GROUP BY category
+            ORDER BY total_mentions DESC NULLS LAST
+            """
+        )
+        rows = cur.fetchall()
+    return {
+        "categories": [
+            {
+                "id": cat,
+                "name": (cat or "").capitalize(),
+                "topic_count": int(tc or 0),
+                "mentions": int(m or 0),
+            }
+            for cat, tc, m in rows
+        ]
+    }
 
 
 from enum import Enum
@@ -398,146 +892,766 @@ class Normalize(str, Enum):
     global_ = "global"
     none = "none"
 
+
+def query_interest(conn, topics: List[str], hours: int, metric: str, normalize: Normalize, fmt: str = "rows") -> dict:
+    with conn.cursor() as cur:
+        base_sql = f"""
+        WITH params AS (
+            SELECT date_trunc('hour', NOW() AT TIME ZONE 'UTC') AS now_hr,
+                   %s::INT AS hours_back
+        ),
+        series AS (
+            SELECT generate_series(
+                (SELECT now_hr - (hours_back || ' hours')::interval FROM params),
+                (SELECT now_hr FROM params),
+                '1 hour'::interval
+            ) AS bucket_ts
+        ),
+        raw AS (
+            SELECT ta.bucket_ts, ta.topic_name, ta.category,
+                   ta.{ 'weighted' if metric=='weighted' else 'mentions' } AS v
+            FROM trend_agg_hourly ta
+            WHERE ta.bucket_ts >= (SELECT MIN(bucket_ts) FROM series)
+              AND ta.topic_name = ANY(%s)
+        ),
+        joined AS (
+            SELECT s.bucket_ts, r.topic_name, r.category, COALESCE(r.v, 0) AS v
+            FROM series s
+            LEFT JOIN raw r ON r.bucket_ts = s.bucket_ts
+        )
+        """
+
+        if normalize == Normalize.per_topic:
+            sql = base_sql + """
+            , maxes AS (
+                SELECT topic_name, category, MAX(v) AS vmax
+                FROM joined
+                GROUP BY topic_name, category
+            )
+            SELECT j.bucket_ts, j.topic_name, j.category,
+                   CASE WHEN m.vmax > 0 THEN ROUND(100.0 * j.v / m.vmax)::INT ELSE 0 END AS val
+            FROM joined j
+            JOIN maxes m USING (topic_name, category)
+            ORDER BY j.bucket_ts ASC, j.topic_name ASC
+            """
+            cur.execute(sql, (hours, topics))
+
+        elif normalize == Normalize.global_:
+            sql = base_sql + """
+            , g AS (
+                SELECT MAX(v) AS gmax FROM joined
+            )
+            SELECT j.bucket_ts, j.topic_name, j.category,
+                   CASE WHEN g.gmax > 0 THEN ROUND(100.0 * j.v / g.gmax)::INT ELSE 0 END AS val
+            FROM joined j, g
+            ORDER BY j.bucket_ts ASC, j.topic_name ASC
+            """
+            cur.execute(sql, (hours, topics))
+
+        else:  # Normalize.none
+            sql = base_sql + """
+            SELECT j.bucket_ts, j.topic_name, j.category, j.v AS val
+            FROM joined j
+            ORDER BY j.bucket_ts ASC, j.topic_name ASC
+            """
+            cur.execute(sql, (hours, topics))
+
+        rows = cur.fetchall()
+
+    series = shape_series(
+        ((ts.replace(tzinfo=None).isoformat() + "Z", topic, int(val)) for ts, topic, cat, val in rows),
+        fmt,
+        topics,
+    )
+
+    return {
+        "metric": metric,
+        "hours": hours,
+        "topics": topics,
+        "normalize": normalize,
+        "format": fmt,
+        "series": series
+    }
+
+
+def query_breakouts(conn, hours: int, category: Optional[str], limit: int, include_partial: bool = True) -> dict:
+    """Breakouts precomputed by analysis/etl_/breakouts.py, newest hour first."""
+    filters, params = ["bucket_ts >= date_trunc('hour', NOW()) - INTERVAL '1 hour' * %s"], [hours]
+    if category and category != "all":
+        filters.append("category = %s")
+        params.append(category)
+    if not include_partial:
+        filters.append("NOT partial")
+    params.append(limit)
+    with conn.cursor() as cur:
+        try:
+            db.execute(
+                cur,
+                f"""
+                SELECT topic_name, category, bucket_ts, mentions, expected, z_score, lift, onset_at, partial
+                FROM trend_breakouts
+                WHERE {" AND ".join(filters)}
+                ORDER BY bucket_ts DESC, z_score DESC
+                LIMIT %s
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+        except psycopg.errors.UndefinedTable:  # migration 013 not applied yet
+            conn.rollback()
+            rows = []
+    return {
+        "breakouts": [
+            {
+                "topic": t,
+                "category": c,
+                "hour": ts.replace(tzinfo=None).isoformat() + "Z",
+                "mentions": int(m),
+                "expected": round(float(e), 2),
+                "z_score": round(float(z), 2),
+                "lift": round(float(lift), 2),
+                "onset": onset.replace(tzinfo=None).isoformat() + "Z",
+                "partial": bool(partial),
+            }
+            for t, c, ts, m, e, z, lift, onset, partial in rows
+        ],
+        "metadata": {
+            "hours": hours,
+            "category": category or "all",
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+        },
+    }
+
+
+TRENDING_PANES = db.statement(
+    "trending_panes",
+    """
+    SELECT capacity, topics, categories, counts, errors
+    FROM topic_sketch_panes
+    WHERE window_name = %s AND pane_start >= %s
+    """,
+)
+
+
+def query_trending_now(conn, window: str, category: Optional[str], limit: int) -> dict:
+    """Top topics over a sliding window, merged from the collector's checkpointed panes."""
+    span, pane = TRENDING_WINDOWS[window]
+    oldest = oldest_pane(span, pane, time.time())
+    with conn.cursor() as cur:
+        try:
+            db.execute(cur, TRENDING_PANES, (window, datetime.fromtimestamp(oldest, tz=timezone.utc)))
+            rows = cur.fetchall()
+        except psycopg.errors.UndefinedTable:  # migration 014 not applied yet
+            conn.rollback()
+            rows = []
+    panes = [SpaceSaving.from_rows(capacity, *arrays) for capacity, *arrays in rows]
+    if category and category != "all":
+        # Rank everything first, so "guaranteed" refers to the full ranking.
+        ranked = merge_panes(panes, sum(len(p.counts) for p in panes))
+        topics = [t for t in ranked if t["category"] == category][:limit]
+    else:
+        topics = merge_panes(panes, limit)
+    return {
+        "window": window,
+        "topics": topics,
+        "metadata": {
+            "category": category or "all",
+            "panes": len(panes),
+            "pane_seconds": pane,
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+        },
+    }
+
+
+def query_interest_count(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM interest_signups")
+        count = int(cur.fetchone()[0] or 0)
+    return {"count": count}
+
+
+# ======================
+# ROUTES
+# ======================
+@app.get("/api/trends")
+def get_trends(
+        request: Request,
+        days: int = Query(7, ge=1, le=90),
+        category: Optional[str] = Query(None),
+        limit: int = Query(20, ge=1, le=100, description="Page size"),
+        fmt: str = Query("rows", alias="format", pattern="^(rows|columnar)$",
+                         description="'rows' (one object per timestamp) | 'columnar' (parallel arrays)"),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    check_cursor(cursor, "trends", TRENDS_CURSOR_ARITY)
+    # Daily rollups: the window also moves when the UTC date changes.
+    window = datetime.utcnow().date().isoformat()
+    version = get_data_version(READ_DATASETS["trends"])
+    if version is not None:
+        etag = make_etag(request, version, window)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    served = read_query("trends", query_trends, days, category, limit, fmt, cursor,
+                        error_prefix="Database error: ")
+    # Tag with the version the payload was built at, which may trail `version`
+    # when a snapshot is served.
+    return served_response(served, make_etag(request, served.version, window) if served.version else None)
+
+
+@app.get("/api/topics/search")
+def search_topics(
+        q: str = Query(..., min_length=2),
+        limit: int = Query(10, ge=1, le=50, description="Page size"),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    check_cursor(cursor, "topics/search", SEARCH_CURSOR_ARITY)
+    return served_response(read_query("topics/search", query_search, q, limit, cursor))
+
+
+@app.get("/api/stats")
+def get_stats():
+    return served_response(read_query("stats", query_stats))
+
+
+@app.get("/api/categories")
+def get_categories():
+    return served_response(read_query("categories", query_categories))
+
+
 @app.get("/api/interest")
 def interest_over_time(
+        request: Request,
         topics: List[str] = Query(..., description="One or more topic names"),
         hours: int = Query(48, ge=1, le=720, description="Window in hours"),
         metric: str = Query("weighted", pattern="^(weighted|mentions)$"),
-        normalize: Normalize = Query(Normalize.per_topic, description="'per_topic' | 'global' | 'none'")
+        normalize: Normalize = Query(Normalize.per_topic, description="'per_topic' | 'global' | 'none'"),
+        fmt: str = Query("rows", alias="format", pattern="^(rows|columnar)$",
+                         description="'rows' (one object per timestamp) | 'columnar' (parallel arrays)"),
 ):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            base_sql = f"""
-            WITH params AS (
-                SELECT date_trunc('hour', NOW() AT TIME ZONE 'UTC') AS now_hr,
-                       %s::INT AS hours_back
-            ),
-            series AS (
-                SELECT generate_series(
-                    (SELECT now_hr - (hours_back || ' hours')::interval FROM params),
-                    (SELECT now_hr FROM params),
-                    '1 hour'::interval
-                ) AS bucket_ts
-            ),
-            raw AS (
-                SELECT ta.bucket_ts, ta.topic_name, ta.category,
-                       ta.{ 'weighted' if metric=='weighted' else 'mentions' } AS v
-                FROM trend_agg_hourly ta
-                WHERE ta.bucket_ts >= (SELECT MIN(bucket_ts) FROM series)
-                  AND ta.topic_name = ANY(%s)
-            ),
-            joined AS (
-                SELECT s.bucket_ts, r.topic_name, r.category, COALESCE(r.v, 0) AS v
-                FROM series s
-                LEFT JOIN raw r ON r.bucket_ts = s.bucket_ts
-            )
-            """
+    # Hourly series: the generated window slides at the top of every UTC hour.
+    window = datetime.utcnow().strftime("%Y-%m-%dT%H")
+    version = get_data_version(READ_DATASETS["interest"])
+    if version is not None:
+        etag = make_etag(request, version, window)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    served = read_query("interest", query_interest, topics, hours, metric, normalize, fmt,
+                        cost="expensive" if hours > INTEREST_CHEAP_HOURS else "cheap",
+                        error_prefix="Interest API error: ")
+    return served_response(served, make_etag(request, served.version, window) if served.version else None)
+
+
+@app.get("/api/trending-now")
+def get_trending_now(
+        window: str = Query("1h", pattern="^(15m|1h|6h)$"),
+        category: Optional[str] = Query(None),
+        limit: int = Query(20, ge=1, le=100),
+):
+    """Top topics over a sliding window, from the collector's bounded-memory sketch."""
+    return served_response(read_query("trending-now", query_trending_now, window, category, limit))
 
-            if normalize == Normalize.per_topic:
-                sql = base_sql + """
-                , maxes AS (
-                    SELECT topic_name, category, MAX(v) AS vmax
-                    FROM joined
-                    GROUP BY topic_name, category
-                )
-                SELECT j.bucket_ts, j.topic_name, j.category,
-                       CASE WHEN m.vmax > 0 THEN ROUND(100.0 * j.v / m.vmax)::INT ELSE 0 END AS val
-                FROM joined j
-                JOIN maxes m USING (topic_name, category)
-                ORDER BY j.bucket_ts ASC, j.topic_name ASC
-                """
-                cur.execute(sql, (hours, topics))
 
-            elif normalize == Normalize.global_:
-                sql = base_sql + """
-                , g AS (
-                    SELECT MAX(v) AS gmax FROM joined
-                )
-                SELECT j.bucket_ts, j.topic_name, j.category,
-                       CASE WHEN g.gmax > 0 THEN ROUND(100.0 * j.v / g.gmax)::INT ELSE 0 END AS val
-                FROM joined j, g
-                ORDER BY j.bucket_ts ASC, j.topic_name ASC
-                """
-                cur.execute(sql, (hours, topics))
+@app.get("/api/breakouts")
+def get_breakouts(
+        request: Request,
+        hours: int = Query(24, ge=1, le=720, description="Look-back window in hours"),
+        category: Optional[str] = Query(None),
+        limit: int = Query(50, ge=1, le=200),
+        include_partial: bool = Query(True, description="Include provisional scores for the hour in progress"),
+):
+    """Topics spiking above their hourly baseline (z-score, lift, onset)."""
+    window = datetime.utcnow().strftime("%Y-%m-%dT%H")
+    version = get_data_version(READ_DATASETS["breakouts"])
+    if version is not None:
+        etag = make_etag(request, version, window)
+        if etag_matches(request, etag):
+            return not_modified(etag)
 
-            else:  # Normalize.none
-                sql = base_sql + """
-                SELECT j.bucket_ts, j.topic_name, j.category, j.v AS val
-                FROM joined j
-                ORDER BY j.bucket_ts ASC, j.topic_name ASC
-                """
-                cur.execute(sql, (hours, topics))
+    served = read_query("breakouts", query_breakouts, hours, category, limit, include_partial)
+    return served_response(served, make_etag(request, served.version, window) if served.version else None)
 
-            rows = cur.fetchall()
 
-        out = {}
-        for ts, topic, cat, val in rows:
-            key = ts.replace(tzinfo=None).isoformat() + "Z"
-            out.setdefault(key, {"time": key})
-            out[key][topic] = int(val)
+# ================
+# Export (streaming)
+# ================
+# Bulk download of the rollup tables. Rows go from Postgres to the socket in
+# bounded chunks -- COPY ... TO STDOUT for CSV, a server-side cursor for
+# NDJSON -- so memory stays flat however many rows match.
+EXPORT_DATASETS = {
+    # name: (table, time column, columns)
+    "hourly": ("trend_agg_hourly", "bucket_ts", ("bucket_ts", "topic_name", "category", "mentions", "weighted")),
+    "daily": ("trend_aggregations", "date", ("date", "topic_name", "category", "mention_count", "growth_rate")),
+}
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+EXPORT_FETCH_ROWS = int(os.getenv("EXPORT_FETCH_ROWS", "5000"))
+# Exports outlive the API's default statement_timeout; 0 disables the limit.
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("EXPORT_STATEMENT_TIMEOUT_MS", "600000"))
+
+
+def _export_query(dataset: str, topics: List[str], category: Optional[str],
+                  start: Optional[datetime], end: Optional[datetime]):
+    table, time_col, columns = EXPORT_DATASETS[dataset]
+    filters, params = [], []
+    if topics:
+        filters.append("topic_name = ANY(%s)")
+        params.append(topics)
+    if category:
+        filters.append("category = %s")
+        params.append(category)
+    if start:
+        filters.append(f"{time_col} >= %s")
+        params.append(start)
+    if end:
+        filters.append(f"{time_col} < %s")
+        params.append(end)
+    sql = f"""
+        SELECT {", ".join(columns)}
+        FROM {table}
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        ORDER BY {time_col}, topic_name, category
+    """
+    return sql, params
+
+
+def _export_rows(dataset: str, fmt: str, sql: str, params: list):
+    """Yield encoded chunks; the connection is held only while the generator is alive."""
+    with pooled_conn("expensive", readonly=True) as conn:
+        try:
+            conn.execute(f"SET LOCAL statement_timeout = {EXPORT_STATEMENT_TIMEOUT_MS}")
+            buf = bytearray()
+            if fmt == "csv":
+                with conn.cursor() as cur:
+                    with cur.copy(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", params) as copy:
+                        for data in copy:
+                            buf += data
+                            if len(buf) >= EXPORT_CHUNK_BYTES:
+                                yield bytes(buf)
+                                buf.clear()
+            else:
+                columns = EXPORT_DATASETS[dataset][2]
+                opts = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+                with conn.cursor(name="export") as cur:
+                    cur.itersize = EXPORT_FETCH_ROWS
+                    cur.execute(sql, params)
+                    while rows := cur.fetchmany(EXPORT_FETCH_ROWS):
+                        for row in rows:
+                            buf += orjson.dumps(dict(zip(columns, row)), option=opts)
+                            buf += b"\n"
+                        if len(buf) >= EXPORT_CHUNK_BYTES:
+                            yield bytes(buf)
+                            buf.clear()
+            yield bytes(buf)
+        finally:
+            conn.rollback()  # end the read transaction (and the SET LOCAL) before the conn goes back
 
-        return {
-            "metric": metric,
-            "hours": hours,
-            "topics": topics,
-            "normalize": normalize,
-            "series": list(out.values())
-        }
+
+@app.get("/api/export")
+def export_data(
+        dataset: Literal["hourly", "daily"] = Query("hourly", description="'hourly' (trend_agg_hourly) | 'daily' (trend_aggregations)"),
+        fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+        topics: List[str] = Query([], description="Topic names (default: all)"),
+        category: Optional[str] = Query(None),
+        start: Optional[datetime] = Query(None, description="Inclusive lower bound (UTC)"),
+        end: Optional[datetime] = Query(None, description="Exclusive upper bound (UTC)"),
+):
+    sql, params = _export_query(dataset, topics, category, start, end)
+    rows = _export_rows(dataset, fmt, sql, params)
+    # Run up to the first chunk here, so admission, pool and SQL errors still
+    # become a proper status code instead of a truncated 200.
+    try:
+        first = next(rows)
+    except StopIteration:
+        first = b""
+    except (Overloaded, HTTPException):
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Interest API error: {e}")
-    finally:
-        put_conn(conn)
+        raise HTTPException(status_code=500, detail=f"Export error: {e}")
+
+    table = EXPORT_DATASETS[dataset][0]
+    return StreamingResponse(
+        itertools.chain((first,), rows),  # dropping `rows` closes it and releases the connection
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
+
+
+# ================
+# Batch queries
+# ================
+# Parameter models mirror the Query(...) constraints on the GET routes.
+class _BatchParams(BaseModel):
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+
+class TrendsParams(_BatchParams):
+    days: int = Field(7, ge=1, le=90)
+    category: Optional[str] = None
+    limit: int = Field(20, ge=1, le=100)
+    fmt: str = Field("rows", alias="format", pattern="^(rows|columnar)$")
+    cursor: Optional[str] = None
+
+    @field_validator("cursor")
+    @classmethod
+    def _check_cursor(cls, v):
+        decode_cursor(v, "trends", TRENDS_CURSOR_ARITY)
+        return v
+
+
+class SearchParams(_BatchParams):
+    q: str = Field(..., min_length=2)
+    limit: int = Field(10, ge=1, le=50)
+    cursor: Optional[str] = None
+
+    @field_validator("cursor")
+    @classmethod
+    def _check_cursor(cls, v):
+        decode_cursor(v, "topics/search", SEARCH_CURSOR_ARITY)
+        return v
+
+
+class InterestParams(_BatchParams):
+    topics: List[str] = Field(..., min_length=1)
+    hours: int = Field(48, ge=1, le=720)
+    metric: str = Field("weighted", pattern="^(weighted|mentions)$")
+    normalize: Normalize = Normalize.per_topic
+    fmt: str = Field("rows", alias="format", pattern="^(rows|columnar)$")
+
+
+class BreakoutsParams(_BatchParams):
+    hours: int = Field(24, ge=1, le=720)
+    category: Optional[str] = None
+    limit: int = Field(50, ge=1, le=200)
+    include_partial: bool = True
+
+
+class TrendingNowParams(_BatchParams):
+    window: str = Field("1h", pattern="^(15m|1h|6h)$")
+    category: Optional[str] = None
+    limit: int = Field(20, ge=1, le=100)
+
+
+class NoParams(_BatchParams):
+    pass
+
+
+BATCH_ENDPOINTS = {
+    "trends": (TrendsParams, query_trends),
+    "topics/search": (SearchParams, query_search),
+    "stats": (NoParams, query_stats),
+    "categories": (NoParams, query_categories),
+    "interest": (InterestParams, query_interest),
+    "breakouts": (BreakoutsParams, query_breakouts),
+    "trending-now": (TrendingNowParams, query_trending_now),
+    "interest-count": (NoParams, query_interest_count),
+}
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+
+
+class BatchSubQuery(BaseModel):
+    id: Optional[str] = None
+    endpoint: Literal["trends", "topics/search", "stats", "categories", "interest", "breakouts",
+                      "trending-now", "interest-count"]
+    params: dict = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    queries: List[BatchSubQuery] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES)
+
+
+@app.post("/api/batch")
+def batch_query(batch: BatchRequest):
+    """Answer several read queries on one pooled connection.
+
+    Identical sub-queries (same endpoint + validated params) run once. Each
+    result carries its own status so one failing sub-query doesn't sink the rest.
+    """
+    planned = []  # (id, key or None, error or None)
+    unique = {}   # key -> (fn, kwargs)
+    for i, q in enumerate(batch.queries):
+        model, fn = BATCH_ENDPOINTS[q.endpoint]
+        try:
+            p = model.model_validate(q.params)
+        except ValidationError as e:
+            planned.append((q.id or str(i), None, e.errors(include_url=False, include_context=False)))
+            continue
+        kwargs = p.model_dump()
+        key = (q.endpoint, repr(sorted(kwargs.items())))
+        unique.setdefault(key, (fn, kwargs))
+        planned.append((q.id or str(i), key, None))
+
+    outputs = {}
+    if unique:
+        # One connection held for several queries: classed as expensive.
+        with pooled_conn("expensive", readonly=True) as conn:
+            for key, (fn, kwargs) in unique.items():
+                try:
+                    outputs[key] = {"status": 200, "data": fn(conn, **kwargs)}
+                except Exception as e:
+                    conn.rollback()
+                    outputs[key] = {"status": 500, "error": str(e)}
+
+    results = []
+    for qid, key, error in planned:
+        if key is None:
+            results.append({"id": qid, "status": 422, "error": error})
+        else:
+            results.append({"id": qid, **outputs[key]})
+    return {"results": results, "executed": len(unique)}
+
+
+# ================
+# Hot datasets (shared cache)
+# ================
+# Keys must match what read_query() builds for the corresponding routes.
+HOT_CATEGORIES = [c for c in os.getenv(
+    "HOT_CATEGORIES", "tech,crypto,finance,news,culture,politics,business,science"
+).split(",") if c]
+
+
+def produce_hot_datasets():
+    """Default dashboard queries: 7-day leaderboards, rollups, and the top-3 series the UI opens with."""
+    out = []
+    # Primary: payloads are published under get_data_version(), which is read there.
+    with pooled_conn("cheap") as conn:
+        trends = query_trends(conn, 7, None, 20, "rows")
+        out.append((("trends", 7, None, 20, "rows", None), trends))
+        for cat in HOT_CATEGORIES:
+            out.append((("trends", 7, cat, 20, "rows", None), query_trends(conn, 7, cat, 20, "rows")))
+        out.append((("categories",), query_categories(conn)))
+        out.append((("stats",), query_stats(conn)))
+
+        top = [t["topic"] for t in trends["trending_topics"][:3]]
+        if top:
+            args = (top, 168, "mentions", Normalize.global_, "rows")
+            out.append((("interest", *map(_freeze, args)), query_interest(conn, *args)))
+        conn.rollback()
+    return out
+
+
+hot_refresher: Optional[HotDataRefresher] = (
+    HotDataRefresher(shared_cache, produce_hot_datasets, get_data_version,
+                     interval=float(os.getenv("SHARED_CACHE_REFRESH_SECONDS", "5")))
+    if shared_cache else None
+)
+
+
+# ================
+# Live updates (SSE)
+# ================
+@app.get("/api/stream")
+async def stream_updates(
+        request: Request,
+        topics: List[str] = Query([], description="Topics whose latest hourly bucket to push"),
+):
+    """Push leaderboard diffs and the latest hourly bucket whenever the collector commits.
+
+    Events: `leaderboard` ({version, full, upserts, removed}) and `hourly`
+    ({version, bucket, values}). The first pair is a full snapshot.
+    """
+    if not LIVE_UPDATES:
+        raise HTTPException(status_code=404, detail="Live updates are disabled")
+
+    sub = broadcaster.subscribe(topics)
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n" + broadcaster.snapshot(sub.topics)
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 # ================
 # Interest signups
 # ================
+def _check_email(value: str) -> str:
+    """Same checks as pydantic's EmailStr, but email_validator (and dnspython) load on first use."""
+    from email_validator import EmailNotValidError, validate_email
+
+    try:
+        return validate_email(value, check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError(f"value is not a valid email address: {e}")
+
+
+Email = Annotated[str, AfterValidator(_check_email)]
+
+
 class InterestSignup(BaseModel):
-    email: EmailStr
+    email: Email
 
 
-@app.post("/api/interest-signup")
-def signup_interest(signup: InterestSignup):
-    conn = get_conn()
-    try:
+def _write_signups(batch: List[Signup]) -> int:
+    with pooled_conn("write") as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                INSERT INTO interest_signups (email)
-                VALUES (%s)
+                INSERT INTO interest_signups (email, created_at)
+                SELECT * FROM unnest(%s::text[], %s::timestamp[])
                 ON CONFLICT (email) DO NOTHING
-                RETURNING id
                 """,
-                (signup.email,),
+                ([s.email for s in batch], [s.created_at for s in batch]),
             )
-            inserted = cur.fetchone()
+            inserted = cur.rowcount
+        conn.commit()
+    return inserted
+
+
+def _count_signups() -> int:
+    with pooled_conn("cheap") as conn:
+        return int(conn.execute("SELECT COUNT(*) FROM interest_signups").fetchone()[0] or 0)
+
+
+# Write-behind mode for launch spikes: signups are acknowledged from an
+# in-process queue and inserted in batches by a background thread. See
+# signup_buffer.py for what each SIGNUP_DURABILITY level survives. Not
+# available in serverless mode (no background threads, frozen instances).
+SIGNUP_WRITE_BEHIND = os.getenv("SIGNUP_WRITE_BEHIND", "0") == "1" and not SERVERLESS
+signup_buffer: Optional[SignupBuffer] = (
+    SignupBuffer(
+        _write_signups,
+        _count_signups,
+        max_queue=int(os.getenv("SIGNUP_QUEUE_MAX", "10000")),
+        batch_size=int(os.getenv("SIGNUP_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("SIGNUP_FLUSH_SECONDS", "1")),
+        durability=os.getenv("SIGNUP_DURABILITY", "memory"),
+        spool_dir=os.getenv("SIGNUP_SPOOL_DIR") or None,
+    )
+    if SIGNUP_WRITE_BEHIND else None
+)
+metrics.gauge_callback(
+    "signup_buffer_stat", "Write-behind signup queue and flush counters",
+    lambda: {(k,): v for k, v in signup_buffer.stats().items()} if signup_buffer else {}, ("stat",),
+)
 
-            cur.execute("SELECT COUNT(*) FROM interest_signups")
-            total = int(cur.fetchone()[0] or 0)
+SIGNUP_THANKS = "Thanks for your interest! We'll notify you when we launch."
+SIGNUP_DUPLICATE = "You're already on the list!"
 
-        conn.commit()
-        msg = (
-            "Thanks for your interest! We'll notify you when we launch."
-            if inserted
-            else "You're already on the list!"
-        )
-        return {"success": True, "message": msg, "total_signups": total}
+
+@app.post("/api/interest-signup")
+def signup_interest(signup: InterestSignup):
+    if signup_buffer is not None:
+        try:
+            queued = signup_buffer.add(signup.email)
+        except BufferFull:
+            pass  # queue at capacity: fall through to a direct insert
+        else:
+            return {
+                "success": True,
+                "message": SIGNUP_THANKS if queued else SIGNUP_DUPLICATE,
+                "total_signups": signup_buffer.approximate_total(),
+                "approximate": True,
+            }
+
+    with pooled_conn("write") as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO interest_signups (email)
+                    VALUES (%s)
+                    ON CONFLICT (email) DO NOTHING
+                    RETURNING id
+                    """,
+                    (signup.email,),
+                )
+                inserted = cur.fetchone()
+
+                cur.execute("SELECT COUNT(*) FROM interest_signups")
+                total = int(cur.fetchone()[0] or 0)
+
+            conn.commit()
+            msg = SIGNUP_THANKS if inserted else SIGNUP_DUPLICATE
+            return {"success": True, "message": msg, "total_signups": total}
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+_stripe_module = None
+
+
+def _stripe():
+    """Import stripe on first use of a payment route, keeping it off the cold-start path."""
+    global _stripe_module
+    if _stripe_module is None:
+        import stripe
+
+        stripe.api_key = os.getenv("STRIPE_SECRET_KEY")  # Add to .env
+        if os.getenv("STRIPE_API_BASE"):  # local stub (stripe_stub.py) or stripe-mock
+            stripe.api_base = os.getenv("STRIPE_API_BASE")
+        _stripe_module = stripe
+    return _stripe_module
+
+
+# Stripe SDK calls block on the network: run them on a small dedicated pool
+# so a slow Stripe can't tie up the event loop or the shared threadpool.
+STRIPE_MAX_CONCURRENCY = int(os.getenv("STRIPE_MAX_CONCURRENCY", "8"))
+STRIPE_CALL_TIMEOUT = float(os.getenv("STRIPE_CALL_TIMEOUT", "20"))
+_stripe_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def stripe_call(fn, *args, **kwargs):
+    global _stripe_executor
+    if _stripe_executor is None:
+        _stripe_executor = ThreadPoolExecutor(max_workers=STRIPE_MAX_CONCURRENCY, thread_name_prefix="stripe")
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(_stripe_executor, functools.partial(fn, *args, **kwargs)),
+        STRIPE_CALL_TIMEOUT,
+    )
+
+
+CUSTOMER_ID = db.statement("customer_id", "SELECT customer_id FROM stripe_customers WHERE email = %s")
+
+
+def _lookup_customer_id(email: str) -> Optional[str]:
+    """Local email -> Stripe customer id; None on a miss or if the DB is unavailable."""
+    try:
+        with pooled_conn("cheap") as conn:
+            row = db.execute(conn, CUSTOMER_ID, (email,)).fetchone()
+            return row[0] if row else None
     except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        put_conn(conn)
+        print(f"stripe_customers lookup failed: {e}")
+        return None
+
 
-import stripe
-from fastapi import HTTPException
-from pydantic import BaseModel, EmailStr
+def _upsert_customer(cur, email: Optional[str], customer_id: Optional[str]):
+    if email and customer_id:
+        cur.execute(
+            """
+            INSERT INTO stripe_customers (email, customer_id) VALUES (%s, %s)
+            ON CONFLICT (email) DO UPDATE SET customer_id = EXCLUDED.customer_id, updated_at = NOW()
+            WHERE stripe_customers.customer_id <> EXCLUDED.customer_id
+            """,
+            (email, customer_id),
+        )
+
+
+def _remember_customer(email: str, customer_id: str):
+    try:
+        with pooled_conn("write") as conn:
+            with conn.cursor() as cur:
+                _upsert_customer(cur, email, customer_id)
+            conn.commit()
+    except Exception as e:
+        print(f"stripe_customers insert failed: {e}")
 
-# Add to top of file after load_dotenv()
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")  # Add to .env
 
 # New models
 class CheckoutRequest(BaseModel):
-    email: EmailStr
+    email: Email
 
 class WebhookEvent(BaseModel):
     type: str
@@ -547,19 +1661,25 @@ class WebhookEvent(BaseModel):
 # STRIPE CHECKOUT
 # ================
 @app.post("/api/create-checkout")
-def create_checkout_session(request: CheckoutRequest):
+async def create_checkout_session(request: CheckoutRequest):
     """Create Stripe checkout session for founding member subscription"""
+    stripe = _stripe()
     try:
-        # Create or get customer
-        customers = stripe.Customer.list(email=request.email, limit=1)
-        if customers.data:
-            customer = customers.data[0]
-        else:
-            customer = stripe.Customer.create(email=request.email)
+        # Known customers skip the Customer.list round trip to Stripe.
+        customer_id = await run_in_threadpool(_lookup_customer_id, request.email)
+        if customer_id is None:
+            customers = await stripe_call(stripe.Customer.list, email=request.email, limit=1)
+            if customers.data:
+                customer = customers.data[0]
+            else:
+                customer = await stripe_call(stripe.Customer.create, email=request.email)
+            customer_id = customer.id
+            await run_in_threadpool(_remember_customer, request.email, customer_id)
 
         # Create checkout session
-        checkout_session = stripe.checkout.Session.create(
-            customer=customer.id,
+        checkout_session = await stripe_call(
+            stripe.checkout.Session.create,
+            customer=customer_id,
             payment_method_types=['card'],
             line_items=[{
                 'price_data': {
@@ -591,6 +1711,8 @@ def create_checkout_session(request: CheckoutRequest):
 
     except stripe.error.StripeError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Payment provider timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -598,9 +1720,109 @@ def create_checkout_session(request: CheckoutRequest):
 # ================
 # STRIPE WEBHOOK
 # ================
+# The endpoint verifies the signature, stores the event in webhook_events
+# (deduplicated on Stripe's event id) and acks; WebhookWorker applies stored
+# events in the background, with retries. Test locally with
+# `python send_fake_webhook.py` (signs payloads with STRIPE_WEBHOOK_SECRET).
+def _on_checkout_completed(cur, session: dict) -> List[str]:
+    email = (session.get('customer_details') or {}).get('email')
+    _upsert_customer(cur, email, session.get('customer'))
+    cur.execute(
+        """
+        INSERT INTO paid_members (
+            email, 
+            stripe_customer_id, 
+            stripe_subscription_id,
+            status,
+            founding_member,
+            monthly_price_cents
+        )
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (email) 
+        DO UPDATE SET 
+            stripe_subscription_id = EXCLUDED.stripe_subscription_id,
+            status = EXCLUDED.status,
+            updated_at = NOW()
+        """,
+        (
+            email,
+            session.get('customer'),
+            session.get('subscription'),
+            'active',
+            True,  # founding member
+            2000   # $20 locked in
+        )
+    )
+    # TODO: Send welcome email here
+    return [email] if email else []
+
+
+def _on_subscription_deleted(cur, subscription: dict) -> List[str]:
+    # Mark as cancelled in database
+    cur.execute(
+        """
+        UPDATE paid_members 
+        SET status = 'cancelled', updated_at = NOW()
+        WHERE stripe_subscription_id = %s
+        RETURNING email
+        """,
+        (subscription['id'],)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def _invalidate_status(event_type: str, emails: List[str]):
+    for email in emails or ():
+        subscription_cache.invalidate(email)
+
+
+WEBHOOK_HANDLERS = {
+    'checkout.session.completed': _on_checkout_completed,
+    'customer.subscription.deleted': _on_subscription_deleted,
+}
+
+
+@contextmanager
+def _webhook_conn():
+    with pooled_conn("write") as conn:
+        yield conn
+
+
+webhook_worker = WebhookWorker(
+    _webhook_conn,
+    WEBHOOK_HANDLERS,
+    on_applied=_invalidate_status,
+    batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", "50")),
+    interval=float(os.getenv("WEBHOOK_POLL_SECONDS", "5")),
+    max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8")),
+)
+metrics.gauge_callback(
+    "webhook_worker_stat", "Webhook events processed/retried/failed",
+    lambda: {(k,): v for k, v in webhook_worker.stats().items()}, ("stat",),
+)
+
+
+def _store_webhook_event(event_id: str, event_type: str, payload: bytes) -> bool:
+    """Persist a verified event; False if this event id was already received."""
+    with pooled_conn("write") as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO webhook_events (event_id, event_type, payload)
+                VALUES (%s, %s, %s::jsonb)
+                ON CONFLICT (event_id) DO NOTHING
+                """,
+                (event_id, event_type, payload.decode("utf-8")),
+            )
+            stored = cur.rowcount == 1
+        conn.commit()
+    return stored
+
+
 @app.post("/api/stripe-webhook")
 async def stripe_webhook(request: Request):
-    """Handle Stripe webhook events"""
+    """Verify, persist and acknowledge a Stripe webhook event"""
+    stripe = _stripe()
     payload = await request.body()
     sig_header = request.headers.get('stripe-signature')
     webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
@@ -614,113 +1836,95 @@ async def stripe_webhook(request: Request):
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # Handle the event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
+    if event['type'] not in WEBHOOK_HANDLERS:
+        return {"status": "ignored"}
+
+    # Blocking DB work goes to the threadpool, off the event loop. A failure
+    # here returns 500, so Stripe redelivers.
+    stored = await run_in_threadpool(_store_webhook_event, event['id'], event['type'], payload)
+    if stored:
+        if SERVERLESS:
+            # No background worker: apply now (best effort; the row stays
+            # pending for the next delivery's batch if this fails).
+            try:
+                await run_in_threadpool(webhook_worker.run_once)
+            except Exception as e:
+                print(f"webhook inline processing failed: {e}")
+        else:
+            webhook_worker.notify()
+    return {"status": "success", "duplicate": not stored}
 
-        # Save to database
-        conn = get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO paid_members (
-                        email, 
-                        stripe_customer_id, 
-                        stripe_subscription_id,
-                        status,
-                        founding_member,
-                        monthly_price_cents
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (email) 
-                    DO UPDATE SET 
-                        stripe_subscription_id = EXCLUDED.stripe_subscription_id,
-                        status = EXCLUDED.status,
-                        updated_at = NOW()
-                    """,
-                    (
-                        session.get('customer_details', {}).get('email'),
-                        session.get('customer'),
-                        session.get('subscription'),
-                        'active',
-                        True,  # founding member
-                        2000   # $20 locked in
-                    )
-                )
-            conn.commit()
-        finally:
-            put_conn(conn)
 
-        # TODO: Send welcome email here
+# ================
+# Get subscription status
+# ================
+# Per-process cache. Webhook processing invalidates entries in the worker
+# process that applied the event; other processes pick the change up when
+# their entry expires.
+SUBSCRIPTION_CACHE_TTL = float(os.getenv("SUBSCRIPTION_CACHE_TTL", "300"))
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "5"))
+subscription_cache = TTLCache(SUBSCRIPTION_CACHE_TTL, max_entries=int(os.getenv("SUBSCRIPTION_CACHE_MAX", "10000")))
+metrics.gauge_callback(
+    "subscription_cache_stat", "Subscription status cache hits/misses/invalidations",
+    lambda: {(k,): v for k, v in subscription_cache.stats().items()}, ("stat",),
+)
 
-    elif event['type'] == 'customer.subscription.deleted':
-        subscription = event['data']['object']
 
-        # Mark as cancelled in database
-        conn = get_conn()
+@app.get("/api/subscription-status")
+def get_subscription_status(email: Email = Query(...)):
+    """Check if user has active subscription"""
+    return subscription_cache.get_or_load(
+        email, lambda: _load_subscription_status(email),
+        # A user who just paid may poll from another worker: don't let "not
+        # subscribed" linger there for the full TTL.
+        ttl_for=lambda status: SUBSCRIPTION_CACHE_TTL if status["subscribed"] else SUBSCRIPTION_NEGATIVE_TTL,
+    )
+
+
+SUBSCRIPTION_STATUS = db.statement("subscription_status", """
+    SELECT status, founding_member, monthly_price_cents, created_at
+    FROM paid_members
+    WHERE email = %s
+""")
+
+
+def _load_subscription_status(email: str) -> dict:
+    with pooled_conn("cheap") as conn:
         try:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    UPDATE paid_members 
-                    SET status = 'cancelled', updated_at = NOW()
-                    WHERE stripe_subscription_id = %s
-                    """,
-                    (subscription['id'],)
-                )
-            conn.commit()
-        finally:
-            put_conn(conn)
-
-    return {"status": "success"}
+                db.execute(cur, SUBSCRIPTION_STATUS, (email,))
+                row = cur.fetchone()
 
+            if not row:
+                return {"subscribed": False}
 
-# ================
-# Get subscription status
-# ================
-@app.get("/api/subscription-status")
-def get_subscription_status(email: EmailStr = Query(...)):
-    """Check if user has active subscription"""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT status, founding_member, monthly_price_cents, created_at
-                FROM paid_members
-                WHERE email = %s
-                """,
-                (email,)
-            )
-            row = cur.fetchone()
+            return {
+                "subscribed": True,
+                "status": row[0],
+                "founding_member": row[1],
+                "price": row[2] / 100,  # Convert cents to dollars
+                "member_since": row[3].isoformat() if row[3] else None
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
-        if not row:
-            return {"subscribed": False}
 
-        return {
-            "subscribed": True,
-            "status": row[0],
-            "founding_member": row[1],
-            "price": row[2] / 100,  # Convert cents to dollars
-            "member_since": row[3].isoformat() if row[3] else None
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        put_conn(conn)
 @app.get("/api/interest-count")
 def get_interest_count():
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM interest_signups")
-            count = int(cur.fetchone()[0] or 0)
-        return {"count": count}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        put_conn(conn)
+    # Primary and uncached: signups don't bump data_versions, and someone who
+    # just signed up expects the count to include them.
+    with pooled_conn("cheap") as conn:
+        try:
+            return query_interest_count(conn)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+if SERVERLESS:
+    # Routes and their dependency graphs are compiled as they are declared;
+    # Starlette builds the middleware stack on the first request. Do it now, in
+    # the import phase the platform runs before the first invocation.
+    app.middleware_stack = app.build_middleware_stack()
 
 
 # Local dev runner (use Gunicorn in prod)
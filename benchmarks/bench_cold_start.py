@@ -0,0 +1,91 @@
+# benchmarks/bench_cold_start.py
+# Cold-start cost of the API as a serverless function sees it: a fresh
+# interpreter imports api.py, then serves its first request. Each run is a new
+# subprocess; the request is a raw ASGI call (no server, no lifespan), which is
+# how the platform adapter invokes the app.
+#
+#   python -m benchmarks.bench_cold_start --runs 10
+#   python -m benchmarks.bench_cold_start --path "/api/trends?days=7"   # needs DATABASE_URL
+#   python -m benchmarks.bench_cold_start --importtime 15               # slowest imports per mode
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import api
+t_import = time.perf_counter() - t0
+
+path, _, query = sys.argv[1].partition("?")
+scope = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "https", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+    "root_path": "", "headers": [(b"host", b"bench"), (b"accept-encoding", b"gzip")],
+    "client": ("127.0.0.1", 1), "server": ("bench", 443),
+}
+result = {}
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    if message["type"] == "http.response.start":
+        result["status"] = message["status"]
+        result["first_byte"] = time.perf_counter() - t0
+
+t1 = time.perf_counter()
+asyncio.run(api.app(scope, receive, send))
+result.update(import_s=t_import, request_s=time.perf_counter() - t1, total_s=time.perf_counter() - t0)
+print(json.dumps(result))
+"""
+
+
+def run_once(path, env):
+    out = subprocess.run([sys.executable, "-c", CHILD, path], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(env, top):
+    """Slowest modules by cumulative import time (python -X importtime)."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api"], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = [p.strip() for p in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative_us), name))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark import time and time to first response.")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--path", default="/", help="request path (+ ?query) for the first request")
+    ap.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    args = ap.parse_args()
+
+    print(f"{args.runs} cold starts per mode, first request GET {args.path}\n")
+    print(f"{'mode':<11} {'import ms':>10} {'request ms':>11} {'1st byte ms':>12} {'status':>7}")
+    for mode, flag in (("server", "0"), ("serverless", "1")):
+        env = {**os.environ, "SERVERLESS": flag}
+        runs = [run_once(args.path, env) for _ in range(args.runs)]
+        med = {k: statistics.median(r[k] for r in runs) * 1000 for k in ("import_s", "request_s", "first_byte")}
+        print(f"{mode:<11} {med['import_s']:>10.1f} {med['request_s']:>11.1f} {med['first_byte']:>12.1f} "
+              f"{runs[-1].get('status', '-'):>7}")
+        if args.importtime:
+            for cumulative_us, name in import_profile(env, args.importtime):
+                print(f"    {cumulative_us / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
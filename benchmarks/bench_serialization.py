@@ -0,0 +1,76 @@
+# benchmarks/bench_serialization.py
+# Payload size and encode time for /api/interest-shaped responses:
+# legacy rows + stdlib json (what FastAPI's JSONResponse did) vs orjson vs columnar.
+#
+#   python -m benchmarks.bench_serialization --hours 720 --topics 5
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serialization import series_columnar, series_rows  # noqa: E402
+
+
+def make_points(hours, topics):
+    start = datetime(2025, 1, 1)
+    for h in range(hours + 1):
+        key = (start + timedelta(hours=h)).isoformat() + "Z"
+        for i, topic in enumerate(topics):
+            yield key, topic, (h * 7 + i * 13) % 101
+
+
+def stdlib_dumps(obj):
+    # Mirrors starlette.responses.JSONResponse.render
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark chart payload formats.")
+    ap.add_argument("--hours", type=int, default=720)
+    ap.add_argument("--topics", type=int, default=5)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    topics = [f"topic number {i}" for i in range(args.topics)]
+    points = list(make_points(args.hours, topics))
+    print(f"{args.hours + 1} points x {len(topics)} topics\n")
+
+    cases = []
+    try:
+        from fastapi.encoders import jsonable_encoder
+
+        # The previous request path: dict -> jsonable_encoder -> JSONResponse
+        cases.append(("rows + enc + json ", lambda: stdlib_dumps(jsonable_encoder({"series": series_rows(points)}))))
+    except ImportError:
+        pass
+    cases += [
+        ("rows     + json  ", lambda: stdlib_dumps({"series": series_rows(points)})),
+        ("rows     + orjson", lambda: orjson.dumps({"series": series_rows(points)})),
+        ("columnar + json  ", lambda: stdlib_dumps({"series": series_columnar(points, topics)})),
+        ("columnar + orjson", lambda: orjson.dumps({"series": series_columnar(points, topics)})),
+    ]
+    print(f"{'format':<18} {'shape+encode ms':>16} {'bytes':>10} {'gzip bytes':>11}")
+    for name, fn in cases:
+        body = fn()
+        ms = timeit(fn, args.repeat)
+        print(f"{name:<18} {ms:>16.2f} {len(body):>10,} {len(gzip.compress(body)):>11,}")
+
+
+if __name__ == "__main__":
+    main()
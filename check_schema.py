@@ -1,16 +1,9 @@
-import psycopg2
-import os
+from grok_trends import db
 from dotenv import load_dotenv
 
 load_dotenv()
 
-conn = psycopg2.connect(
-    host=os.getenv('PGHOST'),
-    database=os.getenv('PGDATABASE'),
-    user=os.getenv('PGUSER'),
-    password=os.getenv('PGPASSWORD'),
-    port=os.getenv('PGPORT', '5432')
-)
+conn = db.connect()
 
 cur = conn.cursor()
 cur.execute("""
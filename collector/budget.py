@@ -0,0 +1,183 @@
+# collector/budget.py
+# Decides when each search query may call the X API.
+#
+# The monthly post cap (MONTHLY_POST_CAP) minus what was pulled this month
+# (api_usage_hourly, or the daily api_usage if that says more, e.g. in the
+# month api_usage_hourly was added) is spread evenly over the rest of the
+# month: with R
+# requests left and T seconds left, one request is due every T / R seconds.
+# That rate is split between queries by their yield (new tweets per request,
+# an EWMA), with a floor so weak queries keep being sampled. On top of that
+# the real rate-limit window of each endpoint is respected: the x-rate-limit-*
+# headers of the last response travel with the spooled page (spool.py) into
+# api_rate_limits, and no query on that endpoint is due while its window is
+# exhausted. Search queries and metrics lookups ('lookup:' pseudo-queries)
+# have separate windows.
+#
+# The gate is one row per query in collector_budget (next_at). claim() is a
+# single conditional UPDATE, so concurrent instances can't both take a slot
+# and the check doesn't scan raw_tweets.
+
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+RATE_LIMIT_ENDPOINT = 'search_recent'
+LOOKUP_ENDPOINT = 'tweets_lookup'
+
+
+def endpoint_for(query: str) -> str:
+    """The X API endpoint (rate-limit window) a planned query draws on."""
+    return LOOKUP_ENDPOINT if query.startswith('lookup:') else RATE_LIMIT_ENDPOINT
+
+
+def _endpoint_of(url: str) -> Optional[str]:
+    path = urlparse(url).path.rstrip('/')
+    if path.endswith('/tweets/search/recent'):
+        return RATE_LIMIT_ENDPOINT
+    if path.endswith('/tweets'):
+        return LOOKUP_ENDPOINT
+    return None
+
+
+class BudgetPlanner:
+    def __init__(self, monthly_cap: int, posts_per_request: int = 100, min_interval: float = 60.0,
+                 yield_alpha: float = 0.3, min_share: float = 0.2):
+        self.monthly_cap = monthly_cap
+        self.posts_per_request = posts_per_request
+        self.min_interval = min_interval  # never more often than this per query
+        self.yield_alpha = yield_alpha
+        self.min_share = min_share        # weakest query keeps >= min_share x the mean weight
+        self._headers_lock = threading.Lock()
+        self._headers: Dict[str, Tuple[int, int, int]] = {}  # endpoint -> latest (limit, remaining, reset epoch)
+
+    # ---------- rate-limit headers ----------
+    def response_hook(self, response, *args, **kwargs):
+        """requests hook (tweepy.Client.session): remember the last rate-limit headers per endpoint."""
+        endpoint = _endpoint_of(response.url)
+        if endpoint is None:
+            return
+        h = response.headers
+        try:
+            headers = (int(h['x-rate-limit-limit']), int(h['x-rate-limit-remaining']), int(h['x-rate-limit-reset']))
+        except (KeyError, ValueError):
+            return
+        with self._headers_lock:
+            self._headers[endpoint] = headers
+
+    def take_rate_limit(self, endpoint: str = RATE_LIMIT_ENDPOINT) -> Optional[Tuple[int, int, int]]:
+        """Headers of the latest `endpoint` response since the last call, or None."""
+        with self._headers_lock:
+            return self._headers.pop(endpoint, None)
+
+    def save_rate_limit(self, cur, headers: Optional[Sequence[int]], seen_at: Optional[datetime] = None,
+                        endpoint: str = RATE_LIMIT_ENDPOINT):
+        if headers is None:
+            return
+        limit, remaining, reset = headers
+        # Pages can be loaded late from the spool: never overwrite newer headers.
+        cur.execute("""
+            INSERT INTO api_rate_limits (endpoint, rate_limit, remaining, reset_at, updated_at)
+            VALUES (%s, %s, %s, to_timestamp(%s), COALESCE(%s, NOW()))
+            ON CONFLICT (endpoint) DO UPDATE
+            SET rate_limit = EXCLUDED.rate_limit, remaining = EXCLUDED.remaining,
+                reset_at = EXCLUDED.reset_at, updated_at = EXCLUDED.updated_at
+            WHERE api_rate_limits.updated_at <= EXCLUDED.updated_at
+        """, (endpoint, limit, remaining, reset, seen_at))
+
+    # ---------- planning ----------
+    def sync(self, conn, queries: Sequence[str]):
+        with conn.cursor() as cur:
+            cur.executemany(
+                'INSERT INTO collector_budget (query) VALUES (%s) ON CONFLICT (query) DO NOTHING',
+                [(q,) for q in queries],
+            )
+        conn.commit()
+
+    def intervals(self, cur, queries: Sequence[str]) -> Dict[str, Optional[float]]:
+        """Seconds between requests per query; None once the month's quota is spent."""
+        # api_usage predates api_usage_hourly; the larger sum covers a month
+        # that started before the hourly table did.
+        cur.execute("""
+            SELECT GREATEST(
+                       (SELECT COALESCE(SUM(posts_pulled), 0) FROM api_usage_hourly
+                        WHERE hour_ts >= DATE_TRUNC('month', NOW())),
+                       (SELECT COALESCE(SUM(posts_pulled), 0) FROM api_usage
+                        WHERE query_date >= DATE_TRUNC('month', CURRENT_DATE))),
+                   EXTRACT(EPOCH FROM DATE_TRUNC('month', NOW()) + INTERVAL '1 month' - NOW())
+        """)
+        used, seconds_left = cur.fetchone()
+        requests_left = (self.monthly_cap - int(used)) // self.posts_per_request
+        if requests_left <= 0:
+            return {q: None for q in queries}
+        base = float(seconds_left) / requests_left  # across all queries
+
+        cur.execute('SELECT query, yield_ewma FROM collector_budget WHERE query = ANY(%s)', (list(queries),))
+        yields = dict(cur.fetchall())
+        # Unmeasured queries start optimistic so they get sampled.
+        weights = {q: yields.get(q) if yields.get(q) is not None else float(self.posts_per_request) for q in queries}
+        mean = sum(weights.values()) / len(weights)
+        weights = {q: max(w, self.min_share * mean, 1e-9) for q, w in weights.items()}
+        total = sum(weights.values())
+        return {q: max(self.min_interval, base * total / w) for q, w in weights.items()}
+
+    def rate_limited_until(self, cur) -> Dict[str, datetime]:
+        """Endpoints whose rate-limit window is exhausted, with when it resets."""
+        cur.execute('SELECT endpoint, reset_at FROM api_rate_limits WHERE remaining <= 0 AND reset_at > NOW()')
+        return dict(cur.fetchall())
+
+    def claim(self, conn, queries: Sequence[str], candidates: Optional[Sequence[str]] = None):
+        """Take the slot of the most overdue due query among `candidates` (default: all).
+
+        Returns (query, None) on success, else (None, seconds until the next
+        slot, or None if nothing is due again this month).
+        """
+        candidates = list(candidates if candidates is not None else queries)
+        with conn.cursor() as cur:
+            limited = self.rate_limited_until(cur)
+            blocked = [limited[endpoint_for(q)] for q in candidates if endpoint_for(q) in limited]
+            candidates = [q for q in candidates if endpoint_for(q) not in limited]
+            if blocked and not candidates:
+                conn.commit()
+                return None, (min(blocked) - datetime.now(timezone.utc)).total_seconds()
+            intervals = self.intervals(cur, queries)
+            cur.execute("""
+                SELECT query, EXTRACT(EPOCH FROM next_at - NOW()) FROM collector_budget
+                WHERE query = ANY(%s) ORDER BY next_at
+            """, (candidates,))
+            waits = [(q, float(w)) for q, w in cur.fetchall() if intervals.get(q) is not None]
+            for q, wait in waits:
+                if wait > 0:
+                    break
+                cur.execute("""
+                    UPDATE collector_budget
+                    SET next_at = NOW() + INTERVAL '1 second' * %s, requests = requests + 1
+                    WHERE query = %s AND next_at <= NOW()
+                    RETURNING query
+                """, (intervals[q], q))
+                if cur.fetchone():
+                    conn.commit()
+                    return q, None
+            conn.commit()
+        waits = [w for _, w in waits if w > 0]
+        return None, (min(waits) if waits else None)
+
+    def record(self, cur, query: str, posts: int, new_tweets: int, at: Optional[datetime] = None,
+               rate_limit: Optional[Sequence[int]] = None):
+        """Account one request made at `at` (default now) and update the query's yield (caller commits)."""
+        cur.execute("""
+            INSERT INTO api_usage_hourly (hour_ts, search_query, requests, posts_pulled, new_tweets)
+            VALUES (DATE_TRUNC('hour', COALESCE(%s, NOW())), %s, 1, %s, %s)
+            ON CONFLICT (hour_ts, search_query) DO UPDATE
+            SET requests = api_usage_hourly.requests + 1,
+                posts_pulled = api_usage_hourly.posts_pulled + EXCLUDED.posts_pulled,
+                new_tweets = api_usage_hourly.new_tweets + EXCLUDED.new_tweets
+        """, (at, query, posts, new_tweets))
+        cur.execute("""
+            UPDATE collector_budget
+            SET yield_ewma = CASE WHEN yield_ewma IS NULL THEN %s ELSE %s * %s + (1 - %s) * yield_ewma END,
+                updated_at = NOW()
+            WHERE query = %s
+        """, (new_tweets, self.yield_alpha, new_tweets, self.yield_alpha, query))
+        self.save_rate_limit(cur, rate_limit, at, endpoint_for(query))
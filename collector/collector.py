@@ -1,15 +1,16 @@
-import os, re, time, psycopg2, tweepy
-from datetime import datetime, timedelta
-from psycopg2.extras import execute_values
+# Run from the repo root: python -m collector.collector
+import os, re, time, tweepy
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
-# =========================
-# ASCII progress bar helpers
-# =========================
-import os, re, time, psycopg2, tweepy
-from datetime import datetime, timedelta
-from psycopg2.extras import execute_values
-from dotenv import load_dotenv
+from grok_trends import db
+from grok_trends.topk import shared_sketch
+
+from .budget import LOOKUP_ENDPOINT, BudgetPlanner
+from .engagement import BATCH_SIZE as ENGAGEMENT_BATCH_SIZE, EngagementRefresher
+from .pipeline import Pipeline, Stage
+from .seen_filter import shared_filter
+from .spool import flush, open_spool
 
 # =========================
 # ASCII progress bar helpers
@@ -41,20 +42,74 @@ def _countdown_bar(total_seconds: float, label: str = "Waiting", width: int = 30
         time.sleep(min(1.0, max(0.05, remaining)))
     print()
 
+# Windows (days) precomputed into trend_leaderboard; other /api/trends
+# windows are aggregated live by the API.
+LEADERBOARD_WINDOWS = [int(d) for d in os.getenv('LEADERBOARD_WINDOWS', '1,7,30,90').split(',') if d]
+
+RAW_TWEET_COLUMNS = [
+    'tweet_id', 'text', 'author_id', 'created_at', 'search_query',
+    'lang', 'conversation_id',
+    'like_count', 'retweet_count', 'reply_count', 'quote_count',
+    'author_followers', 'is_quote', 'is_reply',
+]
+
+# Hourly rollup used by the pipeline: 'collector' (compute_hourly_trends) or
+# 'etl' (analysis/etl_/etl_hourly.py, engagement-weighted). Both write
+# trend_agg_hourly, so only one runs.
+HOURLY_ROLLUP = os.getenv('HOURLY_ROLLUP', 'collector')
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '4'))
+# X API posts per month for the plan; the budget planner spreads what's left.
+MONTHLY_POST_CAP = int(os.getenv('MONTHLY_POST_CAP', '10000'))
+# With block_on_rate_limit, wait for a slot at most this long (one schedule_runner period).
+MAX_BLOCK_SECONDS = 15 * 60
+# Engagement refresh (engagement.py): one 100-id metrics lookup whenever the
+# budget planner gives its pseudo-query a slot. It never reports new tweets,
+# so it runs at the planner's floor share of the monthly quota.
+ENGAGEMENT_REFRESH = os.getenv('ENGAGEMENT_REFRESH', '1') == '1'
+METRICS_LOOKUP = 'lookup:public_metrics'
+# Fetched pages are spooled here before loading (see spool.py).
+TWEET_SPOOL_DIR = os.getenv('TWEET_SPOOL_DIR', os.path.join(os.path.dirname(__file__), 'spool'))
+
+
+def account_page(cur, page, added, budget=None):
+    """Usage accounting for a spooled page, inside the transaction that loads it."""
+    cur.execute("""
+        INSERT INTO api_usage (query_date, posts_pulled, query_used)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (query_date)
+        DO UPDATE SET posts_pulled = api_usage.posts_pulled + EXCLUDED.posts_pulled
+    """, (page['fetched_at'].astimezone(timezone.utc).date(), added, page['query']))
+    budget = budget or BudgetPlanner(monthly_cap=MONTHLY_POST_CAP)
+    budget.record(cur, page['query'], page.get('posts', len(page['rows'])), added,
+                  at=page['fetched_at'], rate_limit=page.get('rate_limit'))
+
 class GrokTrendsCollector:
-    def __init__(self):
+    def __init__(self, coordinator=None):
         load_dotenv()
-        self.conn = psycopg2.connect(
-            host=os.getenv('PGHOST'),
-            database=os.getenv('PGDATABASE'),
-            user=os.getenv('PGUSER'),
-            password=os.getenv('PGPASSWORD'),
-            port=os.getenv('PGPORT', '5432'),
-        )
+        self.conn = db.connect()
+        # Coordinated mode (several instances, one database): see coordination.py.
+        self.coordinator = coordinator
         bearer = os.getenv('X_BEARER_TOKEN')
         if not bearer:
             raise RuntimeError('Set X_BEARER_TOKEN')
         self.twitter = tweepy.Client(bearer_token=bearer, wait_on_rate_limit=False)  # Changed to False
+        self.budget = BudgetPlanner(
+            monthly_cap=MONTHLY_POST_CAP,
+            min_interval=float(os.getenv('BUDGET_MIN_INTERVAL_SECONDS', '60')),
+        )
+        self.twitter.session.hooks['response'].append(self.budget.response_hook)
+        self.spool = open_spool(TWEET_SPOOL_DIR)
+        # Separate client; the hook keys headers by endpoint, so lookups have their own window.
+        lookup_client = tweepy.Client(bearer_token=bearer, wait_on_rate_limit=False)
+        lookup_client.session.hooks['response'].append(self.budget.response_hook)
+        self.refresher = EngagementRefresher(
+            lookup_client,
+            decay_hours=float(os.getenv('ENGAGEMENT_DECAY_HOURS', '48')),
+        )
+        self.seen = shared_filter(
+            capacity=int(os.getenv('SEEN_FILTER_CAPACITY', '200000')),
+            fp_budget=float(os.getenv('SEEN_FILTER_FP_BUDGET', '0.02')),
+        )
 
         self.queries = [
             '@Grok -is:retweet',
@@ -71,10 +126,14 @@ class GrokTrendsCollector:
             'business': ['startup','business','entrepreneur','company','revenue','growth','venture','funding','ipo'],
             'science': ['research','study','science','biology','physics','climate','space','nasa','health'],
         }
+        # Everything that draws on the monthly quota.
+        self.planned = self.queries + ([METRICS_LOOKUP] if ENGAGEMENT_REFRESH else [])
+        self.budget.sync(self.conn, self.planned)
 
     # ---------- DB / rate helpers ----------
-    def monthly(self):
-        cur = self.conn.cursor()
+    def monthly(self, conn=None):
+        conn = conn or self.conn
+        cur = conn.cursor()
         cur.execute("""
             SELECT COALESCE(SUM(posts_pulled),0)
             FROM api_usage
@@ -84,37 +143,42 @@ class GrokTrendsCollector:
         cur.close()
         return v
 
-    def last_request_time(self):
-        cur = self.conn.cursor()
-        cur.execute('SELECT MAX(collected_at) FROM raw_tweets')
-        result = cur.fetchone()[0]
-        cur.close()
-        return result if result else datetime.min
-
-    def next_allowed_time(self):
-        last = self.last_request_time()
-        return datetime.now() if last == datetime.min else last + timedelta(minutes=15)
-
-    def can_collect_now(self):
-        return datetime.now() >= self.next_allowed_time()
+    def bump_data_version(self, cur, dataset):
+        """Advance the version of a rollup table inside the caller's transaction."""
+        cur.execute("""
+            INSERT INTO data_versions (dataset, version, updated_at)
+            VALUES (%s, 1, NOW())
+            ON CONFLICT (dataset)
+            DO UPDATE SET version = data_versions.version + 1, updated_at = NOW()
+            RETURNING version
+        """, (dataset,))
+        version = cur.fetchone()[0]
+        # Delivered on commit; API listeners push the change to SSE clients.
+        cur.execute("SELECT pg_notify('grok_trends_updates', %s)", (f"{dataset}:{version}",))
+        return version
 
     # ---------- Collection ----------
-    def collect(self, max_results=100, block_on_rate_limit=False):
-        allow_at = self.next_allowed_time()
-        wait_seconds = (allow_at - datetime.now()).total_seconds()
-        if wait_seconds > 0:
-            if not block_on_rate_limit:
-                mins, secs = divmod(int(wait_seconds + 0.5), 60)
-                print(f'⏳ Rate limited. Wait {mins}:{secs:02d} more minutes')
-                return []
+    def collect(self, max_results=100, block_on_rate_limit=False, conn=None):
+        conn = conn or self.conn
+        # Coordinated mode: only queries in this instance's shard.
+        candidates = self.queries
+        if self.coordinator is not None:
+            candidates = [self.queries[i] for i in self.coordinator.owned(self.queries)]
+        q, wait_seconds = self.budget.claim(conn, self.planned, candidates)
+        if q is None and wait_seconds is not None and block_on_rate_limit and wait_seconds <= MAX_BLOCK_SECONDS:
             print("⏳ Rate limited. Waiting until the next allowed window…")
             _countdown_bar(wait_seconds, label="⏲ Time until next call")  # ← This line
+            q, wait_seconds = self.budget.claim(conn, self.planned, candidates)
+        if q is None:
+            if wait_seconds is None:
+                print('⏳ Monthly post quota spent (or no queries in this shard)')
+            else:
+                mins, secs = divmod(int(wait_seconds + 0.5), 60)
+                print(f'⏳ Rate limited. Wait {mins}:{secs:02d} more minutes')
+            return []
 
-        monthly = self.monthly()
-        query_idx = (monthly // 100) % len(self.queries)
-        q = self.queries[query_idx]
         print(f'🔍 Query: "{q}" (max {max_results} tweets)')
-        print(f'📊 Month: ~{monthly} tweets collected')
+        print(f'📊 Month: ~{self.monthly(conn)} tweets collected')
 
         try:
             res = self.twitter.search_recent_tweets(
@@ -129,11 +193,16 @@ class GrokTrendsCollector:
             )
         except Exception as e:
             print(f'❌ Twitter error: {e}')
+            with conn.cursor() as cur:
+                # a 429 carries the window's reset time
+                self.budget.save_rate_limit(cur, self.budget.take_rate_limit())
+            conn.commit()
             return []
 
-        if not res.data:
+        fetched_at = datetime.now(timezone.utc)
+        data = res.data or []
+        if not data:
             print('No tweets found')
-            return []
 
         author_followers = {}
         try:
@@ -147,9 +216,8 @@ class GrokTrendsCollector:
         except Exception:
             pass
 
-        cur = self.conn.cursor()
-        added = 0
-        for t in res.data:
+        rows = []
+        for t in data:
             pm = getattr(t, 'public_metrics', {}) or {}
             like_count    = int(pm.get('like_count', 0))
             retweet_count = int(pm.get('retweet_count', 0))
@@ -170,42 +238,76 @@ class GrokTrendsCollector:
                     elif ref.type == 'quoted':
                         is_quote = True
 
-            try:
-                cur.execute("""
-                    INSERT INTO raw_tweets (
-                        tweet_id, text, author_id, created_at, collected_at, search_query,
-                        lang, conversation_id,
-                        like_count, retweet_count, reply_count, quote_count,
-                        author_followers, is_quote, is_reply
-                    )
-                    VALUES (%s,%s,%s,%s, NOW(), %s,
-                            %s,%s,
-                            %s,%s,%s,%s,
-                            %s,%s,%s)
-                    ON CONFLICT (tweet_id) DO NOTHING
-                """, (
-                    str(t.id), t.text, author_id, t.created_at, q,
-                    lang, convo_id,
-                    like_count, retweet_count, reply_count, quote_count,
-                    followers, is_quote, is_reply
-                ))
-                if cur.rowcount > 0:
-                    added += 1
-            except Exception as e:
-                print(f'Insert error: {e}')
-
-        cur.execute("""
-            INSERT INTO api_usage (query_date, posts_pulled, query_used)
-            VALUES (CURRENT_DATE, %s, %s)
-            ON CONFLICT (query_date)
-            DO UPDATE SET posts_pulled = api_usage.posts_pulled + EXCLUDED.posts_pulled
-        """, (added, q))
-
-        self.conn.commit()
-        cur.close()
-        print(f'✅ Collected {added} new tweets')
-        print(f'⏰ Next request available at {(datetime.now() + timedelta(minutes=15)).strftime("%H:%M:%S")}')
-        return res.data
+            # created_at is a naive UTC `timestamp` column (sessions run in UTC).
+            created_at = t.created_at.astimezone(timezone.utc).replace(tzinfo=None) if t.created_at else None
+            rows.append((
+                str(t.id), t.text, author_id, created_at, q,
+                lang, str(convo_id) if convo_id else None,
+                like_count, retweet_count, reply_count, quote_count,
+                followers, is_quote, is_reply
+            ))
+
+        # Skip tweets already stored (the queries and search windows overlap).
+        ids = [r[0] for r in rows]
+        fresh = set(self.seen.unseen(conn, ids))
+        rows = [r for r in rows if r[0] in fresh]
+        if len(fresh) < len(ids):
+            print(f'🧹 Skipped {len(ids) - len(fresh)} known tweets (dedup {self.seen.dedup_ratio():.0%} overall)')
+
+        # The page cost quota: make it durable before the database sees it.
+        # Empty pages are spooled too, so their request is still accounted.
+        self.spool.append({
+            'query': q, 'fetched_at': fetched_at, 'rows': rows, 'posts': len(data),
+            'rate_limit': self.budget.take_rate_limit(),
+        })
+        self.seen.add(ids)
+        try:
+            # One binary COPY per page; collected_at takes its NOW() default.
+            stats = flush(self.spool, conn, RAW_TWEET_COLUMNS, self.account_page)
+        except Exception as e:
+            print(f'💾 Database unavailable, {len(rows)} tweets kept in the spool: {e}')
+            return data
+        if stats['failed']:
+            print(f'💾 {stats["failed"]} spool segment(s) not loaded yet; retrying later')
+        print(f'✅ Collected {stats["new_tweets"]} new tweets')
+        return data
+
+    def account_page(self, cur, page, added):
+        account_page(cur, page, added, self.budget)
+
+    def refresh_engagement(self, conn=None):
+        """Re-read public metrics for recent tweets when the budget allows; returns tweets changed."""
+        conn = conn or self.conn
+        # Only spend a slot when there is something to look up.
+        with conn.cursor() as cur:
+            ids = self.refresher.candidates(cur, ENGAGEMENT_BATCH_SIZE)
+        conn.commit()
+        if not ids:
+            print('⏭️  No tweets due for an engagement refresh')
+            return 0
+        q, _ = self.budget.claim(conn, self.planned, [METRICS_LOOKUP])
+        if q is None:
+            print('⏭️  Engagement refresh not due yet')
+            return 0
+        try:
+            # One request accounted per lookup, with the batch it wrote.
+            stats = self.refresher.refresh(
+                conn, ids=ids,
+                on_lookup=lambda cur, returned: self.budget.record(
+                    cur, METRICS_LOOKUP, returned, 0, rate_limit=self.budget.take_rate_limit(LOOKUP_ENDPOINT)),
+            )
+        except Exception as e:
+            # Stale metrics must not hold back the rollups.
+            print(f'❌ Engagement refresh failed: {e}')
+            conn.rollback()
+            with conn.cursor() as cur:
+                # a 429 carries the lookup window's reset time
+                self.budget.save_rate_limit(cur, self.budget.take_rate_limit(LOOKUP_ENDPOINT), endpoint=LOOKUP_ENDPOINT)
+            conn.commit()
+            return 0
+        print(f"🔁 Refreshed {stats['returned']} tweets: {stats['changed']} changed, "
+              f"{stats['dirty_hours']} hourly buckets marked dirty")
+        return stats['changed']
 
     # ---------- Topic extraction ----------
     def extract_topics(self, text):
@@ -237,8 +339,9 @@ class GrokTrendsCollector:
         return 'general'
 
     # ---------- Processing / trends ----------
-    def process_topics(self):
-        cur = self.conn.cursor()
+    def process_topics(self, conn=None):
+        conn = conn or self.conn
+        cur = conn.cursor()
         cur.execute("""
             SELECT t.tweet_id, t.text, t.created_at
             FROM raw_tweets t
@@ -249,7 +352,7 @@ class GrokTrendsCollector:
         if not rows:
             print('No unprocessed tweets')
             cur.close()
-            return
+            return 0
         print(f'📊 Processing {len(rows)} tweets...')
 
         batch = []
@@ -257,17 +360,41 @@ class GrokTrendsCollector:
             for topic_name, category, confidence in self.extract_topics(text):
                 batch.append((topic_name, category, created_at, tweet_id, confidence, 'twitter'))
         if batch:
-            execute_values(cur, """
-                INSERT INTO topics (topic_name, category, mentioned_at, tweet_id, confidence, source)
-                VALUES %s
-            """, batch)
+            db.copy_rows(cur, 'topics', ['topic_name', 'category', 'mentioned_at', 'tweet_id', 'confidence', 'source'], batch)
             print(f'✅ Extracted {len(batch)} topics')
+            self.feed_trending(cur, batch)
 
-        self.conn.commit()
+        try:
+            conn.commit()
+        except Exception:
+            shared_sketch().loaded = False  # counted topics that never landed; reload the checkpoint
+            raise
         cur.close()
-
-    def compute_trends(self):
-        cur = self.conn.cursor()
+        return len(batch)
+
+    def feed_trending(self, cur, batch):
+        """Count extracted topics into the sliding top-K and checkpoint it in the caller's transaction."""
+        sketch = shared_sketch()
+        with sketch.lock:
+            cur.execute("SELECT version FROM data_versions WHERE dataset = 'topic_sketch'")
+            row = cur.fetchone()
+            version = row[0] if row else None
+            # Another instance may have led process_topics since our last run.
+            if not sketch.loaded or version != sketch.version:
+                sketch.load(cur)
+            try:
+                for topic_name, category, mentioned_at, *_ in batch:
+                    if mentioned_at is not None:
+                        sketch.add((topic_name, category or ''), mentioned_at)
+                sketch.save(cur)
+                sketch.version = self.bump_data_version(cur, 'topic_sketch')
+            except Exception:
+                sketch.loaded = False
+                raise
+
+    def compute_trends(self, conn=None):
+        conn = conn or self.conn
+        cur = conn.cursor()
         cur.execute("""
             INSERT INTO trend_aggregations (topic_name, category, date, mention_count, growth_rate)
             SELECT topic_name, category, DATE(mentioned_at), COUNT(*), 0.0
@@ -277,6 +404,7 @@ class GrokTrendsCollector:
             ON CONFLICT (topic_name, category, date)
             DO UPDATE SET mention_count = EXCLUDED.mention_count, computed_at = NOW()
         """)
+        rows = cur.rowcount
         cur.execute("""
             WITH today AS (
                 SELECT topic_name, category, mention_count AS today_count
@@ -296,20 +424,54 @@ class GrokTrendsCollector:
             LEFT JOIN yesterday y ON t.topic_name = y.topic_name AND t.category = y.category
             WHERE ta.topic_name = t.topic_name AND ta.category = t.category AND ta.date = CURRENT_DATE
         """)
-        self.conn.commit()
+        self.refresh_listings(cur)
+        self.bump_data_version(cur, 'trend_aggregations')
+        conn.commit()
         cur.close()
         print('✅ Trends computed')
-    def compute_hourly_trends(self):
-        """Aggregate topics into hourly buckets for interest-over-time chart"""
-        cur = self.conn.cursor()
-
-        # First check what columns exist
+        return rows
+
+    def refresh_listings(self, cur):
+        """Rebuild the keyset-paginated listings inside the caller's transaction."""
+        # The API reads them in UTC; windows and as_of must use the same date.
+        cur.execute("SET LOCAL TIME ZONE 'UTC'")
+        for days in LEADERBOARD_WINDOWS:
+            cur.execute('DELETE FROM trend_leaderboard WHERE window_days = %s', (days,))
+            cur.execute("""
+                INSERT INTO trend_leaderboard (window_days, topic_name, category, total_mentions, avg_growth)
+                SELECT %s, topic_name, COALESCE(category, ''), SUM(mention_count), COALESCE(AVG(growth_rate), 0)
+                FROM trend_aggregations
+                WHERE date >= CURRENT_DATE - INTERVAL '1 day' * %s
+                GROUP BY topic_name, COALESCE(category, '')
+            """, (days, days))
+            cur.execute("""
+                INSERT INTO rollup_state (name, as_of, refreshed_at) VALUES (%s, CURRENT_DATE, NOW())
+                ON CONFLICT (name) DO UPDATE SET as_of = EXCLUDED.as_of, refreshed_at = EXCLUDED.refreshed_at
+            """, (f'leaderboard:{days}',))
+
+        # Only rows whose count moved are rewritten.
+        cur.execute("""
+            INSERT INTO topic_totals (topic_name, category, mentions)
+            SELECT topic_name, COALESCE(category, ''), COUNT(*)
+            FROM topics
+            WHERE topic_name IS NOT NULL
+            GROUP BY topic_name, COALESCE(category, '')
+            ON CONFLICT (topic_name, category)
+            DO UPDATE SET mentions = EXCLUDED.mentions
+            WHERE topic_totals.mentions <> EXCLUDED.mentions
+        """)
         cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name = 'raw_tweets' AND column_name LIKE '%like%'
+            INSERT INTO rollup_state (name, as_of, refreshed_at) VALUES ('topic_totals', CURRENT_DATE, NOW())
+            ON CONFLICT (name) DO UPDATE SET as_of = EXCLUDED.as_of, refreshed_at = EXCLUDED.refreshed_at
         """)
-        print(f"Available columns: {cur.fetchall()}")
+    def compute_hourly_trends(self, conn=None):
+        """Aggregate topics into hourly buckets for interest-over-time chart"""
+        conn = conn or self.conn
+        cur = conn.cursor()
+
+        # Every bucket in the window is rebuilt, so refreshed engagement is
+        # picked up here without the trend_dirty_hours marks; those are left
+        # for etl_hourly.update_hourly, which rebuilds only the marked hours.
 
         # Aggregate topics by hour with weighted scoring
         cur.execute("""
@@ -341,12 +503,16 @@ class GrokTrendsCollector:
                 weighted = EXCLUDED.weighted,
                 computed_at = NOW()
         """)
+        rows = cur.rowcount
+        self.bump_data_version(cur, 'trend_agg_hourly')
 
-        self.conn.commit()
+        conn.commit()
         cur.close()
         print('✅ Hourly trends computed')
-    def show_top_trends(self, limit=5):
-        cur = self.conn.cursor()
+        return rows
+    def show_top_trends(self, limit=5, conn=None):
+        conn = conn or self.conn
+        cur = conn.cursor()
         cur.execute("""
             SELECT topic_name, category, SUM(mention_count) AS total, AVG(growth_rate) AS avg_growth
             FROM trend_aggregations
@@ -364,6 +530,7 @@ class GrokTrendsCollector:
                 print(f'{i}. {topic} ({cat}) - {mentions} mentions, {growth:+.1f}% growth')
         else:
             print('No trends yet - need more data!')
+        return len(trends)
 
     # ---------- Orchestration ----------
     def run(self, block_on_rate_limit: bool = False):
@@ -371,14 +538,46 @@ class GrokTrendsCollector:
         print(f'🚀 Grok Trends Collection - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
         print(f'{"=" * 60}\n')
 
-        tweets = self.collect(block_on_rate_limit=block_on_rate_limit)
-        if tweets:
-            self.process_topics()
-            self.compute_trends()
-            self.compute_hourly_trends()  # ← Add this line
-            self.show_top_trends()
+        Pipeline(self.stages(block_on_rate_limit), max_workers=PIPELINE_WORKERS).run()
         print(f'\n{"=" * 60}\n')
 
+    def stages(self, block_on_rate_limit: bool = False):
+        """The collection DAG; the daily and hourly rollups run side by side."""
+        if HOURLY_ROLLUP == 'etl':
+            from analysis.etl_.etl_hourly import update_hourly as hourly
+        else:
+            hourly = self.compute_hourly_trends
+        from analysis.etl_.breakouts import detect_breakouts
+        coordinated = self.coordinator is not None
+        hourly_deps = ['process_topics'] + (['refresh_engagement'] if ENGAGEMENT_REFRESH else [])
+        stages = [
+            # Coordinated: the rollup leader processes every instance's tweets,
+            # so its own empty shard mustn't hold the rollups back.
+            Stage('collect', lambda conn: len(self.collect(block_on_rate_limit=block_on_rate_limit, conn=conn)),
+                  skip_if_empty=not coordinated),
+            Stage('process_topics', self.led('process_topics', self.process_topics), deps=['collect'],
+                  skip_if_empty=coordinated),
+            Stage('compute_trends', self.led('compute_trends', self.compute_trends), deps=['process_topics']),
+            Stage('compute_hourly_trends', self.led('compute_hourly_trends', hourly), deps=hourly_deps),
+            Stage('detect_breakouts', self.led('detect_breakouts', detect_breakouts), deps=['compute_hourly_trends']),
+            Stage('show_top_trends', lambda conn: self.show_top_trends(conn=conn), deps=['compute_trends']),
+        ]
+        if ENGAGEMENT_REFRESH:
+            # After collect, so this cycle's tweets can be candidates.
+            stages.append(Stage('refresh_engagement', self.led('refresh_engagement', self.refresh_engagement),
+                                deps=['collect']))
+        return stages
+
+    def led(self, stage, fn):
+        """Coordinated mode: run `fn` only on the instance leading `stage`."""
+        if self.coordinator is None:
+            return fn
+
+        def run(conn):
+            with self.coordinator.leading(stage):
+                return fn(conn)
+        return run
+
     def close(self):
         try:
             self.conn.close()
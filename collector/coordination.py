@@ -0,0 +1,181 @@
+# collector/coordination.py
+# Lets several collector instances (e.g. schedule_runner on two nodes) share
+# one database without doubling X API spend or racing on the rollups.
+#
+# Everything is a row in collector_leases (name, holder, expires_at):
+#
+#   member:<instance>  liveness; refreshed by a heartbeat thread. Live members,
+#                      sorted, split the search queries round-robin, so each
+#                      query has one owner and a dead instance's queries move
+#                      to the survivors once its lease expires.
+#   stage:<name>       leadership of a rollup stage. The holder renews it on
+#                      every heartbeat; a standby takes over when it lapses.
+#
+# Request slots themselves are claimed atomically in collector_budget (see
+# budget.py), so instances never double-spend even while shards move.
+#
+# Leases bound how long a dead holder blocks others. The stage itself also runs
+# under a session-level advisory lock, held on a connection of its own for the
+# whole stage (stages commit as they go), so a holder that stalls past its
+# lease can't overlap the instance that took it over.
+
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence, Set
+
+from grok_trends import db
+
+from .pipeline import Standby
+
+ACQUIRE_SQL = """
+    INSERT INTO collector_leases (name, holder, expires_at, acquired_at)
+    VALUES (%s, %s, NOW() + INTERVAL '1 second' * %s, NOW())
+    ON CONFLICT (name) DO UPDATE
+    SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at,
+        acquired_at = CASE WHEN collector_leases.holder = EXCLUDED.holder
+                           THEN collector_leases.acquired_at ELSE NOW() END
+    WHERE collector_leases.holder = EXCLUDED.holder OR collector_leases.expires_at <= NOW()
+    RETURNING holder
+"""
+
+
+class StageHeldElsewhere(Standby):
+    """Another instance leads this stage; this one is on standby for it."""
+
+
+def default_instance_id() -> str:
+    return os.getenv('COLLECTOR_INSTANCE_ID') or f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Coordinator:
+    def __init__(self, connect: Callable = db.connect, instance_id: Optional[str] = None,
+                 lease_seconds: float = 60.0, heartbeat_seconds: Optional[float] = None):
+        self.connect = connect
+        self.instance_id = instance_id or default_instance_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds or lease_seconds / 3
+        self.held: Set[str] = set()  # stage leases to keep renewing
+        self._conn = None
+        self._lock = threading.Lock()  # one statement at a time on self._conn
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- connection ----------
+    def _execute(self, query: str, params=()):
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._conn is None or self._conn.closed:
+                        self._conn = self.connect(autocommit=True)
+                    return self._conn.execute(query, params).fetchall()
+                except Exception:
+                    if self._conn is not None:
+                        self._conn.close()
+                    self._conn = None
+                    if attempt == 2:
+                        raise
+
+    # ---------- leases ----------
+    def acquire(self, name: str, seconds: Optional[float] = None) -> bool:
+        """Take or renew lease `name`; False while another live holder has it."""
+        rows = self._execute(ACQUIRE_SQL, (name, self.instance_id, seconds or self.lease_seconds))
+        return bool(rows)
+
+    def release(self, name: str):
+        self._execute('DELETE FROM collector_leases WHERE name = %s AND holder = %s', (name, self.instance_id))
+
+    # ---------- membership / sharding ----------
+    def heartbeat(self):
+        self.acquire(f'member:{self.instance_id}')
+        for name in list(self.held):
+            if not self.acquire(name):
+                print(f'⚠️  Lost lease {name}')
+                self.held.discard(name)
+
+    def members(self) -> List[str]:
+        rows = self._execute(
+            "SELECT holder FROM collector_leases WHERE name LIKE 'member:%%' AND expires_at > NOW() ORDER BY holder"
+        )
+        return [r[0] for r in rows]
+
+    def owned(self, items: Sequence) -> List[int]:
+        """Indexes of `items` this instance owns: item i belongs to live member i % n."""
+        members = self.members()
+        if self.instance_id not in members:
+            return []
+        me, n = members.index(self.instance_id), len(members)
+        return [i for i in range(len(items)) if i % n == me]
+
+    # ---------- stages ----------
+    @contextmanager
+    def leading(self, stage: str):
+        """Lead `stage` for the duration of the block, or raise StageHeldElsewhere."""
+        name = f'stage:{stage}'
+        if not self.acquire(name):
+            self.held.discard(name)
+            raise StageHeldElsewhere(name)
+        # Lock ids are 64-bit; hashtextextended keeps distinct stage names apart.
+        key = f'grok_trends:{name}'
+        conn = None
+        try:
+            conn = self.connect(autocommit=True)
+            locked = conn.execute('SELECT pg_try_advisory_lock(hashtextextended(%s, 0))', (key,)).fetchone()[0]
+        except Exception:
+            if conn is not None:
+                conn.close()
+            self._give_up(name)
+            raise
+        if not locked:  # previous leader still finishing after its lease lapsed
+            conn.close()
+            self._give_up(name)
+            raise StageHeldElsewhere(name)
+        self.held.add(name)
+        try:
+            yield
+        finally:
+            try:
+                conn.execute('SELECT pg_advisory_unlock(hashtextextended(%s, 0))', (key,))
+            except Exception as e:
+                print(f'⚠️  Unlocking {name} failed (closing the session releases it): {e}')
+            finally:
+                conn.close()
+
+    def _give_up(self, name: str):
+        """Drop a lease just taken for a stage this instance won't run, so the heartbeat stops renewing it."""
+        self.held.discard(name)
+        try:
+            self.release(name)
+        except Exception as e:
+            print(f'⚠️  Releasing {name} failed (it expires on its own): {e}')
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self.heartbeat()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='collector-heartbeat', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                print(f'collector heartbeat failed: {e}')
+
+    def stop(self):
+        """Hand everything over now instead of waiting for leases to expire."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            for name in list(self.held) + [f'member:{self.instance_id}']:
+                self.release(name)
+            self.held.clear()
+        except Exception as e:
+            print(f'collector lease release failed: {e}')
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,14 +1,10 @@
-import os, psycopg2
+# Run from the repo root: python -m collector.db_init
 from dotenv import load_dotenv
 
+from grok_trends import db
+
 load_dotenv()
-conn = psycopg2.connect(
-    host=os.getenv('PGHOST'),
-    database=os.getenv('PGDATABASE'),
-    user=os.getenv('PGUSER'),
-    password=os.getenv('PGPASSWORD'),
-    port=os.getenv('PGPORT', '5432')
-)
+conn = db.connect()
 cur = conn.cursor()
 
 # Raw tweets with engagement metrics
@@ -29,9 +25,11 @@ cur.execute('''
         quote_count INT DEFAULT 0,
         author_followers INT DEFAULT 0,
         is_quote BOOLEAN DEFAULT FALSE,
-        is_reply BOOLEAN DEFAULT FALSE
+        is_reply BOOLEAN DEFAULT FALSE,
+        metrics_updated_at TIMESTAMP
     );
 ''')
+cur.execute('ALTER TABLE raw_tweets ADD COLUMN IF NOT EXISTS metrics_updated_at TIMESTAMP;')
 
 # Topics extracted from tweets
 cur.execute('''
@@ -85,11 +83,176 @@ cur.execute('''
     );
 ''')
 
+# Budget planner (collector/budget.py): per-query hourly usage, request gate, rate-limit windows
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS api_usage_hourly (
+        hour_ts TIMESTAMPTZ NOT NULL,
+        search_query VARCHAR(200) NOT NULL,
+        requests INT NOT NULL DEFAULT 0,
+        posts_pulled INT NOT NULL DEFAULT 0,
+        new_tweets INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (hour_ts, search_query)
+    );
+''')
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS collector_budget (
+        query VARCHAR(200) PRIMARY KEY,
+        next_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        yield_ewma DOUBLE PRECISION,
+        requests BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+''')
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS api_rate_limits (
+        endpoint VARCHAR(50) PRIMARY KEY,
+        rate_limit INT NOT NULL,
+        remaining INT NOT NULL,
+        reset_at TIMESTAMPTZ NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+''')
+
+# Hourly buckets to re-aggregate after an engagement refresh (collector/engagement.py)
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS trend_dirty_hours (
+        bucket_ts TIMESTAMPTZ PRIMARY KEY,
+        marked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+''')
+
+# Burst detection (analysis/etl_/breakouts.py): per-topic baselines and detected breakouts
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS burst_state (
+        topic_name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        mean DOUBLE PRECISION NOT NULL,
+        var DOUBLE PRECISION NOT NULL,
+        hours BIGINT NOT NULL,
+        first_hour TIMESTAMPTZ NOT NULL,
+        last_hour TIMESTAMPTZ NOT NULL,
+        onset_at TIMESTAMPTZ,
+        PRIMARY KEY (topic_name, category)
+    );
+''')
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS trend_breakouts (
+        topic_name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        bucket_ts TIMESTAMPTZ NOT NULL,
+        mentions INT NOT NULL,
+        expected DOUBLE PRECISION NOT NULL,
+        z_score DOUBLE PRECISION NOT NULL,
+        lift DOUBLE PRECISION NOT NULL,
+        onset_at TIMESTAMPTZ NOT NULL,
+        partial BOOLEAN NOT NULL DEFAULT FALSE,
+        detected_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (topic_name, category, bucket_ts)
+    );
+''')
+
+# Sliding-window top-K checkpoint (grok_trends/topk.py)
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS topic_sketch_panes (
+        window_name VARCHAR(8) NOT NULL,
+        pane_start TIMESTAMPTZ NOT NULL,
+        capacity INT NOT NULL,
+        topics TEXT[] NOT NULL,
+        categories TEXT[] NOT NULL,
+        counts BIGINT[] NOT NULL,
+        errors BIGINT[] NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (window_name, pane_start)
+    );
+''')
+
+# Spooled pages already loaded into raw_tweets (collector/spool.py)
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS spooled_pages (
+        page_id VARCHAR(32) PRIMARY KEY,
+        search_query VARCHAR(200) NOT NULL,
+        fetched_at TIMESTAMPTZ NOT NULL,
+        posts INT NOT NULL,
+        new_tweets INT,
+        loaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+''')
+
+# Rollup versions (bumped on every ETL commit, used for API ETags)
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        dataset VARCHAR(50) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT NOW()
+    );
+''')
+
+# Precomputed listings for keyset pagination (refreshed by compute_trends)
+cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS trend_leaderboard (
+        window_days INT NOT NULL,
+        topic_name VARCHAR(200) NOT NULL,
+        category VARCHAR(50) NOT NULL DEFAULT '',
+        total_mentions BIGINT NOT NULL,
+        avg_growth DOUBLE PRECISION NOT NULL DEFAULT 0,
+        PRIMARY KEY (window_days, topic_name, category)
+    );
+''')
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS topic_totals (
+        topic_name VARCHAR(200) NOT NULL,
+        category VARCHAR(50) NOT NULL DEFAULT '',
+        mentions BIGINT NOT NULL,
+        PRIMARY KEY (topic_name, category)
+    );
+''')
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name VARCHAR(50) PRIMARY KEY,
+        as_of DATE NOT NULL,
+        refreshed_at TIMESTAMPTZ DEFAULT NOW()
+    );
+''')
+
+# Per-stage timings of collector/pipeline.py runs
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS pipeline_runs (
+        id BIGSERIAL PRIMARY KEY,
+        run_id VARCHAR(32) NOT NULL,
+        stage VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        rows INTEGER,
+        started_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ,
+        duration_ms DOUBLE PRECISION,
+        error TEXT
+    );
+''')
+
+# Leases for coordinated multi-instance collectors (collector/coordination.py)
+cur.execute('''
+    CREATE TABLE IF NOT EXISTS collector_leases (
+        name VARCHAR(255) PRIMARY KEY,
+        holder VARCHAR(255) NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL,
+        acquired_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+''')
+
 # Create indexes for performance
 cur.execute('CREATE INDEX IF NOT EXISTS idx_topics_mentioned ON topics(mentioned_at);')
 cur.execute('CREATE INDEX IF NOT EXISTS idx_topics_name ON topics(topic_name);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_topics_tweet ON topics(tweet_id);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_raw_tweets_created ON raw_tweets(created_at);')
 cur.execute('CREATE INDEX IF NOT EXISTS idx_hourly_ts ON trend_agg_hourly(bucket_ts);')
 cur.execute('CREATE INDEX IF NOT EXISTS idx_hourly_topic ON trend_agg_hourly(topic_name);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_order ON trend_leaderboard(window_days, total_mentions DESC, avg_growth DESC, topic_name DESC, category DESC);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_leaderboard_category_order ON trend_leaderboard(window_days, category, total_mentions DESC, avg_growth DESC, topic_name DESC);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_topic_totals_order ON topic_totals(mentions DESC, topic_name DESC, category DESC);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_trend_breakouts_recent ON trend_breakouts(bucket_ts DESC, z_score DESC);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_pipeline_runs_stage ON pipeline_runs(stage, started_at DESC);')
+cur.execute('CREATE INDEX IF NOT EXISTS idx_topic_totals_name_trgm ON topic_totals USING gin (topic_name gin_trgm_ops);')
 
 conn.commit()
 cur.close()
@@ -0,0 +1,122 @@
+# collector/engagement.py
+# Re-fetches public metrics for recent tweets. raw_tweets stores like,
+# retweet, reply and quote counts as of collection, when they are near zero,
+# so the engagement-weighted hourly rollups need them refreshed.
+#
+# Only tweets younger than the decay window are refreshed, most promising
+# first: engagement per hour of age (recency and velocity) times how long ago
+# the metrics were last read. Each batch is one 100-id lookup and one UPDATE
+# that also marks the hourly buckets whose tweets changed in
+# trend_dirty_hours; the hourly rollup rebuilds those.
+#
+# The client is anything with tweepy.Client's get_tweets(ids=, tweet_fields=)
+# returning an object with .data (items with .id and .public_metrics), so a
+# local fake can stand in for the X API.
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+BATCH_SIZE = 100  # GET /2/tweets accepts at most 100 ids
+
+METRICS = ('like_count', 'retweet_count', 'reply_count', 'quote_count')
+
+CANDIDATES_SQL = """
+    SELECT tweet_id FROM raw_tweets
+    WHERE created_at >= NOW() - INTERVAL '1 hour' * %s
+      AND COALESCE(metrics_updated_at, collected_at) <= NOW() - INTERVAL '1 minute' * %s
+    ORDER BY (1 + COALESCE(like_count, 0) + 2 * COALESCE(retweet_count, 0)
+                + COALESCE(reply_count, 0) + COALESCE(quote_count, 0))
+             / POWER(EXTRACT(EPOCH FROM NOW() - created_at) / 3600.0 + 2, 1.5)
+             * EXTRACT(EPOCH FROM NOW() - COALESCE(metrics_updated_at, collected_at)) DESC
+    LIMIT %s
+"""
+
+# One statement per batch. Ids the API didn't return (deleted, protected)
+# keep their counts but are stamped, so they aren't asked for again at once.
+UPDATE_SQL = """
+    WITH fetched AS (
+        SELECT * FROM unnest(%s::varchar[], %s::int[], %s::int[], %s::int[], %s::int[])
+            AS f(tweet_id, like_count, retweet_count, reply_count, quote_count)
+    ),
+    before AS (
+        SELECT rt.tweet_id, rt.like_count, rt.retweet_count, rt.reply_count, rt.quote_count
+        FROM raw_tweets rt JOIN fetched f ON f.tweet_id = rt.tweet_id
+    ),
+    updated AS (
+        UPDATE raw_tweets rt
+        SET like_count = COALESCE(f.like_count, rt.like_count),
+            retweet_count = COALESCE(f.retweet_count, rt.retweet_count),
+            reply_count = COALESCE(f.reply_count, rt.reply_count),
+            quote_count = COALESCE(f.quote_count, rt.quote_count),
+            metrics_updated_at = NOW()
+        FROM fetched f
+        WHERE rt.tweet_id = f.tweet_id
+        RETURNING rt.tweet_id, rt.like_count, rt.retweet_count, rt.reply_count, rt.quote_count
+    ),
+    changed AS (
+        SELECT u.tweet_id FROM updated u JOIN before b ON b.tweet_id = u.tweet_id
+        WHERE (u.like_count, u.retweet_count, u.reply_count, u.quote_count)
+              IS DISTINCT FROM (b.like_count, b.retweet_count, b.reply_count, b.quote_count)
+    ),
+    dirty AS (
+        INSERT INTO trend_dirty_hours (bucket_ts)
+        -- mentioned_at is naive UTC; convert explicitly, not via the session TimeZone.
+        SELECT DISTINCT date_trunc('hour', t.mentioned_at) AT TIME ZONE 'UTC'
+        FROM topics t JOIN changed c ON c.tweet_id = t.tweet_id
+        ON CONFLICT (bucket_ts) DO NOTHING
+        RETURNING bucket_ts
+    )
+    SELECT (SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM changed), (SELECT COUNT(*) FROM dirty)
+"""
+
+
+class EngagementRefresher:
+    def __init__(self, client, decay_hours: float = 48.0, min_age_minutes: float = 60.0):
+        self.client = client
+        self.decay_hours = decay_hours          # older tweets have settled
+        self.min_age_minutes = min_age_minutes  # don't re-read a tweet more often than this
+
+    def candidates(self, cur, limit: int) -> List[str]:
+        cur.execute(CANDIDATES_SQL, (self.decay_hours, self.min_age_minutes, limit))
+        return [r[0] for r in cur.fetchall()]
+
+    def fetch(self, ids: Sequence[str]) -> Dict[str, Tuple[int, int, int, int]]:
+        """Current metrics by tweet id for one lookup of up to BATCH_SIZE ids."""
+        res = self.client.get_tweets(ids=list(ids), tweet_fields=['public_metrics'])
+        metrics = {}
+        for t in res.data or []:
+            pm = getattr(t, 'public_metrics', None) or {}
+            metrics[str(t.id)] = tuple(int(pm.get(m, 0)) for m in METRICS)
+        return metrics
+
+    def apply(self, cur, ids: Sequence[str], metrics: Dict[str, Tuple[int, int, int, int]]) -> Tuple[int, int, int]:
+        """Write one batch; returns (tweets stamped, tweets changed, buckets newly marked dirty)."""
+        columns = [[metrics.get(i, (None,) * len(METRICS))[k] for i in ids] for k in range(len(METRICS))]
+        cur.execute(UPDATE_SQL, (list(ids), *columns))
+        return cur.fetchone()
+
+    def refresh(self, conn, batches: int = 1, ids: Optional[Sequence[str]] = None,
+                on_lookup: Optional[Callable[[object, int], None]] = None) -> dict:
+        """Refresh `ids` (default: the top `batches` lookups' worth of candidates), committing each batch.
+
+        on_lookup(cursor, tweets returned) runs once per API lookup made, in
+        the transaction that writes its results.
+        """
+        stats = {'lookups': 0, 'requested': 0, 'returned': 0, 'changed': 0, 'dirty_hours': 0}
+        with conn.cursor() as cur:
+            if ids is None:
+                ids = self.candidates(cur, batches * BATCH_SIZE)
+                conn.commit()
+            ids = list(ids)
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                metrics = self.fetch(batch)
+                _, changed, dirty = self.apply(cur, batch, metrics)
+                if on_lookup is not None:
+                    on_lookup(cur, len(metrics))
+                conn.commit()
+                stats['lookups'] += 1
+                stats['requested'] += len(batch)
+                stats['returned'] += len(metrics)
+                stats['changed'] += changed
+                stats['dirty_hours'] += dirty
+        return stats
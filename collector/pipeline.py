@@ -0,0 +1,154 @@
+# collector/pipeline.py
+# Runs the collection stages as a DAG: each stage starts as soon as the
+# stages it depends on have succeeded, on its own connection, so independent
+# rollups overlap and a run takes as long as its critical path.
+#
+# A stage function takes a connection and returns the number of rows it
+# produced (or None); it commits its own work. A failed stage skips its
+# dependents but not unrelated branches. With skip_if_empty, a stage that
+# returns 0 rows skips its dependents too (nothing new to roll up). A stage
+# that raises Standby (another instance runs it) doesn't block its dependents.
+# Every stage's outcome, duration and row count is written to pipeline_runs.
+
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from grok_trends import db
+
+
+class Standby(Exception):
+    """Raised by a stage whose work another instance is doing."""
+
+
+class Stage(NamedTuple):
+    name: str
+    fn: Callable[..., Optional[int]]  # (conn) -> rows
+    deps: Sequence[str] = ()
+    skip_if_empty: bool = False
+
+
+class StageResult(NamedTuple):
+    stage: str
+    status: str  # ok, failed, skipped, standby
+    rows: Optional[int]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    duration_ms: Optional[float]
+    error: Optional[str]
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], connect: Callable = db.connect, max_workers: int = 4):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError('duplicate stage names')
+        for s in stages:
+            for d in s.deps:
+                if d not in self.stages:
+                    raise ValueError(f'stage {s.name!r} depends on unknown stage {d!r}')
+        self._check_acyclic()
+        self.connect = connect
+        self.max_workers = max_workers
+
+    def _check_acyclic(self):
+        state = {}  # name -> 1 visiting, 2 done
+
+        def visit(name, path):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = 1
+            for d in self.stages[name].deps:
+                visit(d, path + [name])
+            state[name] = 2
+
+        for name in self.stages:
+            visit(name, [])
+
+    def run(self) -> List[StageResult]:
+        run_id = uuid.uuid4().hex
+        started = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        results: Dict[str, StageResult] = {}
+        pending = dict(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pipeline') as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dep_results = [results.get(d) for d in stage.deps]
+                    if any(r is None for r in dep_results):
+                        continue
+                    del pending[name]
+                    blocked = [r.stage for r in dep_results if r.status not in ('ok', 'standby') or (
+                        r.status == 'ok' and self.stages[r.stage].skip_if_empty and not r.rows)]
+                    if blocked:
+                        results[name] = StageResult(name, 'skipped', None, None, None, None,
+                                                    f"upstream: {', '.join(blocked)}")
+                        print(f'⏭  {name} skipped (upstream: {", ".join(blocked)})')
+                        continue
+                    running[pool.submit(self._run_stage, stage)] = name
+                if not running:
+                    continue  # everything left became skippable this pass
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[running.pop(fut)] = fut.result()
+
+        total_ms = (time.perf_counter() - t0) * 1000
+        ordered = [results[name] for name in self.stages]
+        failed = [r.stage for r in ordered if r.status == 'failed']
+        summary = StageResult('pipeline', 'failed' if failed else 'ok',
+                              sum(r.rows or 0 for r in ordered if r.status == 'ok'),
+                              started, datetime.now(timezone.utc), total_ms,
+                              f"failed: {', '.join(failed)}" if failed else None)
+        self._record(run_id, ordered + [summary])
+        print(f'⏱  Pipeline {summary.status} in {total_ms / 1000:.1f}s '
+              f'(stages total {sum(r.duration_ms or 0 for r in ordered) / 1000:.1f}s)')
+        return ordered
+
+    def _run_stage(self, stage: Stage) -> StageResult:
+        started = datetime.now(timezone.utc)
+        t0 = time.perf_counter()
+        conn = None
+        try:
+            conn = self.connect()
+            rows = stage.fn(conn)
+            conn.commit()
+            status, error = 'ok', None
+        except Standby as e:
+            rows, status, error = None, 'standby', f'held elsewhere: {e}'
+            print(f'💤 {stage.name}: standby ({e})')
+        except Exception as e:
+            rows, status, error = None, 'failed', str(e)[:1000]
+            print(f'❌ {stage.name} failed: {e}')
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        return StageResult(stage.name, status, rows, started, datetime.now(timezone.utc),
+                           (time.perf_counter() - t0) * 1000, error)
+
+    def _record(self, run_id: str, results: List[StageResult]):
+        try:
+            conn = self.connect()
+            try:
+                with conn.cursor() as cur:
+                    cur.executemany(
+                        """
+                        INSERT INTO pipeline_runs
+                            (run_id, stage, status, rows, started_at, finished_at, duration_ms, error)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        [(run_id,) + tuple(r) for r in results],
+                    )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f'pipeline_runs insert failed: {e}')
@@ -1,21 +1,56 @@
+# Run from the repo root so grok_trends is importable:
+#   python -m collector.schedule_runner
+#
+# COLLECTOR_COORDINATION=1 lets several copies run against one database:
+# they split the search queries and elect one leader per rollup stage
+# (see collector/coordination.py).
+#
+# Pages fetched while the database is down wait in TWEET_SPOOL_DIR; a
+# background flusher loads them once it is back (see collector/spool.py).
+import os
 import time
+from dotenv import load_dotenv
 from collector import GrokTrendsCollector
+from collector.collector import RAW_TWEET_COLUMNS, TWEET_SPOOL_DIR, account_page
+from collector.coordination import Coordinator
+from collector.spool import SpoolFlusher, open_spool
+
+load_dotenv()
+
+coordinator = None
+if os.getenv("COLLECTOR_COORDINATION", "0") == "1":
+    coordinator = Coordinator(lease_seconds=float(os.getenv("COLLECTOR_LEASE_SECONDS", "60")))
+    coordinator.start()
+    print(f"🤝 Coordinated mode as {coordinator.instance_id}")
+
+flusher = SpoolFlusher(
+    open_spool(TWEET_SPOOL_DIR), RAW_TWEET_COLUMNS, on_loaded=account_page,
+    interval=float(os.getenv("SPOOL_FLUSH_SECONDS", "30")),
+)
+flusher.start()
 
 print("🔄 Starting Grok Trends scheduled collector...")
 print("Running every 15 minutes. Press Ctrl+C to stop.\n")
 
-while True:
-    try:
-        c = GrokTrendsCollector()
-        c.run(block_on_rate_limit=True)  # Will auto-wait if rate limited
-        c.close()
-    except KeyboardInterrupt:
-        print("\n👋 Stopping collector...")
-        break
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
+try:
+    while True:
+        try:
+            c = GrokTrendsCollector(coordinator=coordinator)
+            c.run(block_on_rate_limit=True)  # Will auto-wait if rate limited
+            c.close()
+        except KeyboardInterrupt:
+            raise
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
 
-    print(f"\n⏰ Sleeping for 15 minutes...")
-    time.sleep(15 * 60)
\ No newline at end of file
+        print(f"\n⏰ Sleeping for 15 minutes...")
+        time.sleep(15 * 60)
+except KeyboardInterrupt:
+    print("\n👋 Stopping collector...")
+finally:
+    flusher.stop()
+    open_spool(TWEET_SPOOL_DIR).close()
+    if coordinator is not None:
+        coordinator.stop()  # hand shards and stage leases to the other instances now
@@ -0,0 +1,183 @@
+# collector/seen_filter.py
+# Drops tweets the collector has already stored before they reach the spool
+# and raw_tweets. The two search queries overlap heavily and so do
+# consecutive recent-search windows, so most of a page is usually known.
+#
+# Two layers, checked in order:
+#   exact LRU    ids seen by this process recently; a hit is certain.
+#   bloom filter the newest ids in raw_tweets (warmed at start) and everything
+#                seen since. A hit may be a false positive, so bloom-only
+#                hits are checked against raw_tweets in one indexed query and
+#                kept unless found there. A false positive therefore costs a read,
+#                never a lost tweet.
+#
+# The bloom filter has two generations that rotate when the current one
+# reaches capacity, so old ids age out and the false-positive rate stays near
+# its target. If the measured rate exceeds the budget anyway, the filter is
+# rebuilt from the database.
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = capacity
+        self.bits = max(8, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenFilter:
+    def __init__(self, capacity: int = 200_000, fp_rate: float = 0.01, lru_size: int = 20_000,
+                 fp_budget: float = 0.02):
+        self.capacity = capacity
+        self.fp_rate = fp_rate        # bloom sizing target
+        self.fp_budget = fp_budget    # measured rate that triggers a rebuild
+        self.lru_size = lru_size
+        self._lock = threading.Lock()
+        self._lru: 'OrderedDict[str, None]' = OrderedDict()
+        self._current = BloomFilter(capacity, fp_rate)
+        self._previous: Optional[BloomFilter] = None
+        self.warmed = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.checked = 0         # ids offered to unseen()
+        self.dropped = 0         # known ids filtered out
+        self.bloom_hits = 0      # bloom-only positives sent to the database
+        self.false_positives = 0
+
+    # ---------- state ----------
+    def add(self, ids: Iterable[str]):
+        with self._lock:
+            for tweet_id in ids:
+                self._remember(tweet_id)
+
+    def _remember(self, tweet_id: str):
+        self._lru[tweet_id] = None
+        self._lru.move_to_end(tweet_id)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+        if self._current.count >= self.capacity:
+            self._previous, self._current = self._current, BloomFilter(self.capacity, self.fp_rate)
+        self._current.add(tweet_id)
+
+    def _in_bloom(self, tweet_id: str) -> bool:
+        return tweet_id in self._current or (self._previous is not None and tweet_id in self._previous)
+
+    def warm(self, conn):
+        """Load the most recently collected ids (up to capacity) into a fresh filter."""
+        with conn.cursor() as cur:
+            # id is insertion order and indexed; collected_at is not.
+            cur.execute('SELECT tweet_id FROM raw_tweets ORDER BY id DESC LIMIT %s', (self.capacity,))
+            ids = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        with self._lock:
+            self._lru.clear()
+            self._current, self._previous = BloomFilter(self.capacity, self.fp_rate), None
+            for tweet_id in reversed(ids):  # oldest first, so the LRU keeps the newest
+                self._remember(tweet_id)
+            self.warmed = True
+            self._reset_stats()
+        return len(ids)
+
+    # ---------- filtering ----------
+    def unseen(self, conn, ids: Sequence[str]) -> List[str]:
+        """The ids from `ids` that are not stored yet (order kept).
+
+        Never drops an unknown id: bloom-only hits are confirmed against
+        raw_tweets, and if that check fails they are all kept.
+        """
+        if not self.warmed:
+            try:
+                self.warm(conn)
+            except Exception as e:
+                print(f'seen filter: warm-up failed, filtering from memory only: {e}')
+                conn.rollback()
+        with self._lock:
+            maybe = []
+            known = set()
+            for tweet_id in ids:
+                if tweet_id in self._lru:
+                    self._lru.move_to_end(tweet_id)
+                    known.add(tweet_id)
+                elif self._in_bloom(tweet_id):
+                    maybe.append(tweet_id)
+        if maybe:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT tweet_id FROM raw_tweets WHERE tweet_id = ANY(%s)', (maybe,))
+                    stored = {r[0] for r in cur.fetchall()}
+                known |= stored
+            except Exception as e:
+                print(f'seen filter: lookup failed, keeping {len(maybe)} possible duplicates: {e}')
+                conn.rollback()
+                stored = set(maybe)  # unknown; don't count them as false positives
+        else:
+            stored = set()
+        fresh = [tweet_id for tweet_id in ids if tweet_id not in known]
+
+        with self._lock:
+            self.checked += len(ids)
+            self.dropped += len(ids) - len(fresh)
+            self.bloom_hits += len(maybe)
+            self.false_positives += len(maybe) - len(stored)
+            over_budget = self.bloom_hits >= 100 and self.false_positive_rate() > self.fp_budget
+        if over_budget:
+            print(f'seen filter: false-positive rate {self.false_positive_rate():.1%} over budget, rebuilding')
+            self.warmed = False
+        return fresh
+
+    # ---------- stats ----------
+    def false_positive_rate(self) -> float:
+        """Share of ids that were absent from the database but hit the bloom filter."""
+        negatives = self.checked - self.dropped
+        return self.false_positives / negatives if negatives else 0.0
+
+    def dedup_ratio(self) -> float:
+        return self.dropped / self.checked if self.checked else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'checked': self.checked,
+            'dropped': self.dropped,
+            'dedup_ratio': round(self.dedup_ratio(), 4),
+            'bloom_hits': self.bloom_hits,
+            'false_positives': self.false_positives,
+            'false_positive_rate': round(self.false_positive_rate(), 4),
+            'lru': len(self._lru),
+            'bloom_ids': self._current.count + (self._previous.count if self._previous else 0),
+        }
+
+
+_FILTER: Optional[SeenFilter] = None
+_FILTER_LOCK = threading.Lock()
+
+
+def shared_filter(**kwargs) -> SeenFilter:
+    """The process-wide SeenFilter (collectors are recreated every cycle; the filter is not)."""
+    global _FILTER
+    with _FILTER_LOCK:
+        if _FILTER is None:
+            _FILTER = SeenFilter(**kwargs)
+        return _FILTER
@@ -0,0 +1,283 @@
+# collector/spool.py
+# Local append-only spool for fetched search pages, so tweets that already
+# cost API quota survive a slow or unreachable database.
+#
+# collect() appends each page here (fsynced) before touching raw_tweets; a
+# flusher then loads sealed segments into Postgres when it is healthy.
+#
+# On disk: segments named tweets.<pid>.<ns>.<state> in the spool directory,
+#   .seg      being appended to by process <pid>
+#   .ready    sealed, waiting to be loaded
+#   .loading  claimed by flusher process <pid> (back to .ready if it dies)
+# Each record is a 4-byte big-endian length, a 4-byte CRC32 and a
+# zlib-compressed JSON page. Reading stops at the first torn or corrupt record
+# (a crash mid-append), which was never acknowledged. Use one Spool per
+# directory and process (open_spool), so a process never mistakes its own
+# in-flight files for a dead one's.
+#
+# Exactly-once: every page carries a page_id. Loading a page inserts its id
+# into spooled_pages in the same transaction as the rows, and a page whose id
+# is already there is skipped. raw_tweets additionally dedups on tweet_id, so
+# the same tweet fetched by two pages is stored once. A segment is deleted
+# only after all its pages committed; replaying it after a crash is harmless.
+
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from grok_trends import db
+
+HEADER = struct.Struct('>II')  # length, crc32 of the compressed payload
+
+
+class Spool:
+    def __init__(self, directory: str, max_segment_bytes: int = 8 * 1024 * 1024, fsync: bool = True):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[str] = None
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    # ---------- writing ----------
+    def append(self, page: dict) -> str:
+        """Durably append one page (assigning its page_id); returns the id."""
+        page = dict(page, page_id=page.get('page_id') or uuid.uuid4().hex)
+        payload = zlib.compress(json.dumps(page, default=_encode).encode(), 6)
+        with self._lock:
+            if self._file is None:
+                self._path = os.path.join(self.directory, f'tweets.{os.getpid()}.{time.time_ns()}.seg')
+                self._file = open(self._path, 'ab')
+            self._file.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            if self._file.tell() >= self.max_segment_bytes:
+                self._seal()
+        return page['page_id']
+
+    def seal(self):
+        """Close the active segment so a flusher can take it."""
+        with self._lock:
+            self._seal()
+
+    def _seal(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path, self._path[:-len('.seg')] + '.ready')
+        self._file, self._path = None, None
+        if self.fsync:
+            _fsync_dir(self.directory)
+
+    def close(self):
+        self.seal()
+
+    # ---------- reading ----------
+    def claim(self) -> List[str]:
+        """Take every sealed segment for loading (oldest first); other flushers skip them."""
+        claimed = []
+        for path in sorted(glob.glob(os.path.join(self.directory, 'tweets.*.ready')), key=_segment_order):
+            _, _, ns, _ = os.path.basename(path).split('.')
+            loading = os.path.join(self.directory, f'tweets.{os.getpid()}.{ns}.loading')
+            try:
+                os.rename(path, loading)
+            except OSError:
+                continue  # another flusher got it
+            claimed.append(loading)
+        return claimed
+
+    def release(self, path: str):
+        """Give a claimed segment back (load failed); it is retried later."""
+        os.replace(path, path[:-len('.loading')] + '.ready')
+
+    def pending(self) -> int:
+        return len(glob.glob(os.path.join(self.directory, 'tweets.*.ready')))
+
+    def _recover(self):
+        """Seal active segments and release claims left behind by dead processes."""
+        for path in glob.glob(os.path.join(self.directory, 'tweets.*')):
+            if _owner_alive(path):
+                continue
+            if path.endswith('.seg'):
+                os.replace(path, path[:-len('.seg')] + '.ready')
+            elif path.endswith('.loading'):
+                os.replace(path, path[:-len('.loading')] + '.ready')
+
+
+_SPOOLS = {}
+_SPOOLS_LOCK = threading.Lock()
+
+
+def open_spool(directory: str, **kwargs) -> Spool:
+    """The process-wide Spool for `directory`."""
+    directory = os.path.abspath(directory)
+    with _SPOOLS_LOCK:
+        if directory not in _SPOOLS:
+            _SPOOLS[directory] = Spool(directory, **kwargs)
+        return _SPOOLS[directory]
+
+
+def read_pages(path: str) -> Iterator[dict]:
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        length, crc = HEADER.unpack_from(data, pos)
+        payload = data[pos + HEADER.size:pos + HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            print(f'spool: {os.path.basename(path)} truncated at byte {pos}; ignoring the rest')
+            return
+        yield json.loads(zlib.decompress(payload))
+        pos += HEADER.size + length
+
+
+# ---------- loading ----------
+PageHook = Callable[[object, dict, int], None]  # (cursor, page, new tweets) -> None, inside the page's transaction
+
+
+def load_page(conn, page: dict, columns: List[str], on_loaded: Optional[PageHook] = None) -> Optional[int]:
+    """Load one page in its own transaction; new tweet count, or None if it was loaded before."""
+    rows = [_decode_row(r, columns) for r in page['rows']]
+    page = dict(page, fetched_at=datetime.fromisoformat(page['fetched_at']))
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO spooled_pages (page_id, search_query, fetched_at, posts)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (page_id) DO NOTHING
+        """, (page['page_id'], page['query'], page['fetched_at'], page.get('posts', len(rows))))
+        if cur.rowcount == 0:
+            return None
+        added = db.copy_upsert(cur, 'raw_tweets', columns, rows, conflict=['tweet_id']) if rows else 0
+        cur.execute('UPDATE spooled_pages SET new_tweets = %s WHERE page_id = %s', (added, page['page_id']))
+        if on_loaded is not None:
+            on_loaded(cur, page, added)
+    return added
+
+
+def flush(spool: Spool, conn, columns: List[str], on_loaded: Optional[PageHook] = None) -> dict:
+    """Load every sealed segment; a failing segment is released for the next attempt.
+
+    Commits whatever `conn` has pending first: each page is its own transaction.
+    """
+    conn.commit()
+    spool.seal()
+    stats = {'segments': 0, 'pages': 0, 'duplicates': 0, 'new_tweets': 0, 'failed': 0}
+    for path in spool.claim():
+        try:
+            for page in read_pages(path):
+                added = load_page(conn, page, columns, on_loaded)
+                if added is None:
+                    stats['duplicates'] += 1
+                else:
+                    stats['pages'] += 1
+                    stats['new_tweets'] += added
+        except Exception as e:
+            stats['failed'] += 1
+            print(f'spool: loading {os.path.basename(path)} failed, will retry: {e}')
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            spool.release(path)
+            continue
+        os.remove(path)
+        stats['segments'] += 1
+    return stats
+
+
+class SpoolFlusher:
+    """Background thread that keeps retrying the spool until it is empty."""
+
+    def __init__(self, spool: Spool, columns: List[str], connect: Callable = db.connect,
+                 on_loaded: Optional[PageHook] = None, interval: float = 30.0):
+        self.spool = spool
+        self.columns = columns
+        self.connect = connect
+        self.on_loaded = on_loaded
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='spool-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.spool.pending():
+                continue
+            try:
+                conn = self.connect()
+            except Exception as e:
+                print(f'spool flusher: database unavailable: {e}')
+                continue
+            try:
+                stats = flush(self.spool, conn, self.columns, self.on_loaded)
+                if stats['pages'] or stats['duplicates']:
+                    print(f'spool flusher: {stats}')
+            finally:
+                conn.close()
+
+
+# ---------- helpers ----------
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'cannot spool {type(value).__name__}')
+
+
+def _segment_order(path: str) -> int:
+    try:
+        return int(os.path.basename(path).split('.')[2])  # creation time (ns)
+    except (IndexError, ValueError):
+        return 0
+
+
+def _decode_row(row: list, columns: List[str]) -> tuple:
+    row = list(row)
+    for i, col in enumerate(columns):
+        if col.endswith('_at') and isinstance(row[i], str):
+            row[i] = datetime.fromisoformat(row[i])
+    return tuple(row)
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)  # make renames durable
+    finally:
+        os.close(fd)
+
+
+def _owner_alive(path: str) -> bool:
+    """Whether the process that wrote spool file `path` (tweets.<pid>...) is still running."""
+    try:
+        pid = int(os.path.basename(path).split('.')[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False  # our own leftovers (pid reused after a restart)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -1,16 +1,13 @@
 # connector.py (shared helper)
-import os, psycopg
-from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+# Kept for seed_mock.py / init_schema.py; connections come from grok_trends.db.
+import os
+from grok_trends import db
 
 def build_dsn():
-    dsn = os.getenv("DATABASE_URL")
-    if not dsn:
+    if not os.getenv("DATABASE_URL"):
         raise RuntimeError("DATABASE_URL is not set")
-    # Ensure SSL in cloud
-    parsed = urlparse(dsn)
-    q = dict(parse_qsl(parsed.query, keep_blank_values=True))
-    q.setdefault("sslmode", "require")
-    return urlunparse(parsed._replace(query=urlencode(q)))
+    return db.conninfo()
 
 def get_conn():
-    return psycopg.connect(build_dsn(), autocommit=False)
+    build_dsn()
+    return db.connect()
@@ -1,18 +1,11 @@
-import os
-import psycopg2
+from grok_trends import db
 from datetime import datetime, timedelta
 import random
 from dotenv import load_dotenv
 
 load_dotenv()
 
-conn = psycopg2.connect(
-    host=os.getenv('PGHOST'),
-    database=os.getenv('PGDATABASE'),
-    user=os.getenv('PGUSER'),
-    password=os.getenv('PGPASSWORD'),
-    port=os.getenv('PGPORT', '5432')
-)
+conn = db.connect()
 cur = conn.cursor()
 
 print("🎨 Creating mock data for Grok Trends demo...\n")
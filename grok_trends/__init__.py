@@ -0,0 +1 @@
+# grok_trends: code shared by the API, the collector and the ETL jobs.
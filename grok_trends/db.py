@@ -0,0 +1,315 @@
+# grok_trends/db.py
+# The one place that knows how to reach Postgres (psycopg 3), shared by the
+# API, the collector, the ETL and the one-off scripts:
+#
+#   conninfo()      DATABASE_URL (sslmode=require unless set) or PG* vars, plus
+#                   TCP keepalives for PaaS
+#   configure()     per-session defaults: UTC, statement_timeout
+#   connect()       one configured connection (scripts, collector, ETL)
+#   make_pool()     psycopg_pool.ConnectionPool with configure + health check
+#   SingleConnection  pool-shaped single connection for serverless instances
+#   statement() / execute()   named, prepared hot queries
+#   pipelined()     several independent queries in one round trip
+#   copy_rows() / copy_upsert()   binary COPY in place of multi-row INSERTs
+#
+# Environment is read when these functions are called, not at import, so
+# callers can load .env first.
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+from psycopg.pq import TransactionStatus
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+KEEPALIVE_DEFAULTS = {
+    "keepalives": ("PG_KEEPALIVES", "1"),
+    "keepalives_idle": ("PG_KEEPALIVES_IDLE", "30"),
+    "keepalives_interval": ("PG_KEEPALIVES_INTERVAL", "10"),
+    "keepalives_count": ("PG_KEEPALIVES_COUNT", "5"),
+}
+
+
+# ---------- connection info / session ----------
+def ensure_ssl_in_dsn(dsn: str) -> str:
+    """Append sslmode=require to a URL-style DSN if not present (for hosted PG)."""
+    if "://" not in dsn:
+        return dsn
+    parsed = urlparse(dsn)
+    q = dict(parse_qsl(parsed.query, keep_blank_values=True))
+    if "sslmode" not in q:
+        q["sslmode"] = os.getenv("PGSSLMODE", "require")
+    return urlunparse(parsed._replace(query=urlencode(q)))
+
+
+def conninfo(dsn: Optional[str] = None) -> str:
+    """Resolve connection info from `dsn`, DATABASE_URL or discrete PG* vars."""
+    dsn = dsn or os.getenv("DATABASE_URL")
+    if dsn:
+        base = ensure_ssl_in_dsn(dsn)
+    else:
+        base = make_conninfo(
+            host=os.getenv("PGHOST", "localhost"),
+            dbname=os.getenv("PGDATABASE", "postgres"),
+            user=os.getenv("PGUSER", "postgres"),
+            password=os.getenv("PGPASSWORD", ""),
+            port=os.getenv("PGPORT", "5432"),
+            sslmode=os.getenv("PGSSLMODE", "prefer"),
+        )
+    # Keepalives help on PaaS; explicit settings in the DSN win.
+    present = conninfo_to_dict(base)
+    extra = {k: os.getenv(env, default) for k, (env, default) in KEEPALIVE_DEFAULTS.items() if k not in present}
+    return make_conninfo(base, **extra)
+
+
+def statement_timeout_ms() -> int:
+    return int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "60000"))
+
+
+def configure(conn: psycopg.Connection):
+    """Per-session defaults, run once per physical connection (not per checkout)."""
+    conn.execute(f"SET TIME ZONE 'UTC'; SET statement_timeout = {statement_timeout_ms()}")
+    if not conn.autocommit:
+        conn.commit()  # the pool requires configure() to leave the connection idle
+
+
+def prepare_enabled() -> bool:
+    # Transaction-mode poolers (PgBouncer < 1.21, Supavisor) don't keep
+    # server-side prepared statements between transactions: PG_PREPARE=0.
+    return os.getenv("PG_PREPARE", "1") == "1"
+
+
+def connect(dsn: Optional[str] = None, autocommit: bool = False, **kwargs) -> psycopg.Connection:
+    """Open one configured connection."""
+    if not prepare_enabled():
+        kwargs.setdefault("prepare_threshold", None)
+    conn = psycopg.connect(conninfo(dsn), autocommit=autocommit, **kwargs)
+    configure(conn)
+    return conn
+
+
+# ---------- pooling ----------
+def make_pool(dsn: Optional[str] = None, max_size: Optional[int] = None, name: str = "primary",
+              timeout: Optional[float] = None, **kwargs) -> ConnectionPool:
+    conn_kwargs = {"autocommit": False}  # we control commit/rollback
+    if not prepare_enabled():
+        conn_kwargs["prepare_threshold"] = None
+    return ConnectionPool(
+        conninfo=conninfo(dsn),
+        max_size=max_size or int(os.getenv("PGPOOL_MAX", "5")),
+        timeout=timeout if timeout is not None else float(os.getenv("PGPOOL_TIMEOUT", "30")),
+        name=name,
+        kwargs=conn_kwargs,
+        configure=configure,
+        # Health check on checkout: a dead connection (PaaS idle kill,
+        # failover) is discarded and replaced instead of failing the request.
+        check=ConnectionPool.check_connection,
+        **kwargs,
+    )
+
+
+class SingleConnection:
+    """One lazily opened connection behind the subset of ConnectionPool's API used here.
+
+    For serverless instances, which handle one request at a time and are
+    frozen between invocations: no pool worker threads and no warm-up. Point
+    DATABASE_URL at an external pooler (PgBouncer, Neon/Supabase pooled URL)
+    to share server connections across instances.
+    """
+
+    def __init__(self, dsn: Optional[str] = None, name: str = "primary", timeout: Optional[float] = None,
+                 check_idle_seconds: float = 30.0):
+        self.conninfo = conninfo(dsn)
+        self.name = name
+        self.timeout = timeout if timeout is not None else float(os.getenv("PGPOOL_TIMEOUT", "30"))
+        self.check_idle_seconds = check_idle_seconds
+        self._conn: Optional[psycopg.Connection] = None
+        self._lock = threading.Lock()
+        self._last_used = 0.0
+        self.connects = 0
+        self.requests = 0
+
+    def getconn(self, timeout: Optional[float] = None) -> psycopg.Connection:
+        if not self._lock.acquire(timeout=self.timeout if timeout is None else timeout):
+            raise PoolTimeout(f"couldn't get the connection after {timeout or self.timeout:.1f} sec")
+        try:
+            if not self._usable():
+                if self._conn is not None:
+                    self._conn.close()
+                # prepare_threshold=None: transaction-mode poolers don't keep
+                # server-side prepared statements between transactions.
+                self._conn = psycopg.connect(self.conninfo, autocommit=False, prepare_threshold=None)
+                configure(self._conn)
+                self.connects += 1
+        except BaseException:
+            self._lock.release()
+            raise
+        self.requests += 1
+        return self._conn
+
+    def _usable(self) -> bool:
+        conn = self._conn
+        if conn is None or conn.closed or conn.broken:
+            return False
+        if time.monotonic() - self._last_used < self.check_idle_seconds:
+            return True
+        # The instance may have been frozen long enough for the server or a
+        # NAT to drop the socket; one round trip is cheaper than a failed query.
+        try:
+            ConnectionPool.check_connection(conn)
+            return True
+        except Exception:
+            return False
+
+    def putconn(self, conn: psycopg.Connection):
+        try:
+            if not conn.closed and conn.info.transaction_status != TransactionStatus.IDLE:
+                conn.rollback()
+        except Exception:
+            conn.close()
+        finally:
+            self._last_used = time.monotonic()
+            self._lock.release()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def get_stats(self) -> dict:
+        return {"connections_num": self.connects, "requests_num": self.requests}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ---------- prepared statements ----------
+class Statement(NamedTuple):
+    name: str
+    sql: str
+
+
+STATEMENTS: Dict[str, Statement] = {}
+
+
+def statement(name: str, query: str) -> Statement:
+    """Register a hot query under a name; run it with execute()."""
+    if name in STATEMENTS and STATEMENTS[name].sql != query:
+        raise ValueError(f"statement {name!r} already registered with different SQL")
+    STATEMENTS[name] = stmt = Statement(name, query)
+    return stmt
+
+
+def execute(target, query: Union[Statement, str], params: Optional[Sequence[Any]] = None):
+    """Run a query on a connection or cursor, server-side prepared on first use.
+
+    psycopg keeps prepared statements per connection, keyed by SQL text, so
+    every later execution on that connection skips parse and plan. Dynamic
+    SQL with a bounded number of shapes can go through here too.
+    """
+    text = query.sql if isinstance(query, Statement) else query
+    conn = target if isinstance(target, psycopg.Connection) else target.connection
+    # Connections opened with prepare_threshold=None (poolers) never prepare.
+    prepare = conn.prepare_threshold is not None or None
+    return target.execute(text, params, prepare=prepare)
+
+
+def pipelined(conn: psycopg.Connection, queries: Iterable[Tuple[Union[Statement, str], Optional[Sequence[Any]]]]
+              ) -> List[List[tuple]]:
+    """Send independent queries in one round trip (pipeline mode); return each one's rows."""
+    with conn.pipeline():
+        cursors = [execute(conn.cursor(), q, p) for q, p in queries]
+    return [cur.fetchall() for cur in cursors]
+
+
+# ---------- binary COPY ----------
+_COLUMN_TYPES: Dict[Tuple[str, Tuple[str, ...]], List[int]] = {}
+
+
+def column_types(cur, table: str, columns: Sequence[str]) -> List[int]:
+    """Type OIDs of `columns` in `table` (cached), as binary COPY needs them."""
+    key = (table, tuple(columns))
+    if key not in _COLUMN_TYPES:
+        cur.execute(
+            """
+            SELECT attname, atttypid::int FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attname = ANY(%s) AND NOT attisdropped
+            """,
+            (table, list(columns)),
+        )
+        found = dict(cur.fetchall())
+        missing = [c for c in columns if c not in found]
+        if missing:
+            raise ValueError(f"{table} has no column(s) {missing}")
+        _COLUMN_TYPES[key] = [found[c] for c in columns]
+    return _COLUMN_TYPES[key]
+
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+              types: Optional[Sequence[Union[int, str]]] = None) -> int:
+    """COPY rows into `table` in binary format; returns the number of rows written.
+
+    Binary COPY sends each value as the column's exact type, so rows must
+    already hold matching Python values (str for varchar, int for integer
+    columns, naive datetimes for `timestamp`).
+    """
+    types = types or column_types(cur, table, columns)
+    stmt = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+        sql.Identifier(*table.split(".")), sql.SQL(", ").join(map(sql.Identifier, columns)),
+    )
+    n = 0
+    with cur.copy(stmt) as copy:
+        copy.set_types(types)
+        for row in rows:
+            copy.write_row(row)
+            n += 1
+    return n
+
+
+def copy_upsert(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                conflict: Sequence[str], update: Sequence[str] = (),
+                staging_types: Optional[Sequence[str]] = None) -> int:
+    """Binary COPY into a temp table, then INSERT ... ON CONFLICT into `table`.
+
+    With `update` empty, conflicting rows are skipped (DO NOTHING); with
+    DO UPDATE, rows must be unique on `conflict`. The staging table copies
+    the target's column types unless `staging_types` names them, in which
+    case the INSERT applies Postgres' assignment casts (e.g. when deployments
+    disagree on a column's type). Returns the number of rows inserted or
+    updated in `table`.
+    """
+    staging_name = f"_copy_{table.replace('.', '_')}"
+    staging = sql.Identifier(staging_name)
+    target = sql.Identifier(*table.split("."))
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging))
+    if staging_types:
+        cur.execute(sql.SQL("CREATE TEMP TABLE {} ({}) ON COMMIT DROP").format(
+            staging, sql.SQL(", ").join(
+                sql.SQL("{} {}").format(sql.Identifier(c), sql.SQL(t)) for c, t in zip(columns, staging_types)
+            ),
+        ))
+        types = list(staging_types)
+    else:
+        cur.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(staging, target))
+        types = column_types(cur, table, columns)
+    if not copy_rows(cur, staging_name, columns, rows, types):
+        return 0
+    cols = sql.SQL(", ").join(map(sql.Identifier, columns))
+    action = sql.SQL("DO NOTHING") if not update else sql.SQL("DO UPDATE SET {}").format(
+        sql.SQL(", ").join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in update)
+    )
+    cur.execute(sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} ON CONFLICT ({}) {}").format(
+        target, cols, cols, staging, sql.SQL(", ").join(map(sql.Identifier, conflict)), action,
+    ))
+    return cur.rowcount
@@ -0,0 +1,210 @@
+# grok_trends/topk.py
+# Sliding-window top-K topics in bounded memory.
+#
+# Each window (15m, 1h, 6h) is a ring of panes. Each pane is a Space-Saving
+# summary holding at most `capacity` counters (TOPK_CAPACITY), so memory is
+# panes x capacity whatever the topic cardinality. A window's top-K merges the
+# panes that overlap it. The window therefore slides in pane-sized steps.
+#
+# The collector feeds topics by mention time as it extracts them and
+# checkpoints changed panes to topic_sketch_panes in the same transaction.
+# The API merges the checkpointed panes (merge_panes) for /api/trending-now.
+#
+# Space-Saving guarantees: a key's true count lies in [count - error, count],
+# and any key with a true count above total / capacity is in the summary.
+
+import heapq
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Key = Tuple[str, str]  # (topic_name, category)
+
+# name -> (span seconds, pane seconds)
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "15m": (15 * 60, 60),
+    "1h": (60 * 60, 5 * 60),
+    "6h": (6 * 60 * 60, 30 * 60),
+}
+DEFAULT_CAPACITY = 256
+
+
+class SpaceSaving:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[Key, int] = {}
+        self.errors: Dict[Key, int] = {}
+        self._heap: List[Tuple[int, Key]] = []  # lazy min-heap; stale entries skipped
+
+    def add(self, key: Key, n: int = 1):
+        if key in self.counts:
+            self.counts[key] += n
+        elif len(self.counts) < self.capacity:
+            self.counts[key], self.errors[key] = n, 0
+        else:
+            # Replace the smallest counter; its count becomes the newcomer's error bound.
+            floor, victim = self._pop_min()
+            del self.counts[victim], self.errors[victim]
+            self.counts[key], self.errors[key] = floor + n, floor
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, k) for k, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[int, Key]:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+    def min_count(self) -> int:
+        """Upper bound on the count of any key not in a full summary."""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def rows(self) -> Tuple[List[str], List[str], List[int], List[int]]:
+        keys = list(self.counts)
+        return ([k[0] for k in keys], [k[1] for k in keys],
+                [self.counts[k] for k in keys], [self.errors[k] for k in keys])
+
+    @classmethod
+    def from_rows(cls, capacity: int, topics: Sequence[str], categories: Sequence[str],
+                  counts: Sequence[int], errors: Sequence[int]) -> "SpaceSaving":
+        s = cls(capacity)
+        for key, c, e in zip(zip(topics, categories), counts, errors):
+            s.counts[key], s.errors[key] = int(c), int(e)
+        s._heap = [(c, k) for k, c in s.counts.items()]
+        heapq.heapify(s._heap)
+        return s
+
+
+def merge_panes(panes: Iterable[SpaceSaving], limit: int) -> List[dict]:
+    """Top `limit` keys over several panes, with error bounds.
+
+    A key missing from a full pane may still have up to that pane's minimum
+    count there, so that is added to its error.
+    """
+    panes = list(panes)
+    counts: Dict[Key, int] = {}
+    errors: Dict[Key, int] = {}
+    for p in panes:
+        for k, c in p.counts.items():
+            counts[k] = counts.get(k, 0) + c
+            errors[k] = errors.get(k, 0) + p.errors[k]
+    for p in panes:
+        floor = p.min_count()
+        if floor:
+            for k in counts:
+                if k not in p.counts:
+                    counts[k] += floor
+                    errors[k] += floor
+    ranked = sorted(counts, key=lambda k: (-counts[k], k))
+    out = []
+    for i, k in enumerate(ranked[:limit]):
+        below = counts[ranked[i + 1]] if i + 1 < len(ranked) else 0
+        out.append({
+            "topic": k[0],
+            "category": k[1],
+            "count": counts[k],
+            "error": errors[k],
+            # Its lower bound beats the next key's upper bound: the rank is certain.
+            "guaranteed": counts[k] - errors[k] >= below,
+        })
+    return out
+
+
+def oldest_pane(span: int, pane: int, now: float) -> float:
+    """Start of the oldest pane still inside a window of `span` seconds at `now` (epoch seconds)."""
+    return (now // pane - (span // pane - 1)) * pane
+
+
+class SlidingTopK:
+    def __init__(self, capacity: Optional[int] = None, windows: Dict[str, Tuple[int, int]] = WINDOWS):
+        self.capacity = capacity or int(os.getenv("TOPK_CAPACITY", str(DEFAULT_CAPACITY)))
+        self.windows = windows
+        self.panes: Dict[str, Dict[float, SpaceSaving]] = {w: {} for w in windows}
+        self.touched = set()  # (window, pane_start) changed since the last save
+        self.loaded = False
+        self.version: Optional[int] = None  # data_versions 'topic_sketch' we last loaded or wrote
+        self.lock = threading.Lock()
+
+    def add(self, key: Key, ts: datetime, n: int = 1, now: Optional[float] = None):
+        """Count a mention at `ts` (naive datetimes are UTC); mentions older than a window skip it."""
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        t = min(_epoch(ts), now)
+        for w, (span, pane) in self.windows.items():
+            start = t // pane * pane
+            if start < oldest_pane(span, pane, now):
+                continue
+            self.panes[w].setdefault(start, SpaceSaving(self.capacity)).add(key, n)
+            self.touched.add((w, start))
+
+    def expire(self, now: Optional[float] = None):
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        for w, panes in self.panes.items():
+            oldest = oldest_pane(*self.windows[w], now)
+            for start in [s for s in panes if s < oldest]:
+                del panes[start]
+                self.touched.discard((w, start))
+
+    def top(self, window: str, limit: int = 20, now: Optional[float] = None) -> List[dict]:
+        self.expire(now)
+        return merge_panes(self.panes[window].values(), limit)
+
+    # ---------- checkpoint ----------
+    def load(self, cur):
+        cur.execute("""
+            SELECT window_name, EXTRACT(EPOCH FROM pane_start), capacity, topics, categories, counts, errors
+            FROM topic_sketch_panes
+        """)
+        self.panes = {w: {} for w in self.windows}
+        for w, start, capacity, topics, cats, counts, errors in cur.fetchall():
+            if w in self.panes:
+                self.panes[w][float(start)] = SpaceSaving.from_rows(capacity, topics, cats, counts, errors)
+        self.touched.clear()
+        self.expire()
+        self.loaded = True
+
+    def save(self, cur) -> int:
+        """Write changed panes and drop expired ones (caller commits)."""
+        self.expire()
+        rows = []
+        for w, start in sorted(self.touched):
+            topics, cats, counts, errors = self.panes[w][start].rows()
+            rows.append((w, datetime.fromtimestamp(start, tz=timezone.utc), self.capacity,
+                         topics, cats, counts, errors))
+        if rows:
+            cur.executemany("""
+                INSERT INTO topic_sketch_panes
+                    (window_name, pane_start, capacity, topics, categories, counts, errors, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (window_name, pane_start) DO UPDATE
+                SET capacity = EXCLUDED.capacity, topics = EXCLUDED.topics, categories = EXCLUDED.categories,
+                    counts = EXCLUDED.counts, errors = EXCLUDED.errors, updated_at = EXCLUDED.updated_at
+            """, rows)
+        now = datetime.now(timezone.utc).timestamp()
+        for w, (span, pane) in self.windows.items():
+            oldest = oldest_pane(span, pane, now)
+            cur.execute("DELETE FROM topic_sketch_panes WHERE window_name = %s AND pane_start < %s",
+                        (w, datetime.fromtimestamp(oldest, tz=timezone.utc)))
+        self.touched.clear()
+        return len(rows)
+
+
+_SKETCH: Optional[SlidingTopK] = None
+_SKETCH_LOCK = threading.Lock()
+
+
+def shared_sketch() -> SlidingTopK:
+    """The process-wide SlidingTopK (collectors are recreated every cycle; the sketch is not)."""
+    global _SKETCH
+    with _SKETCH_LOCK:
+        if _SKETCH is None:
+            _SKETCH = SlidingTopK()
+        return _SKETCH
+
+
+def _epoch(ts: datetime) -> float:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
@@ -0,0 +1,194 @@
+# live.py
+# Server-Sent Events fan-out for trend updates.
+#
+# The collector/ETL calls pg_notify('grok_trends_updates', ...) in the same
+# transaction that rewrites a rollup. One listener thread per API process
+# LISTENs on that channel, re-reads the leaderboard and the latest hourly bucket
+# once, and pushes a compact diff to every subscribed SSE connection in memory.
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+import orjson
+import psycopg
+
+CHANNEL = "grok_trends_updates"
+
+LEADERBOARD_SQL = """
+    SELECT topic_name, category,
+           SUM(mention_count) AS total_mentions,
+           AVG(growth_rate)   AS avg_growth
+    FROM trend_aggregations
+    WHERE date >= CURRENT_DATE - INTERVAL '1 day' * %s
+    GROUP BY topic_name, category
+    ORDER BY total_mentions DESC, avg_growth DESC
+    LIMIT %s
+"""
+
+LATEST_HOURLY_SQL = """
+    SELECT bucket_ts, topic_name, mentions, weighted
+    FROM trend_agg_hourly
+    WHERE bucket_ts = (SELECT MAX(bucket_ts) FROM trend_agg_hourly)
+"""
+
+
+def sse_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    """One SSE connection: an asyncio queue owned by the connection's event loop."""
+
+    def __init__(self, broadcaster: "TrendsBroadcaster", topics: Iterable[str],
+                 loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.broadcaster = broadcaster
+        self.topics: FrozenSet[str] = frozenset(topics)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, chunk: bytes):
+        """Runs on the subscriber's loop. Slow consumers are resynced, never block the fan-out."""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            chunk = self.broadcaster.snapshot(self.topics)
+        self.queue.put_nowait(chunk)
+
+
+class TrendsBroadcaster:
+    """Single shared DB listener fanned out to any number of SSE subscribers."""
+
+    def __init__(self, conninfo: str, channel: str = CHANNEL, days: int = 7, limit: int = 20,
+                 max_queue: int = 16, reconnect_delay: float = 5.0):
+        self.conninfo = conninfo
+        self.channel = channel
+        self.days = days
+        self.limit = limit
+        self.max_queue = max_queue
+        self.reconnect_delay = reconnect_delay
+        self.on_notify: List[Callable[[], None]] = []
+
+        self._lock = threading.Lock()
+        self._subs: Set[Subscriber] = set()
+        self._leaderboard: List[dict] = []
+        self._bucket: Optional[str] = None
+        self._hourly: Dict[str, dict] = {}
+        self._version = 0
+        self.last_refresh: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trends-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ---------- subscriptions ----------
+    def subscribe(self, topics: Iterable[str]) -> Subscriber:
+        sub = Subscriber(self, topics, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subs.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    def snapshot(self, topics: FrozenSet[str]) -> bytes:
+        """Full state for a new (or resynced) subscriber."""
+        with self._lock:
+            lb = {"version": self._version, "full": True, "upserts": self._leaderboard, "removed": []}
+            hourly = self._hourly_for(topics)
+        return sse_event("leaderboard", lb) + sse_event("hourly", hourly)
+
+    def _hourly_for(self, topics: FrozenSet[str]) -> dict:
+        return {
+            "version": self._version,
+            "bucket": self._bucket,
+            "values": {t: self._hourly[t] for t in topics if t in self._hourly},
+        }
+
+    # ---------- listener ----------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {self.channel}")
+                    self._refresh(conn)
+                    while not self._stop.is_set():
+                        # Exhaust each generator: it holds the connection lock while open.
+                        if not list(conn.notifies(timeout=1.0, stop_after=1)):
+                            continue
+                        # Collector commits arrive in bursts (daily + hourly
+                        # rollups); drain them and read once.
+                        for _ in conn.notifies(timeout=0.2):
+                            pass
+                        for cb in self.on_notify:
+                            cb()
+                        self._refresh(conn)
+            except Exception as e:
+                print(f"live updates listener error: {e}")
+                self._stop.wait(self.reconnect_delay)
+
+    def _refresh(self, conn: psycopg.Connection):
+        with conn.cursor() as cur:
+            cur.execute(LEADERBOARD_SQL, (self.days, self.limit))
+            lb_rows = cur.fetchall()
+            cur.execute(LATEST_HOURLY_SQL)
+            hr_rows = cur.fetchall()
+
+        leaderboard = [
+            {"topic": t, "category": c, "mentions": int(m), "growth": round(float(g or 0), 1), "rank": i + 1}
+            for i, (t, c, m, g) in enumerate(lb_rows)
+        ]
+        bucket = hr_rows[0][0].replace(tzinfo=None).isoformat() + "Z" if hr_rows else None
+        hourly = {topic: {"mentions": int(m), "weighted": int(w)} for _, topic, m, w in hr_rows}
+
+        with self._lock:
+            old = {(e["topic"], e["category"]): e for e in self._leaderboard}
+            new = {(e["topic"], e["category"]): e for e in leaderboard}
+            upserts = [e for k, e in new.items() if old.get(k) != e]
+            removed = [{"topic": k[0], "category": k[1]} for k in old.keys() - new.keys()]
+            prev_hourly, prev_bucket = self._hourly, self._bucket
+
+            self._leaderboard, self._bucket, self._hourly = leaderboard, bucket, hourly
+            self._version += 1
+            subs = list(self._subs)
+
+            # Encode the shared diff once, and each distinct topic set once.
+            lb_chunk = None
+            if upserts or removed:
+                lb_chunk = sse_event("leaderboard", {
+                    "version": self._version, "full": False, "upserts": upserts, "removed": removed,
+                })
+            by_topics: Dict[FrozenSet[str], Optional[bytes]] = {}
+            for sub in subs:
+                if sub.topics in by_topics:
+                    continue
+                changed = bucket != prev_bucket or any(
+                    hourly.get(t) != prev_hourly.get(t) for t in sub.topics
+                )
+                by_topics[sub.topics] = sse_event("hourly", self._hourly_for(sub.topics)) if changed else None
+
+        for sub in subs:
+            chunk = (lb_chunk or b"") + (by_topics[sub.topics] or b"")
+            if chunk:
+                try:
+                    sub.loop.call_soon_threadsafe(sub.offer, chunk)
+                except RuntimeError:
+                    # Loop closed under us (worker shutting down).
+                    self.unsubscribe(sub)
+        self.last_refresh = time.time()
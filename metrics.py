@@ -0,0 +1,165 @@
+# metrics.py
+# Minimal in-process metrics rendered in Prometheus text format (0.0.4).
+# Counters and histograms are per worker process; scrape every worker or
+# aggregate with sum() in PromQL.
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def time(self, *labels: str):
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, s in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                le = _fmt_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _fmt_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {s[-1]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {s[-2]}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {s[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: Labels):
+        self.hist, self.labels = hist, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[Labels, float]], Tuple[str, ...]]] = []
+
+    def counter(self, name, doc, labelnames=()) -> Counter:
+        m = Counter(name, doc, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, doc, labelnames, buckets)
+        self._metrics.append(m)
+        return m
+
+    def gauge_callback(self, name: str, doc: str, fn: Callable[[], Dict[Labels, float]],
+                       labelnames: Sequence[str] = ()):
+        """Gauge whose samples are read at scrape time: fn() -> {labels: value}."""
+        self._gauges.append((name, doc, fn, tuple(labelnames)))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        for name, doc, fn, labelnames in self._gauges:
+            try:
+                samples = fn()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, v in sorted(samples.items()):
+                lines.append(f"{name}{_fmt_labels(labelnames, labels)} {v}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and status counts.
+
+    Uses the matched route template (e.g. /api/interest), never the raw path,
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, latency: Histogram, requests: Counter, skip_paths: Sequence[str] = ()):
+        self.app = app
+        self.latency = latency
+        self.requests = requests
+        self.skip_paths = tuple(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_paths):
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            self.latency.observe(time.perf_counter() - start, path, method)
+            self.requests.inc(path, method, str(status["code"]))
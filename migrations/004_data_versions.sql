@@ -0,0 +1,11 @@
+-- Monotonic version counter per rollup table, bumped by the collector/ETL in
+-- the same transaction that rewrites the rollup. The API derives ETags from it.
+CREATE TABLE IF NOT EXISTS data_versions (
+    dataset    VARCHAR(50) PRIMARY KEY,  -- trend_aggregations, trend_agg_hourly
+    version    BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+INSERT INTO data_versions (dataset, version)
+VALUES ('trend_aggregations', 0), ('trend_agg_hourly', 0)
+ON CONFLICT (dataset) DO NOTHING;
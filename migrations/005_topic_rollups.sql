@@ -0,0 +1,44 @@
+-- Precomputed listings for keyset pagination. The collector rewrites them in
+-- the same transaction as trend_aggregations (see compute_trends), so they
+-- share its data version.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- /api/trends: per-window totals, ordered by
+-- (total_mentions, avg_growth, topic_name, category) DESC.
+CREATE TABLE IF NOT EXISTS trend_leaderboard (
+    window_days    INT NOT NULL,
+    topic_name     VARCHAR(200) NOT NULL,
+    category       VARCHAR(50) NOT NULL DEFAULT '',
+    total_mentions BIGINT NOT NULL,
+    avg_growth     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (window_days, topic_name, category)
+);
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_order
+    ON trend_leaderboard (window_days, total_mentions DESC, avg_growth DESC, topic_name DESC, category DESC);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_category_order
+    ON trend_leaderboard (window_days, category, total_mentions DESC, avg_growth DESC, topic_name DESC);
+
+-- /api/topics/search: all-time mentions per topic.
+CREATE TABLE IF NOT EXISTS topic_totals (
+    topic_name VARCHAR(200) NOT NULL,
+    category   VARCHAR(50) NOT NULL DEFAULT '',
+    mentions   BIGINT NOT NULL,
+    PRIMARY KEY (topic_name, category)
+);
+
+CREATE INDEX IF NOT EXISTS idx_topic_totals_order
+    ON topic_totals (mentions DESC, topic_name DESC, category DESC);
+-- ILIKE '%q%' can't use a btree; trigrams can.
+CREATE INDEX IF NOT EXISTS idx_topic_totals_name_trgm
+    ON topic_totals USING gin (topic_name gin_trgm_ops);
+
+-- When each listing was last rebuilt ('leaderboard:7', 'topic_totals', ...).
+-- The API only reads a leaderboard rebuilt on the current UTC date, since its
+-- window is relative to CURRENT_DATE; otherwise it aggregates live.
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name         VARCHAR(50) PRIMARY KEY,
+    as_of        DATE NOT NULL,
+    refreshed_at TIMESTAMPTZ DEFAULT NOW()
+);
@@ -0,0 +1,18 @@
+-- Inbox for provider webhooks (Stripe). The HTTP handler inserts and acks;
+-- webhook_worker.py applies events in the background. event_id is the
+-- provider's id, so redelivered events are dropped on insert.
+CREATE TABLE IF NOT EXISTS webhook_events (
+    event_id        VARCHAR(255) PRIMARY KEY,
+    event_type      VARCHAR(100) NOT NULL,
+    payload         JSONB NOT NULL,
+    status          VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending, done, ignored, failed
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error      TEXT,
+    received_at     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at    TIMESTAMPTZ
+);
+
+-- The worker's claim query only ever looks at due, pending events.
+CREATE INDEX IF NOT EXISTS idx_webhook_events_due
+    ON webhook_events (next_attempt_at, received_at) WHERE status = 'pending';
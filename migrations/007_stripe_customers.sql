@@ -0,0 +1,18 @@
+-- Local email -> Stripe customer mapping, filled by /api/create-checkout and
+-- checkout.session.completed webhooks, so returning customers skip the
+-- Customer.list call to Stripe.
+CREATE TABLE IF NOT EXISTS stripe_customers (
+    email       VARCHAR(255) PRIMARY KEY,
+    customer_id VARCHAR(255) NOT NULL,
+    created_at  TIMESTAMPTZ DEFAULT NOW(),
+    updated_at  TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_customers_customer ON stripe_customers(customer_id);
+
+-- Backfill from members we already know.
+INSERT INTO stripe_customers (email, customer_id)
+SELECT email, stripe_customer_id
+FROM paid_members
+WHERE stripe_customer_id IS NOT NULL
+ON CONFLICT (email) DO NOTHING;
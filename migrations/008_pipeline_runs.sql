@@ -0,0 +1,17 @@
+-- One row per stage per collection run, written by collector/pipeline.py
+-- (plus a 'pipeline' row with the end-to-end wall time). Independent stages
+-- overlap, so a run's wall time is its critical path, not the sum of stages.
+CREATE TABLE IF NOT EXISTS pipeline_runs (
+    id          BIGSERIAL PRIMARY KEY,
+    run_id      VARCHAR(32) NOT NULL,
+    stage       VARCHAR(50) NOT NULL,
+    status      VARCHAR(20) NOT NULL, -- ok, failed, skipped
+    rows        INTEGER,
+    started_at  TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    duration_ms DOUBLE PRECISION,
+    error       TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_pipeline_runs_stage ON pipeline_runs (stage, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_pipeline_runs_run ON pipeline_runs (run_id);
@@ -0,0 +1,9 @@
+-- Leases for coordinated collectors (collector/coordination.py): instance
+-- liveness (member:*) and rollup stage leadership (stage:*). A lease is free
+-- once expires_at has passed.
+CREATE TABLE IF NOT EXISTS collector_leases (
+    name        VARCHAR(255) PRIMARY KEY,
+    holder      VARCHAR(255) NOT NULL,
+    expires_at  TIMESTAMPTZ NOT NULL,
+    acquired_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
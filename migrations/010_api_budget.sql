@@ -0,0 +1,30 @@
+-- X API budget planning (collector/budget.py).
+
+-- Per-query usage by hour. The daily api_usage table is still written for
+-- the API's month-to-date stats.
+CREATE TABLE IF NOT EXISTS api_usage_hourly (
+    hour_ts      TIMESTAMPTZ NOT NULL,
+    search_query VARCHAR(200) NOT NULL,
+    requests     INTEGER NOT NULL DEFAULT 0,
+    posts_pulled INTEGER NOT NULL DEFAULT 0, -- posts returned (what the monthly cap counts)
+    new_tweets   INTEGER NOT NULL DEFAULT 0, -- of which not seen before
+    PRIMARY KEY (hour_ts, search_query)
+);
+
+-- The request gate: one row per query, next_at claimed with a conditional UPDATE.
+CREATE TABLE IF NOT EXISTS collector_budget (
+    query      VARCHAR(200) PRIMARY KEY,
+    next_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    yield_ewma DOUBLE PRECISION, -- new tweets per request
+    requests   BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Last x-rate-limit-* headers seen per endpoint.
+CREATE TABLE IF NOT EXISTS api_rate_limits (
+    endpoint   VARCHAR(50) PRIMARY KEY,
+    rate_limit INTEGER NOT NULL,
+    remaining  INTEGER NOT NULL,
+    reset_at   TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
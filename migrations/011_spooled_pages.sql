@@ -0,0 +1,11 @@
+-- Pages loaded from the collector's local spool (collector/spool.py). A page
+-- id is inserted in the same transaction as the page's tweets, so replaying a
+-- segment after a crash skips pages that already made it in.
+CREATE TABLE IF NOT EXISTS spooled_pages (
+    page_id      VARCHAR(32) PRIMARY KEY,
+    search_query VARCHAR(200) NOT NULL,
+    fetched_at   TIMESTAMPTZ NOT NULL,
+    posts        INTEGER NOT NULL,
+    new_tweets   INTEGER,
+    loaded_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
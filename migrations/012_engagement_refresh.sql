@@ -0,0 +1,14 @@
+-- Engagement refresh (collector/engagement.py): re-reads public metrics of
+-- recent tweets and marks the hourly buckets whose weights changed.
+ALTER TABLE raw_tweets ADD COLUMN IF NOT EXISTS metrics_updated_at TIMESTAMP;
+
+-- Candidate selection scans the decay window; the dirty marking joins
+-- changed tweets to their topics.
+CREATE INDEX IF NOT EXISTS idx_raw_tweets_created ON raw_tweets (created_at);
+CREATE INDEX IF NOT EXISTS idx_topics_tweet ON topics (tweet_id);
+
+-- Rebuilt and cleared by the hourly rollup.
+CREATE TABLE IF NOT EXISTS trend_dirty_hours (
+    bucket_ts TIMESTAMPTZ PRIMARY KEY,
+    marked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,35 @@
+-- Burst detection (analysis/etl_/breakouts.py).
+
+-- Per-topic EWMA baseline of hourly mentions, carried between runs.
+CREATE TABLE IF NOT EXISTS burst_state (
+    topic_name TEXT NOT NULL,
+    category   TEXT NOT NULL,
+    mean       DOUBLE PRECISION NOT NULL,
+    var        DOUBLE PRECISION NOT NULL,
+    hours      BIGINT NOT NULL,
+    first_hour TIMESTAMPTZ NOT NULL,
+    last_hour  TIMESTAMPTZ NOT NULL,
+    onset_at   TIMESTAMPTZ,
+    PRIMARY KEY (topic_name, category)
+);
+
+-- Detected breakouts served by /api/breakouts. partial rows score an hour
+-- that is still filling and are replaced on every run.
+CREATE TABLE IF NOT EXISTS trend_breakouts (
+    topic_name  TEXT NOT NULL,
+    category    TEXT NOT NULL,
+    bucket_ts   TIMESTAMPTZ NOT NULL,
+    mentions    INTEGER NOT NULL,
+    expected    DOUBLE PRECISION NOT NULL,
+    z_score     DOUBLE PRECISION NOT NULL,
+    lift        DOUBLE PRECISION NOT NULL,
+    onset_at    TIMESTAMPTZ NOT NULL,
+    partial     BOOLEAN NOT NULL DEFAULT FALSE,
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (topic_name, category, bucket_ts)
+);
+CREATE INDEX IF NOT EXISTS idx_trend_breakouts_recent ON trend_breakouts (bucket_ts DESC, z_score DESC);
+
+INSERT INTO data_versions (dataset, version)
+VALUES ('trend_breakouts', 0)
+ON CONFLICT (dataset) DO NOTHING;
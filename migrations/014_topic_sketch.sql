@@ -0,0 +1,18 @@
+-- Checkpoint of the collector's sliding-window top-K (grok_trends/topk.py):
+-- one Space-Saving summary per window pane, as parallel arrays. Read by
+-- /api/trending-now; expired panes are deleted by the collector.
+CREATE TABLE IF NOT EXISTS topic_sketch_panes (
+    window_name VARCHAR(8) NOT NULL,
+    pane_start  TIMESTAMPTZ NOT NULL,
+    capacity    INTEGER NOT NULL,
+    topics      TEXT[] NOT NULL,
+    categories  TEXT[] NOT NULL,
+    counts      BIGINT[] NOT NULL,
+    errors      BIGINT[] NOT NULL,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (window_name, pane_start)
+);
+
+INSERT INTO data_versions (dataset, version)
+VALUES ('topic_sketch', 0)
+ON CONFLICT (dataset) DO NOTHING;
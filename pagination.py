@@ -0,0 +1,47 @@
+# pagination.py
+# Opaque keyset cursors for leaderboard-style listings.
+#
+# A cursor is the sort key of the last row of a page plus that row's rank,
+# base64url-encoded JSON. The next page is everything strictly after that key
+# in the listing's ORDER BY, so each page is an index range scan of `limit`
+# rows no matter how deep the client has walked. Tokens are not signed: a
+# tampered token can only move the starting point.
+
+import base64
+import binascii
+from typing import Any, NamedTuple, Optional, Sequence, Tuple
+
+import orjson
+
+
+class Cursor(NamedTuple):
+    key: Tuple[Any, ...]  # sort key of the last row served
+    rank: int             # rank of that row, so ranks continue across pages
+
+
+def encode_cursor(kind: str, key: Sequence[Any], rank: int) -> str:
+    raw = orjson.dumps({"k": kind, "r": rank, "v": list(key)})
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: Optional[str], kind: str, arity: int) -> Optional[Cursor]:
+    """Parse a token produced by encode_cursor(kind, ...); raise ValueError if it isn't one."""
+    if not token:
+        return None
+    try:
+        doc = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError("malformed cursor")
+    if not isinstance(doc, dict) or doc.get("k") != kind:
+        raise ValueError(f"cursor does not belong to this listing ({kind})")
+    key, rank = doc.get("v"), doc.get("r")
+    if not isinstance(key, list) or len(key) != arity or not isinstance(rank, int):
+        raise ValueError("malformed cursor")
+    return Cursor(tuple(key), rank)
+
+
+def next_cursor(kind: str, rows: Sequence[Sequence[Any]], limit: int, key_of, first_rank: int) -> Optional[str]:
+    """Cursor for the page after `rows` (fetched with LIMIT limit + 1), or None on the last page."""
+    if len(rows) <= limit:
+        return None
+    return encode_cursor(kind, key_of(rows[limit - 1]), first_rank + limit - 1)
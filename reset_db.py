@@ -1,15 +1,8 @@
-import psycopg2, os
+from grok_trends import db
 from dotenv import load_dotenv
 
 load_dotenv()
-conn = psycopg2.connect(
-    host=os.getenv('PGHOST'),
-    database=os.getenv('PGDATABASE'),
-    user=os.getenv('PGUSER'),
-    password=os.getenv('PGPASSWORD'),
-    port=os.getenv('PGPORT', '5432')
-)
-conn.autocommit = True
+conn = db.connect(autocommit=True)
 cur = conn.cursor()
 
 print("Dropping old tables...")
@@ -19,6 +12,6 @@ cur.execute('DROP TABLE IF EXISTS topics CASCADE')
 cur.execute('DROP TABLE IF EXISTS raw_tweets CASCADE')
 cur.execute('DROP TABLE IF EXISTS api_usage CASCADE')
 
-print("✅ Tables dropped. Now run: python collector/db_init.py")
+print("✅ Tables dropped. Now run: python -m collector.db_init")
 cur.close()
 conn.close()
\ No newline at end of file
@@ -6,25 +6,15 @@ import os
 import random
 import argparse
 from datetime import datetime, timedelta, timezone
-from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
-import psycopg
+from grok_trends import db
 
 # ---------- Connection helpers (psycopg v3) ----------
 
-def _ensure_ssl_in_dsn(dsn: str) -> str:
-    """Append sslmode=require to a DATABASE_URL if not present."""
-    p = urlparse(dsn)
-    q = dict(parse_qsl(p.query, keep_blank_values=True))
-    q.setdefault("sslmode", os.getenv("PGSSLMODE", "require"))
-    return urlunparse(p._replace(query=urlencode(q)))
-
 def get_conn():
-    dsn = os.getenv("DATABASE_URL")
-    if not dsn:
+    if not os.getenv("DATABASE_URL"):
         raise RuntimeError("DATABASE_URL is not set. Add it in Render → Environment.")
-    dsn = _ensure_ssl_in_dsn(dsn)
-    return psycopg.connect(dsn, autocommit=False)
+    return db.connect()
 
 # ---------- Schema (tables + indexes) ----------
 
@@ -0,0 +1,89 @@
+# send_fake_webhook.py
+# Post locally signed fake Stripe events to the webhook endpoint.
+#
+# Signs with STRIPE_WEBHOOK_SECRET exactly like Stripe does
+# (Stripe-Signature: t=<unix ts>,v1=<hex HMAC-SHA256 of "<t>.<body>">), so
+# the real verification path runs; no Stripe account or CLI needed.
+#
+#   python send_fake_webhook.py checkout --email test@example.com
+#   python send_fake_webhook.py checkout --repeat 3          # same event id: stored once
+#   python send_fake_webhook.py cancel --subscription sub_fake_123
+#   python send_fake_webhook.py checkout --bad-signature     # expect 400
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def make_event(kind, args):
+    event_id = args.event_id or f"evt_fake_{uuid.uuid4().hex[:24]}"
+    if kind == "checkout":
+        event_type = "checkout.session.completed"
+        obj = {
+            "id": f"cs_fake_{uuid.uuid4().hex[:24]}",
+            "object": "checkout.session",
+            "customer": args.customer,
+            "subscription": args.subscription,
+            "customer_details": {"email": args.email},
+            "metadata": {"founding_member": "true", "locked_price": "2000"},
+        }
+    else:
+        event_type = "customer.subscription.deleted"
+        obj = {"id": args.subscription, "object": "subscription", "customer": args.customer, "status": "canceled"}
+    return {
+        "id": event_id,
+        "object": "event",
+        "api_version": "2024-06-20",
+        "created": int(time.time()),
+        "type": event_type,
+        "livemode": False,
+        "data": {"object": obj},
+    }
+
+
+def sign(body: bytes, secret: str, timestamp: int) -> str:
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={mac}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Send signed fake Stripe webhook events.")
+    ap.add_argument("kind", choices=["checkout", "cancel"])
+    ap.add_argument("--url", default=os.getenv("WEBHOOK_URL", "http://localhost:8000/api/stripe-webhook"))
+    ap.add_argument("--secret", default=os.getenv("STRIPE_WEBHOOK_SECRET"))
+    ap.add_argument("--email", default="founder@example.com")
+    ap.add_argument("--customer", default="cus_fake_123")
+    ap.add_argument("--subscription", default="sub_fake_123")
+    ap.add_argument("--event-id", help="reuse an id to exercise deduplication")
+    ap.add_argument("--repeat", type=int, default=1, help="deliver the same event N times")
+    ap.add_argument("--bad-signature", action="store_true")
+    args = ap.parse_args()
+    if not args.secret:
+        raise SystemExit("Set STRIPE_WEBHOOK_SECRET (any string; the API must use the same one) or pass --secret")
+
+    body = json.dumps(make_event(args.kind, args)).encode()
+    for i in range(args.repeat):
+        secret = "wrong" + args.secret if args.bad_signature else args.secret
+        req = Request(args.url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Stripe-Signature": sign(body, secret, int(time.time())),
+        })
+        try:
+            with urlopen(req, timeout=10) as resp:
+                print(f"[{i + 1}] {resp.status} {resp.read().decode()}")
+        except HTTPError as e:
+            print(f"[{i + 1}] {e.code} {e.read().decode()}")
+
+
+if __name__ == "__main__":
+    main()
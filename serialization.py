@@ -0,0 +1,45 @@
+# serialization.py
+# Shape time-series rows for the chart endpoints.
+#
+# "rows"     -> [{"time": t0, "topic a": 3, "topic b": 0}, ...]   (legacy, repeats every topic name)
+# "columnar" -> {"time": [t0, t1, ...], "values": {"topic a": [3, ...], "topic b": [0, ...]}}
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Point = Tuple[str, Optional[str], int]  # (time_key, topic, value) ordered by time_key
+
+
+def series_rows(points: Iterable[Point]) -> List[dict]:
+    """One dict per timestamp. Empty buckets (topic None) keep their time key only."""
+    out: Dict[str, dict] = {}
+    for key, topic, val in points:
+        row = out.get(key)
+        if row is None:
+            row = out[key] = {"time": key}
+        if topic is not None:
+            row[topic] = val
+    return list(out.values())
+
+
+def series_columnar(points: Iterable[Point], topics: Sequence[str] = ()) -> dict:
+    """One timestamp array plus one zero-filled value array per topic."""
+    times: List[str] = []
+    values: Dict[str, List[int]] = {t: [] for t in topics}
+    last_key = None
+    for key, topic, val in points:
+        if key != last_key:
+            times.append(key)
+            for col in values.values():
+                col.append(0)
+            last_key = key
+        if topic is None:
+            continue
+        col = values.get(topic)
+        if col is None:
+            col = values[topic] = [0] * len(times)
+        col[-1] = val
+    return {"time": times, "values": values}
+
+
+def shape_series(points: Iterable[Point], fmt: str, topics: Sequence[str] = ()):
+    return series_columnar(points, topics) if fmt == "columnar" else series_rows(points)
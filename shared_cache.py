@@ -0,0 +1,212 @@
+# shared_cache.py
+# Cross-process cache for hot datasets, shared by all gunicorn/uvicorn workers.
+#
+# Each dataset is one file on tmpfs (/dev/shm by default):
+#
+#   header  <8s magic><I version_len><Q payload_len><d stored_at>
+#   version utf-8 data version the payload was computed at
+#   payload orjson bytes
+#
+# A single elected refresher (flock on refresher.lock) writes new versions to
+# a temp file and os.replace()s it into place, so readers only ever see
+# complete files. Readers mmap the file and decode straight from the mapping;
+# the decoded object is memoized per (inode, mtime), so each worker decodes a
+# given version once.
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Tuple
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: single process, always the refresher
+    fcntl = None
+
+MAGIC = b"GTCACHE1"
+HEADER = struct.Struct("<8sIQd")
+
+
+class SharedEntry(NamedTuple):
+    payload: Any
+    version: Optional[str]
+    stored_at: float
+
+
+def default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "grok_trends_cache")
+
+
+class SharedCache:
+    def __init__(self, directory: Optional[str] = None, max_age: float = 300.0):
+        self.directory = directory or default_directory()
+        self.max_age = max_age
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._decoded: Dict[str, Tuple[int, int, SharedEntry]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: Hashable) -> str:
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + ".bin")
+
+    # ---------- writer ----------
+    def publish(self, key: Hashable, version: Optional[str], payload: Any) -> str:
+        body = orjson.dumps(payload)
+        vbytes = (version or "").encode()
+        path = self.path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, len(vbytes), len(body), time.time()))
+                f.write(vbytes)
+                f.write(body)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return path
+
+    def prune(self, keep: Iterable[str]):
+        """Remove dataset files not in `keep` (e.g. interest series for topics that left the top 3)."""
+        keep = {os.path.basename(p) for p in keep}
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin") and name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    # ---------- readers ----------
+    def read(self, key: Hashable) -> Optional[SharedEntry]:
+        path = self.path(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._miss()
+            return None
+
+        with self._lock:
+            cached = self._decoded.get(path)
+        if cached and cached[0] == st.st_ino and cached[1] == st.st_mtime_ns:
+            entry = cached[2]
+        else:
+            entry = self._decode(path)
+            if entry is None:
+                self._miss()
+                return None
+            with self._lock:
+                self._decoded[path] = (st.st_ino, st.st_mtime_ns, entry)
+
+        if time.time() - entry.stored_at > self.max_age:
+            # Refresher is gone or failing; let the caller go to the DB.
+            self._miss()
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def _decode(self, path: str) -> Optional[SharedEntry]:
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, vlen, plen, stored_at = HEADER.unpack_from(mm, 0)
+                if magic != MAGIC:
+                    return None
+                start = HEADER.size + vlen
+                view = memoryview(mm)
+                try:
+                    version = bytes(view[HEADER.size:start]).decode() or None
+                    payload = orjson.loads(view[start:start + plen])
+                finally:
+                    view.release()
+            return SharedEntry(payload, version, stored_at)
+        except (OSError, ValueError, struct.error, orjson.JSONDecodeError):
+            return None
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "decoded": len(self._decoded)}
+
+
+class HotDataRefresher:
+    """Elects one process (non-blocking flock) to recompute and publish hot datasets.
+
+    Other workers keep trying the lock, so if the leader dies its lock is
+    released by the kernel and another worker takes over on its next tick.
+    """
+
+    def __init__(self, cache: SharedCache, produce: Callable[[], Iterable[Tuple[Hashable, Any]]],
+                 version: Callable[[], Optional[str]], interval: float = 5.0):
+        self.cache = cache
+        self.produce = produce
+        self.version = version
+        self.interval = interval
+        self.is_leader = False
+        self.published_version: Optional[str] = None
+        self.published_at = 0.0
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hot-data-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # releases the flock
+            self._lock_file = None
+            self.is_leader = False
+
+    def _try_lead(self) -> bool:
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(os.path.join(self.cache.directory, "refresher.lock"), "a+")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.is_leader:
+                self.is_leader = self._try_lead()
+            if self.is_leader:
+                self.refresh_once()
+            self._stop.wait(self.interval)
+
+    def refresh_once(self, force: bool = False):
+        version = self.version()
+        if version is None:
+            return  # DB unreachable: keep serving what we have
+        due = time.time() - self.published_at > self.cache.max_age / 2
+        if not force and not due and version == self.published_version:
+            return
+        try:
+            paths = [self.cache.publish(key, version, payload) for key, payload in self.produce()]
+            self.cache.prune(paths)
+            self.published_version = version
+            self.published_at = time.time()
+        except Exception as e:
+            print(f"hot data refresh failed: {e}")
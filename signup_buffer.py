@@ -0,0 +1,245 @@
+# signup_buffer.py
+# Write-behind buffer for interest signups.
+#
+# Accepted signups go into a bounded in-process queue and a background thread
+# writes them in multi-row batches. What an acknowledged signup survives
+# depends on `durability`:
+#
+#   memory  queue only. A crash or kill -9 loses everything not yet flushed
+#           (at most one flush interval of signups under normal load).
+#   spool   also appended to a local spool file before the ack. Survives a
+#           process crash; may lose the OS page cache on power loss.
+#   fsync   spool + fsync before the ack. Survives power loss, at the cost of
+#           one fsync per signup.
+#
+# The spool is rotated when the flusher takes a batch, so each rotated segment
+# holds exactly the signups of one in-flight batch and is deleted once that
+# batch commits. Segments left behind by a crash are replayed on start; the
+# insert is idempotent (ON CONFLICT DO NOTHING), so replaying twice is harmless.
+# Spool files carry the writer's pid, so workers sharing a spool directory
+# only recover files whose process is gone.
+
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+import orjson
+
+DURABILITY_LEVELS = ("memory", "spool", "fsync")
+
+
+class Signup(NamedTuple):
+    email: str
+    created_at: datetime  # request time (UTC), not flush time
+
+
+class BufferFull(Exception):
+    pass
+
+
+class SignupBuffer:
+    def __init__(self, write_batch: Callable[[List[Signup]], int], count_total: Callable[[], int],
+                 max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0,
+                 durability: str = "memory", spool_dir: Optional[str] = None, retry_seconds: float = 5.0):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {DURABILITY_LEVELS}")
+        if durability != "memory" and not spool_dir:
+            raise ValueError(f"durability={durability!r} needs a spool directory")
+        self.write_batch = write_batch    # inserts, returns rows actually inserted
+        self.count_total = count_total    # authoritative COUNT(*)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.spool_dir = spool_dir
+        self.retry_seconds = retry_seconds
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._queue: List[Signup] = []
+        self._pending_emails: set = set()
+        self._retry: List[Signup] = []
+        self._retry_segments: List[str] = []
+        self._spool = None
+        self._thread: Optional[threading.Thread] = None
+
+        self.known_total = 0
+        self.flushed = 0
+        self.flush_errors = 0
+        self.last_flush_at = 0.0
+
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._recover()
+            self._spool = open(self._spool_path(), "ab")
+
+    # ---------- request path ----------
+    def add(self, email: str) -> bool:
+        """Queue a signup; False if it is already waiting. Raises BufferFull when at capacity."""
+        with self._lock:
+            if email in self._pending_emails:
+                return False
+            if len(self._queue) >= self.max_queue:
+                raise BufferFull()
+            signup = Signup(email, datetime.utcnow())
+            if self._spool is not None:
+                self._spool.write(orjson.dumps(signup._asdict(), option=orjson.OPT_NAIVE_UTC) + b"\n")
+                self._spool.flush()
+                if self.durability == "fsync":
+                    os.fsync(self._spool.fileno())
+            self._queue.append(signup)
+            self._pending_emails.add(email)
+            if len(self._queue) >= self.batch_size:
+                self._wake.set()
+        return True
+
+    def approximate_total(self) -> int:
+        """Last counted total plus queued signups (some of which may turn out to be duplicates)."""
+        with self._lock:
+            return self.known_total + len(self._pending_emails)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._thread is None:
+            try:
+                self.known_total = self.count_total()
+            except Exception as e:
+                print(f"signup buffer: initial count failed: {e}")
+            self._thread = threading.Thread(target=self._run, name="signup-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush what is queued (best effort within `timeout`) and stop the flusher."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stopping = self._stop.is_set()
+            ok = self.flush_once()
+            if stopping:
+                return
+            if not ok:
+                self._stop.wait(self.retry_seconds)
+
+    # ---------- flushing ----------
+    def flush_once(self) -> bool:
+        """Write everything queued so far; True on success (or nothing to do)."""
+        with self._lock:
+            if self._queue:
+                self._retry.extend(self._queue)
+                self._queue = []
+                if self._spool is not None:
+                    self._retry_segments.append(self._rotate_spool())
+            batch, segments = self._retry, self._retry_segments
+        if not batch:
+            return True
+
+        try:
+            inserted = 0
+            for i in range(0, len(batch), self.batch_size):
+                inserted += self.write_batch(batch[i:i + self.batch_size])
+            total = self.count_total()
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"signup buffer: flush of {len(batch)} failed, will retry: {e}")
+            return False
+
+        for path in segments:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            for s in batch:
+                self._pending_emails.discard(s.email)
+            self._retry, self._retry_segments = [], []
+            self.known_total = total
+            self.flushed += inserted
+            self.last_flush_at = time.time()
+        return True
+
+    # ---------- spool ----------
+    def _spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f"signups.{os.getpid()}.spool")
+
+    def _segment_path(self) -> str:
+        return os.path.join(self.spool_dir, f"signups.{os.getpid()}.{time.time_ns()}.pending")
+
+    def _rotate_spool(self) -> str:
+        """Close the live spool and move it aside as the segment of the batch being taken."""
+        self._spool.close()
+        segment = self._segment_path()
+        os.replace(self._spool_path(), segment)
+        self._spool = open(self._spool_path(), "ab")
+        if self.durability == "fsync":
+            dir_fd = os.open(self.spool_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)  # make the rename itself durable
+            finally:
+                os.close(dir_fd)
+        return segment
+
+    def _recover(self):
+        """Queue signups from spool files of dead processes for the first flush."""
+        paths = []
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "signups.*"))):
+            if _owner_alive(path):
+                continue
+            if path.endswith(".spool"):
+                segment = self._segment_path()
+                os.replace(path, segment)
+                path = segment
+            paths.append(path)
+        for path in paths:
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        doc = orjson.loads(line)
+                        signup = Signup(doc["email"], datetime.fromisoformat(doc["created_at"].rstrip("Z")))
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn final line from a crash mid-write
+                    self._retry.append(signup)
+                    self._pending_emails.add(signup.email)
+            self._retry_segments.append(path)
+        if self._retry:
+            print(f"signup buffer: recovered {len(self._retry)} unflushed signups from {len(paths)} spool file(s)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "retrying": len(self._retry),
+                "flushed": self.flushed,
+                "flush_errors": self.flush_errors,
+                "known_total": self.known_total,
+            }
+
+
+def _owner_alive(path: str) -> bool:
+    """Whether the process that wrote spool file `path` (signups.<pid>...) is still running."""
+    try:
+        pid = int(os.path.basename(path).split(".")[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False  # our own leftovers (pid reused after a restart)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,57 @@
+# singleflight.py
+# Coalesce identical concurrent calls into one execution.
+#
+# Request handlers run in FastAPI's threadpool, so waiters block on a
+# concurrent.futures.Future. Only calls that overlap in time are merged; the
+# key is dropped as soon as the leader finishes, so nothing is served stale.
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.calls = 0       # total do() calls
+        self.executions = 0  # calls that actually ran fn
+        self.errors = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.executions += 1
+
+        if not leader:
+            return fut.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._inflight[key]
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+        fut.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls, executions = self.calls, self.executions
+            inflight, errors = len(self._inflight), self.errors
+        return {
+            "calls": calls,
+            "executions": executions,
+            "coalesced": calls - executions,
+            "coalescing_ratio": round((calls - executions) / calls, 4) if calls else 0.0,
+            "inflight": inflight,
+            "errors": errors,
+        }
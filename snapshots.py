@@ -0,0 +1,187 @@
+# snapshots.py
+# Last-good-response store for read endpoints (stale-while-revalidate).
+#
+#   fresh     age < fresh_seconds and data version unchanged -> serve from memory
+#   stale     age < max_stale_seconds -> serve now, refresh in the background
+#   fallback  loader failed (DB slow/down, overloaded) -> serve last good, any age
+#
+# Entries live in a bounded in-memory LRU and, for selected endpoints,
+# optionally on local disk so a restarted worker can answer before its first
+# successful query.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable, Optional, Tuple
+
+import orjson
+
+Loader = Callable[[], Tuple[Any, Optional[str]]]  # -> (payload, data version)
+
+
+@dataclass
+class Snapshot:
+    payload: Any
+    version: Optional[str]
+    stored_at: float  # wall clock, so disk entries age correctly across restarts
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.stored_at)
+
+
+class SnapshotStore:
+    def __init__(self, fresh_seconds: float = 30.0, max_stale_seconds: float = 600.0,
+                 directory: Optional[str] = None, persist: Iterable[str] = (),
+                 max_entries: int = 1024, refresh_workers: int = 2, retry_seconds: float = 5.0):
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.directory = directory
+        self.persist = frozenset(persist)
+        self.max_entries = max_entries
+        self.retry_seconds = retry_seconds
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Snapshot]" = OrderedDict()
+        self._refreshing: set = set()
+        self._failed_at: dict = {}
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="snapshot-refresh")
+        self.counts = {"fresh": 0, "stale": 0, "fallback": 0, "miss": 0, "refresh_errors": 0}
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # ---------- public ----------
+    def fetch(self, key: Hashable, loader: Loader, current_version: Optional[str] = None,
+              quick_loader: Optional[Loader] = None) -> Tuple[Snapshot, str]:
+        """Return (snapshot, state) where state is fresh | stale | fallback.
+
+        Past max_stale_seconds the load runs inline. If there is a snapshot to
+        fall back on, `quick_loader` (e.g. one with a short connection
+        timeout) is used in place of `loader` there.
+        """
+        snap = self._get(key)
+        if snap is not None:
+            age = snap.age
+            outdated = current_version is not None and snap.version != current_version
+            if age < self.fresh_seconds and not outdated:
+                self._count("fresh")
+                return snap, "fresh"
+            if age < self.max_stale_seconds:
+                self._refresh_async(key, loader)
+                self._count("stale")
+                return snap, "stale"
+
+        try:
+            fresh = self._load(key, quick_loader if snap is not None and quick_loader else loader)
+        except Exception:
+            if snap is None:
+                raise
+            self._count("fallback")
+            return snap, "fallback"
+        self._count("miss")
+        return fresh, "fresh"
+
+    def has_any(self) -> bool:
+        return bool(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "refreshing": len(self._refreshing), **self.counts}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    # ---------- internals ----------
+    def _count(self, what: str):
+        with self._lock:
+            self.counts[what] += 1
+
+    def _load(self, key: Hashable, loader: Loader) -> Snapshot:
+        payload, version = loader()
+        snap = Snapshot(payload, version, time.time())
+        self._put(key, snap)
+        return snap
+
+    def _refresh_async(self, key: Hashable, loader: Loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            # Don't hammer a failing DB: one retry per key per retry_seconds.
+            if time.monotonic() - self._failed_at.get(key, -1e9) < self.retry_seconds:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, loader)
+
+    def _refresh(self, key: Hashable, loader: Loader):
+        try:
+            self._load(key, loader)
+            with self._lock:
+                self._failed_at.pop(key, None)
+        except Exception:
+            with self._lock:
+                self._failed_at[key] = time.monotonic()
+                self.counts["refresh_errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _get(self, key: Hashable) -> Optional[Snapshot]:
+        with self._lock:
+            snap = self._entries.get(key)
+            if snap is not None:
+                self._entries.move_to_end(key)
+                return snap
+        snap = self._read_disk(key)
+        if snap is not None:
+            self._remember(key, snap)
+        return snap
+
+    def _put(self, key: Hashable, snap: Snapshot):
+        self._remember(key, snap)
+        self._write_disk(key, snap)
+
+    def _remember(self, key: Hashable, snap: Snapshot):
+        with self._lock:
+            self._entries[key] = snap
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ---------- disk ----------
+    def _path(self, key: Hashable) -> Optional[str]:
+        if not self.directory or not isinstance(key, tuple) or key[0] not in self.persist:
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{key[0].replace('/', '_')}-{digest}.json")
+
+    def _read_disk(self, key: Hashable) -> Optional[Snapshot]:
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                doc = orjson.loads(f.read())
+            return Snapshot(doc["payload"], doc.get("version"), float(doc["stored_at"]))
+        except Exception:
+            return None
+
+    def _write_disk(self, key: Hashable, snap: Snapshot):
+        path = self._path(key)
+        if not path:
+            return
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(orjson.dumps({"version": snap.version, "stored_at": snap.stored_at, "payload": snap.payload}))
+            os.replace(tmp, path)  # atomic: readers never see a partial file
+        except Exception as e:
+            print(f"snapshot write failed ({path}): {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -0,0 +1,82 @@
+# stripe_stub.py
+# Minimal local stand-in for the three Stripe endpoints the API calls, with an
+# optional per-request delay to mimic the network round trip.
+#
+#   python stripe_stub.py --port 12111 --latency-ms 150
+#   STRIPE_API_BASE=http://localhost:12111 STRIPE_SECRET_KEY=sk_test_stub uvicorn app:app
+#
+# Every request is logged, so you can see which calls a checkout still makes
+# (a returning customer should only hit POST /v1/checkout/sessions).
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CUSTOMERS = {}  # email -> customer object
+LOCK = threading.Lock()
+
+
+def _customer(email):
+    return {"id": f"cus_stub_{uuid.uuid4().hex[:14]}", "object": "customer", "email": email,
+            "created": int(time.time()), "livemode": False}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Request-Id", f"req_stub_{uuid.uuid4().hex[:14]}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        if url.path == "/v1/customers":
+            email = parse_qs(url.query).get("email", [None])[0]
+            with LOCK:
+                data = [c for e, c in CUSTOMERS.items() if email is None or e == email]
+            return self._reply(200, {"object": "list", "url": "/v1/customers", "has_more": False, "data": data[:1]})
+        self._reply(404, {"error": {"type": "invalid_request_error", "message": f"stub: no route {url.path}"}})
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        form = self._form()
+        if url.path == "/v1/customers":
+            with LOCK:
+                customer = CUSTOMERS.setdefault(form.get("email"), _customer(form.get("email")))
+            return self._reply(200, customer)
+        if url.path == "/v1/checkout/sessions":
+            sid = f"cs_test_stub_{uuid.uuid4().hex[:20]}"
+            return self._reply(200, {
+                "id": sid, "object": "checkout.session", "customer": form.get("customer"),
+                "mode": form.get("mode"), "url": f"https://checkout.stripe.test/pay/{sid}",
+            })
+        self._reply(404, {"error": {"type": "invalid_request_error", "message": f"stub: no route {url.path}"}})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local Stripe API stub.")
+    ap.add_argument("--port", type=int, default=12111)
+    ap.add_argument("--latency-ms", type=float, default=150.0, help="artificial delay per request")
+    args = ap.parse_args()
+    StubHandler.latency = args.latency_ms / 1000
+    print(f"Stripe stub on http://localhost:{args.port} ({args.latency_ms:.0f} ms per call)")
+    ThreadingHTTPServer(("", args.port), StubHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
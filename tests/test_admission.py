@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, CostClass, Overloaded
+
+
+def _controller(capacity=1, queue_limit=10, expensive_limit=None, deadline=5.0):
+    return AdmissionController(capacity, {
+        "write": CostClass(limit=capacity, deadline=deadline, priority=0),
+        "cheap": CostClass(limit=capacity, deadline=deadline, priority=1),
+        "expensive": CostClass(limit=expensive_limit or capacity, deadline=deadline, priority=2),
+    }, queue_limit=queue_limit)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_slot_is_given_back():
+    ac = _controller()
+    with ac.slot("cheap"):
+        assert ac.stats()["in_use"]["cheap"] == 1
+    assert ac.stats()["in_use"]["cheap"] == 0
+    assert ac.stats()["admitted"]["cheap"] == 1
+
+
+def test_full_queue_fails_fast_with_retry_after():
+    ac = _controller(queue_limit=0)
+    ac.acquire("cheap")
+    with pytest.raises(Overloaded) as exc:
+        ac.acquire("cheap")
+    assert exc.value.retry_after >= 1
+    assert ac.stats()["rejected"]["cheap"] == 1
+
+
+def test_waiter_gives_up_at_its_deadline():
+    ac = _controller(deadline=0.05)
+    ac.acquire("cheap")
+    start = time.monotonic()
+    with pytest.raises(Overloaded):
+        ac.acquire("cheap")
+    assert time.monotonic() - start >= 0.05
+    assert ac.stats()["queued"] == 0
+
+
+def test_freed_slot_goes_to_the_highest_priority_waiter():
+    ac = _controller()
+    ac.acquire("cheap")
+    order = []
+
+    def wait(cost):
+        ac.acquire(cost)
+        order.append(cost)
+        ac.release(cost, 0.0)
+
+    threads = []
+    for n, cost in enumerate(["expensive", "cheap"], start=1):
+        threads.append(threading.Thread(target=wait, args=(cost,)))
+        threads[-1].start()
+        _wait_for(lambda n=n: ac.stats()["queued"] == n)  # queued in this order
+    ac.release("cheap", 0.0)
+    for t in threads:
+        t.join(5)
+
+    assert order == ["cheap", "expensive"]
+
+
+def test_class_limit_keeps_room_for_cheap_requests():
+    ac = _controller(capacity=2, expensive_limit=1, deadline=0.05)
+    ac.acquire("expensive")
+    with pytest.raises(Overloaded):
+        ac.acquire("expensive")
+    ac.acquire("cheap")  # the second slot is still free for it
+    assert ac.stats()["in_use"] == {"write": 0, "cheap": 1, "expensive": 1}
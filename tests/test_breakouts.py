@@ -0,0 +1,64 @@
+import pytest
+
+from analysis.etl_.breakouts import BurstDetector
+
+KEY = ("grok 4", "tech")
+
+
+def _steady(detector, hours, mentions=10, key=KEY):
+    for h in range(hours):
+        assert detector.observe(key, h, mentions, origin=0) is None
+
+
+def test_spike_is_flagged_with_its_onset():
+    d = BurstDetector(alpha=0.05)
+    _steady(d, 48)
+
+    first = d.observe(KEY, 48, 60, origin=0)
+    second = d.observe(KEY, 49, 80, origin=0)
+
+    assert first is not None and not first.partial
+    assert first.z_score >= 3 and first.lift >= 2
+    assert 5 < first.expected <= 10  # the EWMA warms up from 0
+    assert second.onset_at == first.bucket_ts  # the run continues
+    assert d.observe(KEY, 50, 10, origin=0) is None
+    assert d.onset[0] == -1
+
+
+def test_new_topics_need_history_first():
+    d = BurstDetector(alpha=0.05)
+    assert d.observe(KEY, 100, 500, origin=100) is None
+
+
+def test_empty_hours_decay_the_baseline_like_zero_observations():
+    gap = 30
+    stepped, lazy = BurstDetector(alpha=0.1), BurstDetector(alpha=0.1)
+    _steady(stepped, 24)
+    _steady(lazy, 24)
+    for h in range(24, 24 + gap):
+        stepped.observe(KEY, h, 0, origin=0)
+
+    hour = 24 + gap
+    assert lazy._baseline(0, hour) == pytest.approx(stepped._baseline(0, hour))
+    assert lazy._baseline(0, hour + 10_000) == pytest.approx((0.0, 0.0))
+
+
+def test_peek_does_not_change_state():
+    d = BurstDetector(alpha=0.05)
+    _steady(d, 48)
+    before = (d.mean[0], d.var[0], d.last[0], d.onset[0])
+
+    b = d.peek(KEY, 48, 60, origin=0)
+
+    assert b is not None and b.partial
+    assert (d.mean[0], d.var[0], d.last[0], d.onset[0]) == before
+    assert d.observe(KEY, 48, 60, origin=0) is not None
+
+
+def test_an_hour_is_folded_in_once():
+    d = BurstDetector(alpha=0.05)
+    _steady(d, 48)
+    assert d.observe(KEY, 48, 60, origin=0) is not None
+    mean = d.mean[0]
+    assert d.observe(KEY, 48, 60, origin=0) is None
+    assert d.mean[0] == mean
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+from collector.engagement import BATCH_SIZE, EngagementRefresher
+
+
+class FakeClient:
+    """Stands in for tweepy.Client.get_tweets; `missing` ids come back absent (deleted/protected)."""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.calls = []
+
+    def get_tweets(self, ids, tweet_fields):
+        self.calls.append(list(ids))
+        data = [SimpleNamespace(id=int(i), public_metrics={'like_count': int(i), 'retweet_count': 1})
+                for i in ids if i not in self.missing]
+        return SimpleNamespace(data=data or None)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        self.conn.executed.append((query, params))
+
+    def fetchall(self):
+        return [(i,) for i in self.conn.candidates]
+
+    def fetchone(self):
+        ids = self.conn.executed[-1][1][0]
+        return len(ids), len(ids), 1  # stamped, changed, buckets marked dirty
+
+
+class FakeConn:
+    def __init__(self, candidates=()):
+        self.candidates = list(candidates)
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_refresh_looks_up_in_batches_and_commits_each():
+    ids = [str(i) for i in range(1, 251)]
+    client, conn = FakeClient(), FakeConn()
+    lookups = []
+
+    stats = EngagementRefresher(client).refresh(conn, ids=ids, on_lookup=lambda cur, n: lookups.append(n))
+
+    assert [len(c) for c in client.calls] == [BATCH_SIZE, BATCH_SIZE, 50]
+    assert lookups == [100, 100, 50]
+    assert conn.commits == 3
+    assert stats == {'lookups': 3, 'requested': 250, 'returned': 250, 'changed': 250, 'dirty_hours': 3}
+
+
+def test_missing_tweets_keep_their_counts():
+    client, conn = FakeClient(missing={'2'}), FakeConn()
+
+    stats = EngagementRefresher(client).refresh(conn, ids=['1', '2', '3'])
+
+    ids, likes, retweets, replies, quotes = conn.executed[0][1]
+    assert ids == ['1', '2', '3']
+    assert likes == [1, None, 3]  # NULL -> COALESCE keeps the stored count
+    assert retweets == [1, None, 1]
+    assert replies == [0, None, 0]
+    assert stats['returned'] == 2
+
+
+def test_refresh_without_ids_takes_the_top_candidates():
+    conn = FakeConn(candidates=['7', '8'])
+    refresher = EngagementRefresher(FakeClient(), decay_hours=24, min_age_minutes=30)
+
+    stats = refresher.refresh(conn, batches=2)
+
+    query, params = conn.executed[0]
+    assert 'FROM raw_tweets' in query
+    assert params == (24, 30, 2 * BATCH_SIZE)
+    assert stats['lookups'] == 1
+    assert conn.commits == 2  # candidate selection, then the batch
+
+
+def test_nothing_due_makes_no_lookup():
+    client, conn = FakeClient(), FakeConn()
+    assert EngagementRefresher(client).refresh(conn)['lookups'] == 0
+    assert client.calls == []
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _run_concurrently(sf, key, fn, n):
+    """Start a leader blocked in fn, then n - 1 followers; returns (threads, results)."""
+    results = [None] * n
+
+    def call(i):
+        try:
+            results[i] = sf.do(key, fn)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    threads[0].start()
+    _wait_for(lambda: sf.stats()["inflight"] == 1)
+    for t in threads[1:]:
+        t.start()
+    _wait_for(lambda: sf.stats()["calls"] == n)
+    return threads, results
+
+
+def test_concurrent_calls_share_one_execution():
+    sf = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return {"rows": 3}
+
+    threads, results = _run_concurrently(sf, ("trends", 7), fn, 5)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(runs) == 1
+    assert all(r is results[0] for r in results)
+    stats = sf.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    sf = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("db down")
+
+    threads, results = _run_concurrently(sf, "k", fail, 3)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert sf.stats()["errors"] == 1
+    assert sf.do("k", lambda: "ok") == "ok"
+
+
+def test_sequential_calls_run_again():
+    sf = SingleFlight()
+    assert sf.do("k", lambda: 1) == 1
+    assert sf.do("k", lambda: 2) == 2
+    assert sf.stats()["executions"] == 2
+
+
+def test_distinct_keys_do_not_coalesce():
+    sf = SingleFlight()
+    assert [sf.do(k, lambda k=k: k) for k in ("a", "b")] == ["a", "b"]
+    with pytest.raises(ValueError):
+        sf.do("c", lambda: int("x"))
@@ -0,0 +1,78 @@
+import os
+from datetime import datetime, timezone
+
+from collector.spool import HEADER, Spool, read_pages
+
+DEAD_PID = 999_999_999  # above any pid_max
+
+
+def _page(query, *tweet_ids):
+    return {
+        'query': query,
+        'fetched_at': datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc),
+        'rows': [[tid, f'tweet {tid}'] for tid in tweet_ids],
+        'posts': len(tweet_ids),
+    }
+
+
+def _sealed_segment(spool, *pages):
+    for page in pages:
+        spool.append(page)
+    spool.seal()
+    [path] = spool.claim()
+    return path
+
+
+def test_pages_round_trip_with_ids(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    first = spool.append(_page('@Grok', '1', '2'))
+    path = _sealed_segment(spool, _page('@Grok', '3'))
+
+    pages = list(read_pages(path))
+    assert [p['page_id'] for p in pages][0] == first
+    assert len({p['page_id'] for p in pages}) == 2
+    assert [r[0] for p in pages for r in p['rows']] == ['1', '2', '3']
+    assert pages[0]['fetched_at'] == '2025-01-01T12:30:00+00:00'
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    path = _sealed_segment(spool, _page('q', '1'), _page('q', '2'))
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size - 3)  # crash mid-append
+
+    assert [p['rows'][0][0] for p in read_pages(path)] == ['1']
+
+
+def test_corrupt_record_stops_reading(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    path = _sealed_segment(spool, _page('q', '1'), _page('q', '2'))
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    length, _ = HEADER.unpack_from(data, 0)
+    data[HEADER.size + length + HEADER.size] ^= 0xFF  # first payload byte of the second record
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    assert [p['rows'][0][0] for p in read_pages(path)] == ['1']
+
+
+def test_dead_writers_segments_are_recovered(tmp_path):
+    for state in ('seg', 'loading'):
+        (tmp_path / f'tweets.{DEAD_PID}.{len(state)}.{state}').write_bytes(b'')
+    live = tmp_path / f'tweets.{os.getppid()}.1.seg'  # parent process: still running
+    live.write_bytes(b'')
+
+    spool = Spool(str(tmp_path), fsync=False)
+
+    assert spool.pending() == 2
+    assert live.exists()
+
+
+def test_released_segment_is_claimed_again(tmp_path):
+    spool = Spool(str(tmp_path), fsync=False)
+    path = _sealed_segment(spool, _page('q', '1'))
+    assert spool.claim() == []
+    spool.release(path)
+    assert len(spool.claim()) == 1
@@ -0,0 +1,90 @@
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+from grok_trends.topk import SlidingTopK, SpaceSaving, merge_panes
+
+
+def _stream(n, keys, seed):
+    """Zipf-like mentions: a few heavy topics and a long tail."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return [(f"topic{k}", "tech") for k in rng.choices(range(keys), weights, k=n)]
+
+
+def _check_bounds(summary, truth, total):
+    for key, count in summary.counts.items():
+        assert count - summary.errors[key] <= truth[key] <= count
+    for key, true_count in truth.items():
+        if true_count > total / summary.capacity:
+            assert key in summary.counts
+
+
+def test_exact_while_under_capacity():
+    s = SpaceSaving(capacity=10)
+    for key in _stream(500, 8, seed=1):
+        s.add(key)
+    assert s.counts == dict(Counter(_stream(500, 8, seed=1)))
+    assert set(s.errors.values()) == {0}
+
+
+def test_error_bounds_hold_over_capacity():
+    stream = _stream(5000, 400, seed=2)
+    s = SpaceSaving(capacity=25)
+    for key in stream:
+        s.add(key)
+    assert len(s.counts) == 25
+    _check_bounds(s, Counter(stream), len(stream))
+
+
+def test_round_trips_through_rows():
+    s = SpaceSaving(capacity=5)
+    for key in _stream(300, 50, seed=3):
+        s.add(key)
+    copy = SpaceSaving.from_rows(5, *s.rows())
+    assert (copy.counts, copy.errors) == (s.counts, s.errors)
+    copy.add(("new", "tech"))  # the rebuilt heap still finds the minimum
+    assert len(copy.counts) == 5
+
+
+def test_merged_panes_bound_the_true_counts():
+    streams = [_stream(2000, 200, seed=s) for s in (4, 5, 6)]
+    panes = []
+    for stream in streams:
+        pane = SpaceSaving(capacity=20)
+        for key in stream:
+            pane.add(key)
+        panes.append(pane)
+    truth = Counter(key for stream in streams for key in stream)
+
+    top = merge_panes(panes, limit=10)
+
+    assert len(top) == 10
+    for row in top:
+        true_count = truth[(row["topic"], row["category"])]
+        assert row["count"] - row["error"] <= true_count <= row["count"]
+    assert top[0]["topic"] == "topic0" and top[0]["guaranteed"]
+
+
+def _at(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def test_sliding_window_drops_old_panes():
+    sketch = SlidingTopK(capacity=10, windows={"1m": (60, 10)})
+    now = 1_000_000.0
+    sketch.add(("a", "tech"), _at(now - 5), now=now)
+    sketch.add(("a", "tech"), _at(now - 30), now=now)
+    sketch.add(("b", "tech"), _at(now - 120), now=now)  # already outside the window
+
+    assert [(r["topic"], r["count"]) for r in sketch.top("1m", now=now)] == [("a", 2)]
+    assert sketch.top("1m", now=now + 120) == []
+    assert sketch.touched == set()
+
+
+def test_naive_timestamps_are_utc():
+    sketch = SlidingTopK(capacity=10, windows={"1m": (60, 10)})
+    now = 1_000_000.0
+    naive = _at(now - 5).replace(tzinfo=None)
+    sketch.add(("a", "tech"), naive, now=now)
+    assert sketch.top("1m", now=now)[0]["count"] == 1
@@ -0,0 +1,47 @@
+from ttl_cache import MISSING, TTLCache
+
+
+def test_get_or_load_caches_until_invalidated():
+    cache = TTLCache(ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return "cus_123"
+
+    assert cache.get_or_load("user@example.com", load) == "cus_123"
+    assert cache.get_or_load("user@example.com", load) == "cus_123"
+    assert len(loads) == 1
+
+    cache.invalidate("user@example.com")
+    assert cache.get("user@example.com") is MISSING
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is MISSING
+    assert cache.get_or_load("b", lambda: "active", ttl_for=lambda v: 0) == "active"
+    assert cache.get("b") is MISSING
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_value_loaded_across_an_invalidation_is_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def load():
+        cache.invalidate("a")  # e.g. a webhook lands while Stripe is being asked
+        return "stale"
+
+    assert cache.get_or_load("a", load) == "stale"
+    assert cache.get("a") is MISSING
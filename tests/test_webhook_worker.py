@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+
+from webhook_worker import WebhookWorker
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        self.conn.executed.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        return self.conn.events
+
+
+class FakeConn:
+    def __init__(self, events):
+        self.events = events
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    @contextmanager
+    def transaction(self):
+        yield  # a savepoint; exceptions propagate like psycopg's
+
+    def commit(self):
+        self.commits += 1
+
+    def updates(self):
+        return [params for query, params in self.executed if query.startswith("UPDATE webhook_events")]
+
+
+def _worker(conn, handlers, **kwargs):
+    @contextmanager
+    def connect():
+        yield conn
+    return WebhookWorker(connect, handlers, **kwargs)
+
+
+def _event(event_id, event_type, attempts=0):
+    return (event_id, event_type, {"data": {"object": {"id": event_id}}}, attempts)
+
+
+def test_run_once_applies_events_and_reports_after_commit():
+    conn = FakeConn([_event("evt_1", "customer.subscription.updated"), _event("evt_2", "ping")])
+    applied = []
+
+    def on_applied(event_type, result):
+        assert conn.commits == 1  # effects are committed before callbacks run
+        applied.append((event_type, result))
+
+    worker = _worker(conn, {"customer.subscription.updated": lambda cur, obj: obj["id"]}, on_applied=on_applied)
+    assert worker.run_once() == 2
+
+    assert conn.updates() == [("done", "evt_1"), ("ignored", "evt_2")]
+    assert applied == [("customer.subscription.updated", "evt_1"), ("ping", None)]
+    assert worker.stats()["processed"] == 2
+
+
+def test_failing_handler_is_retried_with_backoff():
+    conn = FakeConn([_event("evt_1", "invoice.paid", attempts=2)])
+
+    def boom(cur, obj):
+        raise ValueError("no such customer")
+
+    worker = _worker(conn, {"invoice.paid": boom}, backoff_base=5.0, max_attempts=8)
+    worker.run_once()
+
+    status, attempts, error, delay, event_id = conn.updates()[0]
+    assert (status, attempts, delay, event_id) == ("pending", 3, 20.0, "evt_1")
+    assert "no such customer" in error
+    assert worker.stats()["retried"] == 1
+
+
+def test_event_is_parked_after_max_attempts():
+    conn = FakeConn([_event("evt_1", "invoice.paid", attempts=7)])
+
+    def boom(cur, obj):
+        raise ValueError("still broken")
+
+    worker = _worker(conn, {"invoice.paid": boom}, max_attempts=8, on_applied=lambda *a: None)
+    worker.run_once()
+
+    assert conn.updates()[0][0] == "failed"
+    assert worker.stats()["failed"] == 1
+
+
+def test_one_failure_does_not_sink_the_batch():
+    conn = FakeConn([_event("evt_1", "bad"), _event("evt_2", "good")])
+
+    def bad(cur, obj):
+        raise RuntimeError("nope")
+
+    worker = _worker(conn, {"bad": bad, "good": lambda cur, obj: None})
+    assert worker.run_once() == 2
+    assert [(u[0], u[-1]) for u in conn.updates()] == [("pending", "evt_1"), ("done", "evt_2")]
+    assert conn.commits == 1
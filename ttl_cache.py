@@ -0,0 +1,72 @@
+# ttl_cache.py
+# Small thread-safe LRU cache with per-entry TTL, for per-user lookups that
+# are read far more often than they change (and are explicitly invalidated
+# when they do).
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._epoch = 0  # bumped on every invalidation
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value, or MISSING if absent or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any],
+                    ttl_for: Optional[Callable[[Any], float]] = None) -> Any:
+        value = self.get(key)
+        if value is MISSING:
+            epoch = self._epoch
+            value = load()
+            ttl = ttl_for(value) if ttl_for else None
+            with self._lock:
+                # An invalidation during load() may mean `value` predates the
+                # change: return it, but don't cache it.
+                if epoch == self._epoch:
+                    self._store(key, value, ttl)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._epoch += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "invalidations": self.invalidations}
@@ -0,0 +1,135 @@
+# webhook_worker.py
+# Background processing of persisted webhook events.
+#
+# The HTTP handler only verifies the signature and inserts the event into
+# webhook_events (deduplicated on the provider's event id), so retried
+# deliveries are acknowledged without being applied twice. This worker claims
+# due events in batches with FOR UPDATE SKIP LOCKED -- any number of worker
+# processes can run it -- and applies each one in a savepoint together with
+# its status update, so an event's effects and its "done" mark commit
+# atomically. Failures are retried with exponential backoff up to
+# max_attempts, then parked as 'failed' for inspection. Handler return values
+# are passed to on_applied(event_type, result) once the batch has committed
+# (e.g. to invalidate caches).
+
+import threading
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+Handler = Callable[[Any, dict], Any]  # (cursor, event data.object) -> result for on_applied
+
+
+class WebhookWorker:
+    def __init__(self, connect: Callable[[], ContextManager], handlers: Dict[str, Handler],
+                 on_applied: Optional[Callable[[str, Any], None]] = None, batch_size: int = 50,
+                 interval: float = 5.0, max_attempts: int = 8, backoff_base: float = 5.0,
+                 backoff_max: float = 3600.0):
+        self.connect = connect      # -> context manager yielding a connection
+        self.handlers = handlers    # event type -> handler
+        self.on_applied = on_applied
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counts = {"processed": 0, "retried": 0, "failed": 0, "batch_errors": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="webhook-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def notify(self):
+        """A new event was stored: process it now rather than at the next poll."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # Keep draining while batches come back full.
+                while self.run_once() == self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                self._count("batch_errors")
+                print(f"webhook worker: batch failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_once(self) -> int:
+        """Claim and apply one batch of due events; return how many were claimed."""
+        with self.connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT event_id, event_type, payload, attempts
+                    FROM webhook_events
+                    WHERE status = 'pending' AND next_attempt_at <= NOW()
+                    ORDER BY received_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    (self.batch_size,),
+                )
+                events = cur.fetchall()
+                applied: List[Tuple[str, Any]] = []
+                for event_id, event_type, payload, attempts in events:
+                    self._apply(conn, cur, event_id, event_type, payload, attempts, applied)
+            conn.commit()
+        if self.on_applied is not None:
+            for event_type, result in applied:
+                try:
+                    self.on_applied(event_type, result)
+                except Exception as e:
+                    print(f"webhook worker: on_applied failed for {event_type}: {e}")
+        return len(events)
+
+    def _apply(self, conn, cur, event_id: str, event_type: str, payload: dict, attempts: int,
+               applied: List[Tuple[str, Any]]):
+        handler = self.handlers.get(event_type)
+        try:
+            with conn.transaction():  # savepoint: a failing handler leaves the rest of the batch intact
+                result = handler(cur, payload["data"]["object"]) if handler is not None else None
+                cur.execute(
+                    """
+                    UPDATE webhook_events
+                    SET status = %s, attempts = attempts + 1, processed_at = NOW(), last_error = NULL
+                    WHERE event_id = %s
+                    """,
+                    ("done" if handler is not None else "ignored", event_id),
+                )
+            applied.append((event_type, result))
+            self._count("processed")
+        except Exception as e:
+            attempts += 1
+            give_up = attempts >= self.max_attempts
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+            cur.execute(
+                """
+                UPDATE webhook_events
+                SET status = %s, attempts = %s, last_error = %s,
+                    next_attempt_at = NOW() + INTERVAL '1 second' * %s
+                WHERE event_id = %s
+                """,
+                ("failed" if give_up else "pending", attempts, str(e)[:1000], delay, event_id),
+            )
+            self._count("failed" if give_up else "retried")
+            print(f"webhook worker: {event_type} {event_id} attempt {attempts} failed: {e}")
+
+    def _count(self, what: str):
+        with self._lock:
+            self.counts[what] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)